@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Action Plan - Compiles CSV scripts into validated, immutable, cached execution plans
+"""
+
+import os
+import re
+import csv
+import io
+import hashlib
+import threading
+from types import MappingProxyType
+from dataclasses import dataclass
+from typing import Any, Callable, Optional, Tuple
+
+from selenium.webdriver.common.by import By
+
+
+class PlanCompileError(ValueError):
+    """Raised when a CSV script contains invalid steps"""
+
+    def __init__(self, csv_file, errors):
+        self.csv_file = csv_file
+        self.errors = errors
+        super().__init__(f"{csv_file}: " + "; ".join(errors))
+
+
+@dataclass(frozen=True)
+class PlanStep:
+    """One compiled step: resolved handler plus pre-parsed locator"""
+    index: int
+    row: int
+    action: str
+    target: str
+    data: str
+    handler: Callable[..., Any]
+    locator: Optional[Tuple[str, str]]
+
+    @property
+    def label(self):
+        return f"{self.action} on {self.target}"
+
+
+@dataclass(frozen=True)
+class ActionPlan:
+    """Immutable compiled script"""
+    source: str
+    digest: str
+    steps: Tuple[PlanStep, ...]
+    metadata: MappingProxyType
+
+    def __len__(self):
+        return len(self.steps)
+
+
+def parse_selector(selector):
+    """Parse selector string into Selenium By object"""
+    if selector.startswith('#'):
+        return (By.ID, selector[1:])
+    elif selector.startswith('.'):
+        return (By.CLASS_NAME, selector[1:])
+    elif selector.startswith('xpath='):
+        return (By.XPATH, selector[6:])
+    elif selector.startswith('css='):
+        return (By.CSS_SELECTOR, selector[4:])
+    elif selector.startswith('name='):
+        return (By.NAME, selector[5:])
+    elif selector.startswith('text='):
+        text = selector[5:]
+        return (By.XPATH, f"//*[contains(text(), '{text}')]")
+    else:
+        # Assume it's an XPath if it starts with //
+        if selector.startswith('//'):
+            return (By.XPATH, selector)
+        else:
+            return (By.ID, selector)
+
+
+def split_metadata(content):
+    """Split leading '# key: value' comment lines from the CSV body"""
+    metadata = {}
+    lines = content.splitlines(keepends=True)
+    body_start = 0
+    for line in lines:
+        stripped = line.strip()
+        if stripped and not stripped.startswith('#'):
+            break
+        body_start += 1
+        match = re.match(r'#\s*([\w-]+)\s*[:=]\s*(.*)', stripped)
+        if match:
+            metadata[match.group(1).lower().replace('-', '_')] = match.group(2).strip()
+    return metadata, ''.join(lines[body_start:])
+
+
+def compile_action_plan(source, content, handlers):
+    """Compile CSV text into an ActionPlan
+
+    `handlers` maps each action name (aliases included) to a
+    `(handler, locator)` tuple, where locator is 'required', 'optional'
+    or None. Leading comment lines such as `# screenshot_policy: failure-only`
+    become plan metadata.
+    """
+    steps = []
+    errors = []
+    metadata, body = split_metadata(content)
+    reader = csv.DictReader(io.StringIO(body))
+
+    for row_num, row in enumerate(reader, 1):
+        action = (row.get('action') or '').strip()
+        target = (row.get('xpath') or '').strip()
+        data = (row.get('data') or '').strip()
+
+        if not action:
+            if target or data:
+                errors.append(f"row {row_num}: missing action")
+            continue
+
+        spec = handlers.get(action.lower())
+        if spec is None:
+            errors.append(f"row {row_num}: unknown action '{action}'")
+            continue
+
+        handler, locator_rule = spec
+        locator = None
+        if locator_rule == 'required' and not target:
+            errors.append(f"row {row_num}: '{action}' needs a selector in the xpath column")
+            continue
+        if locator_rule and target:
+            locator = parse_selector(target)
+
+        steps.append(PlanStep(
+            index=len(steps) + 1,
+            row=row_num,
+            action=action.lower(),
+            target=target,
+            data=data,
+            handler=handler,
+            locator=locator
+        ))
+
+    if errors:
+        raise PlanCompileError(source, errors)
+    if not steps:
+        raise PlanCompileError(source, ["no actions found"])
+
+    return ActionPlan(
+        source=source,
+        digest=hashlib.sha256(content.encode('utf-8')).hexdigest(),
+        steps=tuple(steps),
+        metadata=MappingProxyType(metadata)
+    )
+
+
+class PlanCache:
+    """Caches compiled plans by file path, mtime and content hash"""
+
+    def __init__(self):
+        self._plans = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def load(self, csv_file, handlers):
+        """Return the compiled plan for a CSV file, compiling only when it changed"""
+        path = os.path.abspath(csv_file)
+        stat = os.stat(path)
+        key = (path, id(handlers))
+
+        with self._lock:
+            cached = self._plans.get(key)
+        if cached and cached[0] == (stat.st_mtime_ns, stat.st_size):
+            with self._lock:
+                self.hits += 1
+            return cached[1]
+
+        with open(path, 'r', newline='', encoding='utf-8') as f:
+            content = f.read()
+        digest = hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+        # Touched but unchanged files keep their plan
+        if cached and cached[1].digest == digest:
+            plan = cached[1]
+            with self._lock:
+                self.hits += 1
+        else:
+            plan = compile_action_plan(csv_file, content, handlers)
+            with self._lock:
+                self.misses += 1
+
+        with self._lock:
+            self._plans[key] = ((stat.st_mtime_ns, stat.st_size), plan)
+        return plan
+
+    def invalidate(self, csv_file=None):
+        with self._lock:
+            if csv_file is None:
+                self._plans.clear()
+            else:
+                path = os.path.abspath(csv_file)
+                for key in [key for key in self._plans if key[0] == path]:
+                    del self._plans[key]
+
+
+plan_cache = PlanCache()
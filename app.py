@@ -3,7 +3,8 @@
 Railway deployment entry point
 """
 
-from web_server import app
+from web_server import app, start_background_services
 
 if __name__ == '__main__':
+    start_background_services()
     app.run()
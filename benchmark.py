@@ -0,0 +1,436 @@
+#!/usr/bin/env python3
+"""
+Benchmark - Runs CSV scripts against local fixture pages in headless Chrome and records timings as JSON
+
+Usage:
+    python benchmark.py [script ...] [--repeat N] [--output FILE]
+    python benchmark.py --compare BASE.json HEAD.json
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import shutil
+import argparse
+import platform
+import tempfile
+import threading
+import statistics
+import subprocess
+from datetime import datetime
+from functools import partial
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURES_DIR = os.path.join(PROJECT_DIR, 'benchmarks', 'fixtures')
+SCRIPTS_DIR = os.path.join(PROJECT_DIR, 'benchmarks', 'scripts')
+RESULTS_DIR = os.path.join(PROJECT_DIR, 'benchmarks', 'results')
+
+VIDEO_DONE_STATUSES = ('completed', 'error')
+
+
+class FixtureRequestHandler(SimpleHTTPRequestHandler):
+    """Serves the fixture pages, plus /slow/<ms>: a response held back to simulate a slow backend"""
+
+    def do_GET(self):
+        if not self.path.startswith('/slow/'):
+            return super().do_GET()
+        delay = self.path[len('/slow/'):].split('?')[0]
+        time.sleep(min(int(delay) if delay.isdigit() else 500, 10000) / 1000)
+        body = b'/* slow response */'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/javascript')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Keep benchmark output readable
+
+
+def start_fixture_server(directory=FIXTURES_DIR):
+    """Serve `directory` on a free localhost port; returns (server, base_url)"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), partial(FixtureRequestHandler, directory=directory))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="fixture-server", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def process_tree_rss(root=None):
+    """Resident bytes of `root` (default: this process) and all its descendants, read from /proc"""
+    root = root or os.getpid()
+    page_size = os.sysconf('SC_PAGE_SIZE')
+    children = {}
+    rss = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                stat = f.read()
+            with open(f'/proc/{entry}/statm') as f:
+                resident = int(f.read().split()[1])
+        except (OSError, ValueError, IndexError):
+            continue  # Process exited while we looked
+        parent = int(stat.rsplit(')', 1)[1].split()[1])
+        children.setdefault(parent, []).append(int(entry))
+        rss[int(entry)] = resident * page_size
+
+    total, stack = 0, [root]
+    while stack:
+        pid = stack.pop()
+        total += rss.get(pid, 0)
+        stack.extend(children.get(pid, ()))
+    return total
+
+
+class MemorySampler:
+    """Tracks the peak resident memory of the harness, the browser and every other child process
+
+    Only available where /proc exists (Linux); elsewhere peak_bytes stays None.
+    """
+
+    def __init__(self, interval=0.2):
+        self.interval = interval
+        self.peak_bytes = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        if os.path.isdir('/proc'):
+            self._sample()
+            self._thread = threading.Thread(target=self._loop, name="memory-sampler", daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._sample()
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def _sample(self):
+        self.peak_bytes = max(self.peak_bytes or 0, process_tree_rss())
+
+
+def harness_max_rss_mb():
+    """Peak RSS of the harness process itself (ru_maxrss is KB on Linux, bytes on macOS)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (2 ** 20 if sys.platform == 'darwin' else 2 ** 10), 1)
+
+
+def distribution(values):
+    values = [value for value in values if value is not None]
+    if not values:
+        return None
+    return {
+        'min': round(min(values), 1),
+        'median': round(statistics.median(values), 1),
+        'mean': round(statistics.fmean(values), 1),
+        'max': round(max(values), 1),
+    }
+
+
+def merge_by_action(summaries):
+    """Combine per-action stats ({action: {count, total_ms, max_ms}}) of several runs"""
+    merged = {}
+    for by_action in summaries:
+        for action, stats in by_action.items():
+            total = merged.setdefault(action, {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+            total['count'] += stats['count']
+            total['total_ms'] += stats['total_ms']
+            total['max_ms'] = max(total['max_ms'], stats['max_ms'])
+    for stats in merged.values():
+        stats['total_ms'] = round(stats['total_ms'], 1)
+        stats['avg_ms'] = round(stats['total_ms'] / stats['count'], 1)
+    return dict(sorted(merged.items()))
+
+
+def git_revision():
+    try:
+        revision = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_DIR,
+                                  capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=PROJECT_DIR,
+                                    capture_output=True, text=True, check=True).stdout.strip())
+        return {'commit': revision, 'dirty': dirty}
+    except (OSError, subprocess.CalledProcessError):
+        return {'commit': None, 'dirty': None}
+
+
+def render_scripts(names, base_url, directory):
+    """Copy benchmark scripts into `directory` with {base_url} pointing at the fixture server"""
+    available = sorted(os.path.splitext(name)[0] for name in os.listdir(SCRIPTS_DIR) if name.endswith('.csv'))
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        raise SystemExit(f"❌ Unknown benchmark script(s): {', '.join(unknown)} (available: {', '.join(available)})")
+
+    os.makedirs(directory, exist_ok=True)
+    scripts = {}
+    for name in names or available:
+        with open(os.path.join(SCRIPTS_DIR, f"{name}.csv"), 'r', encoding='utf-8') as f:
+            content = f.read().replace('{base_url}', base_url)
+        path = os.path.join(directory, f"{name}.csv")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        scripts[name] = path
+    return scripts
+
+
+def run_script(path, policy, args):
+    """Run one script through CSVActionHandler; returns (timings read back from the run store, video job id)"""
+    from csv_action_handler import CSVActionHandler
+    from run_store import get_run_store
+    from step_timing import summarize_steps
+
+    session_id = uuid.uuid4().hex
+    store = get_run_store()
+    store.create_run(session_id, os.path.basename(path), browser=args.browser, profile=args.profile,
+                     status='running', started=time.time())
+    handler = CSVActionHandler(args.browser, session_id, profile=args.profile)
+    handler.auto_record_enabled = args.video
+    handler.screenshot_policy = policy
+
+    with MemorySampler() as memory:
+        started = time.perf_counter()
+        passed = handler.run_actions_from_csv(path)
+        wall_ms = (time.perf_counter() - started) * 1000
+
+    store.flush(timeout=30)
+    run_phases = store.get_run(session_id)['timings'] or {}
+    steps = store.get_steps(session_id)
+    summary = summarize_steps(steps)
+    return {
+        'passed': bool(passed),
+        'steps': len(steps),
+        'wall_ms': round(wall_ms, 1),
+        'driver_startup_ms': run_phases.get('driver_startup'),
+        'screenshot_ms': summary['phases'].get('screenshot', 0.0),
+        'steps_ms': summary['steps_ms'],
+        'phases_ms': summary['phases'],
+        'run_phases_ms': run_phases,
+        'by_action': summary['by_action'],
+        'failed_steps': [step['step'] for step in steps if step['status'] == 'failed'],
+        'peak_rss_mb': round(memory.peak_bytes / 2 ** 20, 1) if memory.peak_bytes else None,
+    }, handler.video_job
+
+
+def summarize_policy(runs):
+    phases = {}
+    for run in runs:
+        for name, value in run['phases_ms'].items():
+            phases.setdefault(name, []).append(value)
+    return {
+        'wall_ms': distribution([run['wall_ms'] for run in runs]),
+        'driver_startup_ms': distribution([run['driver_startup_ms'] for run in runs]),
+        'screenshot_ms': distribution([run['screenshot_ms'] for run in runs]),
+        'phases_ms': {name: round(statistics.fmean(values), 1) for name, values in phases.items()},
+        'by_action': merge_by_action(run['by_action'] for run in runs),
+        'peak_rss_mb': max((run['peak_rss_mb'] for run in runs if run['peak_rss_mb']), default=None),
+        'failures': sum(not run['passed'] for run in runs),
+        'runs': runs,
+    }
+
+
+def screenshot_overhead(policies):
+    """Screenshot cost measured two ways: time inside capture points, and wall time versus failure-only"""
+    always = policies.get('always')
+    if not always:
+        return None
+    overhead = {'capture_ms': always['screenshot_ms']['median'] if always['screenshot_ms'] else None}
+    baseline = policies.get('failure-only')
+    if baseline and always['wall_ms'] and baseline['wall_ms']:
+        overhead['wall_delta_ms'] = round(always['wall_ms']['median'] - baseline['wall_ms']['median'], 1)
+    return overhead
+
+
+def wait_for_videos(job_ids, timeout=120):
+    """Let queued video post-processing finish before the work directory goes away"""
+    from video_postprocess import get_video_postprocessor
+    postprocessor = get_video_postprocessor()
+    deadline = time.monotonic() + timeout
+    pending = [job_id for job_id in job_ids if job_id]
+    while pending and time.monotonic() < deadline:
+        pending = [job_id for job_id in pending
+                   if (postprocessor.status(job_id) or {}).get('status') not in VIDEO_DONE_STATUSES + (None,)]
+        if pending:
+            time.sleep(0.5)
+
+
+def run_benchmark(args):
+    workdir = tempfile.mkdtemp(prefix='benchmark-')
+    # Reports, screenshots, videos and the run store all land in the throwaway work directory
+    os.environ['RUN_STORE_PATH'] = os.path.join(workdir, 'runs.db')
+    os.environ['LOG_SPILL_DIR'] = os.path.join(workdir, 'logs')
+    os.environ['VIDEO_CATALOG_PATH'] = os.path.join(workdir, 'recorded_videos', '.catalog.db')
+    # ...except the driver manifest: share the project's resolved drivers (absolute, as we chdir below)
+    os.environ['DRIVER_MANIFEST_PATH'] = os.path.abspath(
+        os.environ.get('DRIVER_MANIFEST_PATH', os.path.join(PROJECT_DIR, '.driver_manifest.json')))
+    previous_cwd = os.getcwd()
+    os.chdir(workdir)
+
+    server, base_url = start_fixture_server()
+    policies = [policy.strip() for policy in args.policies.split(',') if policy.strip()]
+    runs = {}
+    driver_resolve_ms = None
+    try:
+        scripts = render_scripts(args.scripts, base_url, os.path.join(workdir, 'scripts'))
+        print(f"🌐 Fixture site at {base_url}, work directory {workdir}")
+
+        from driver_cache import resolve_driver_path
+        started = time.perf_counter()
+        resolve_driver_path(args.browser)  # Outside the timed runs: may download on a cold cache
+        driver_resolve_ms = round((time.perf_counter() - started) * 1000, 1)
+
+        video_jobs = []
+        first = next(iter(scripts.values()))
+        for i in range(args.warmup):
+            print(f"🔥 Warm-up run {i + 1}/{args.warmup}")
+            video_jobs.append(run_script(first, policies[0], args)[1])
+
+        runs = {name: {policy: [] for policy in policies} for name in scripts}
+        total = args.repeat * len(scripts) * len(policies)
+        count = 0
+        # Interleave scripts and policies so drift on the host spreads evenly over all of them
+        for _ in range(args.repeat):
+            for name, path in scripts.items():
+                for policy in policies:
+                    count += 1
+                    result, video_job = run_script(path, policy, args)
+                    runs[name][policy].append(result)
+                    video_jobs.append(video_job)
+                    print(f"⏱️ [{count}/{total}] {name} ({policy}): {result['wall_ms']:.0f} ms "
+                          f"{'✅' if result['passed'] else '❌ steps ' + str(result['failed_steps'])}")
+
+        wait_for_videos(video_jobs)
+    finally:
+        server.shutdown()
+        os.chdir(previous_cwd)
+        if args.keep_artifacts:
+            print(f"📁 Artifacts kept in {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    script_results = {}
+    for name, by_policy in runs.items():
+        summaries = {policy: summarize_policy(results) for policy, results in by_policy.items()}
+        script_results[name] = {
+            'steps': by_policy[policies[0]][0]['steps'],
+            'wall_ms': summaries[policies[0]]['wall_ms'],
+            'screenshot_overhead_ms': screenshot_overhead(summaries),
+            'policies': summaries,
+        }
+
+    all_runs = [run for by_policy in runs.values() for results in by_policy.values() for run in results]
+    return {
+        'revision': git_revision(),
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'host': {
+            'platform': platform.platform(),
+            'python': platform.python_version(),
+            'cpus': os.cpu_count(),
+        },
+        'settings': {
+            'browser': args.browser,
+            'profile': args.profile,
+            'repeat': args.repeat,
+            'warmup': args.warmup,
+            'video': args.video,
+            'screenshot_policies': policies,
+        },
+        'driver_resolve_ms': driver_resolve_ms,
+        'driver_startup_ms': distribution([run['driver_startup_ms'] for run in all_runs]),
+        'by_action': merge_by_action(run['by_action'] for run in all_runs),
+        'memory': {
+            'peak_rss_mb': max((run['peak_rss_mb'] for run in all_runs if run['peak_rss_mb']), default=None),
+            'harness_max_rss_mb': harness_max_rss_mb(),
+        },
+        'failures': sum(not run['passed'] for run in all_runs),
+        'scripts': script_results,
+    }
+
+
+def percent_change(base, head):
+    if not base or head is None:
+        return 'n/a'
+    return f"{(head - base) / base * 100:+.1f}%"
+
+
+def compare(base_file, head_file):
+    """Print median wall time, driver startup and per-action deltas between two result files"""
+    with open(base_file, 'r', encoding='utf-8') as f:
+        base = json.load(f)
+    with open(head_file, 'r', encoding='utf-8') as f:
+        head = json.load(f)
+
+    print(f"📊 {base['revision']['commit']} -> {head['revision']['commit']} (median ms)")
+    print(f"{'script':<24}{'base':>10}{'head':>10}{'change':>10}")
+    for name in sorted(set(base['scripts']) | set(head['scripts'])):
+        before = ((base['scripts'].get(name) or {}).get('wall_ms') or {}).get('median')
+        after = ((head['scripts'].get(name) or {}).get('wall_ms') or {}).get('median')
+        print(f"{name:<24}{before if before is not None else '-':>10}{after if after is not None else '-':>10}"
+              f"{percent_change(before, after):>10}")
+
+    before = (base.get('driver_startup_ms') or {}).get('median')
+    after = (head.get('driver_startup_ms') or {}).get('median')
+    print(f"{'driver startup':<24}{before if before is not None else '-':>10}"
+          f"{after if after is not None else '-':>10}{percent_change(before, after):>10}")
+
+    print(f"\n{'action (avg ms)':<24}{'base':>10}{'head':>10}{'change':>10}")
+    for action in sorted(set(base['by_action']) | set(head['by_action'])):
+        before = (base['by_action'].get(action) or {}).get('avg_ms')
+        after = (head['by_action'].get(action) or {}).get('avg_ms')
+        print(f"{action:<24}{before if before is not None else '-':>10}{after if after is not None else '-':>10}"
+              f"{percent_change(before, after):>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark CSV scripts against the local fixture site")
+    parser.add_argument('scripts', nargs='*', help="Benchmark scripts to run (default: all in benchmarks/scripts)")
+    parser.add_argument('--repeat', type=int, default=3, help="Timed runs per script and policy (default: 3)")
+    parser.add_argument('--warmup', type=int, default=1, help="Untimed runs before measuring (default: 1)")
+    parser.add_argument('--browser', default='chrome', help="Browser to run (default: chrome)")
+    parser.add_argument('--profile', default='headless-fast', help="Browser launch profile (default: headless-fast)")
+    parser.add_argument('--policies', default='always,failure-only',
+                        help="Screenshot policies to run; 'always' vs 'failure-only' gives the screenshot overhead")
+    parser.add_argument('--no-video', dest='video', action='store_false', help="Do not record videos")
+    parser.add_argument('--output', '-o', help="Result file (default: benchmarks/results/<commit>-<time>.json)")
+    parser.add_argument('--keep-artifacts', action='store_true', help="Keep screenshots, videos and reports")
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'HEAD'), help="Compare two result files and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return 0
+
+    args.repeat = max(1, args.repeat)
+    results = run_benchmark(args)
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{results['revision']['commit'] or 'unknown'}-{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+        f.write('\n')
+    print(f"📊 Results written to {output}")
+
+    if results['failures']:
+        print(f"❌ {results['failures']} run(s) failed - timings of failed runs are not comparable")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Browser Profiles - Named launch profiles (headless, viewport, resource switches) per run
+"""
+
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from config import Config
+
+# Chromium switches that cut per-session memory and CPU
+LOW_RESOURCE_CHROMIUM_ARGS = (
+    '--disable-gpu',
+    '--disable-extensions',
+    '--disable-background-networking',
+    '--disable-background-timer-throttling',
+    '--disable-renderer-backgrounding',
+    '--disable-component-update',
+    '--disable-default-apps',
+    '--disable-sync',
+    '--disable-dev-shm-usage',
+    '--no-first-run',
+    '--mute-audio',
+    '--blink-settings=imagesEnabled=false',
+)
+
+# Extra savings for the low-memory profile: one renderer, small caches
+LOW_MEMORY_CHROMIUM_ARGS = (
+    '--renderer-process-limit=1',
+    '--disable-site-isolation-trials',
+    '--disable-features=Translate,MediaRouter',
+    '--disk-cache-size=1048576',
+    '--js-flags=--max-old-space-size=256',
+)
+
+LOW_RESOURCE_FIREFOX_PREFS = {
+    'permissions.default.image': 2,
+    'extensions.enabledScopes': 0,
+    'layers.acceleration.disabled': True,
+    'network.prefetch-next': False,
+    'network.dns.disablePrefetch': True,
+    'browser.safebrowsing.malware.enabled': False,
+    'browser.safebrowsing.phishing.enabled': False,
+    'app.update.enabled': False,
+    'datareporting.healthreport.uploadEnabled': False,
+    'browser.cache.disk.enable': False,
+}
+
+
+@dataclass(frozen=True)
+class BrowserProfile:
+    """How a browser is launched for a run"""
+    name: str
+    description: str
+    headless: bool
+    window_size: Optional[Tuple[int, int]]  # None means maximized
+    low_resource: bool = False
+    low_memory: bool = False
+    memory_mb: int = 0  # Rough RAM per session, used to size the scheduler
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'description': self.description,
+            'headless': self.headless,
+            'window_size': list(self.window_size) if self.window_size else None,
+            'low_resource': self.low_resource,
+            'memory_mb': self.memory_mb,
+        }
+
+
+def _config_window_size():
+    width, height = Config.WINDOW_SIZE.lower().replace('x', ',').split(',')[:2]
+    return int(width), int(height)
+
+
+def _build_profiles():
+    return {
+        'default': BrowserProfile(
+            'default', 'HEADLESS and WINDOW_SIZE from the environment',
+            headless=Config.HEADLESS, window_size=_config_window_size(),
+            memory_mb=Config.BROWSER_MEMORY_MB
+        ),
+        'headless-fast': BrowserProfile(
+            'headless-fast', 'Headless, no images, GPU, extensions or background networking',
+            headless=True, window_size=_config_window_size(), low_resource=True,
+            memory_mb=max(1, Config.BROWSER_MEMORY_MB // 2)
+        ),
+        'debug-headed': BrowserProfile(
+            'debug-headed', 'Visible, maximized browser for debugging scripts',
+            headless=False, window_size=None,
+            memory_mb=Config.BROWSER_MEMORY_MB
+        ),
+        'low-memory': BrowserProfile(
+            'low-memory', 'Headless 1280x720 with a single renderer and small caches',
+            headless=True, window_size=(1280, 720), low_resource=True, low_memory=True,
+            memory_mb=max(1, Config.BROWSER_MEMORY_MB // 3)
+        ),
+    }
+
+
+PROFILES = _build_profiles()
+
+
+def get_profile(name=None):
+    """Look up a profile by name (defaults to BROWSER_PROFILE)"""
+    key = (name or Config.BROWSER_PROFILE).strip().lower()
+    try:
+        return PROFILES[key]
+    except KeyError:
+        raise ValueError(f"Unknown browser profile: {name} (choose from {', '.join(PROFILES)})")
+
+
+def apply_chromium_profile(profile, options, headless=None):
+    """Apply a profile to Chrome/Edge options
+
+    `headless` overrides the profile, e.g. to draw on a virtual display.
+    """
+    headless = profile.headless if headless is None else headless
+    if headless:
+        options.add_argument('--headless=new')
+    if profile.window_size:
+        options.add_argument(f'--window-size={profile.window_size[0]},{profile.window_size[1]}')
+    else:
+        options.add_argument('--start-maximized')
+    if profile.low_resource:
+        for argument in LOW_RESOURCE_CHROMIUM_ARGS:
+            options.add_argument(argument)
+    if profile.low_memory:
+        for argument in LOW_MEMORY_CHROMIUM_ARGS:
+            options.add_argument(argument)
+    return options
+
+
+def apply_firefox_profile(profile, options, headless=None):
+    """Apply a profile to Firefox options"""
+    headless = profile.headless if headless is None else headless
+    if headless:
+        options.add_argument('-headless')
+    if profile.window_size:
+        options.add_argument(f'--width={profile.window_size[0]}')
+        options.add_argument(f'--height={profile.window_size[1]}')
+    if profile.low_resource:
+        for key, value in LOW_RESOURCE_FIREFOX_PREFS.items():
+            options.set_preference(key, value)
+    if profile.low_memory:
+        options.set_preference('dom.ipc.processCount', 1)
+        options.set_preference('browser.sessionhistory.max_total_viewers', 0)
+    return options
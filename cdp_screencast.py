@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+CDP Screencast - Receives Page.screencastFrame events over the DevTools websocket
+"""
+
+import json
+import time
+import hashlib
+import itertools
+import threading
+import urllib.request
+
+from config import Config
+
+
+class CDPScreencast:
+    """Subscribes to Chrome's screencast, acknowledges every frame and forwards
+    rate-limited, de-duplicated frames to `on_frame(data_b64, timestamp)`"""
+
+    def __init__(self, driver, on_frame, max_fps=None, max_width=1920, max_height=1080,
+                 image_format='jpeg', quality=80):
+        self.driver = driver
+        self.on_frame = on_frame
+        self.max_fps = max_fps or Config.SCREENCAST_MAX_FPS
+        self.params = {
+            'format': image_format,
+            'quality': quality,
+            'maxWidth': max_width,
+            'maxHeight': max_height,
+            'everyNthFrame': 1
+        }
+
+        self._ws = None
+        self._ids = itertools.count(1)
+        self._send_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._last_emit = 0.0
+        self._last_digest = None
+        self._held = None
+
+        # Statistics
+        self.received = 0
+        self.emitted = 0
+        self.duplicates = 0
+        self.rate_limited = 0
+        self.error = None
+
+    def start(self):
+        """Connect to the page's DevTools socket and start the screencast"""
+        import websocket
+
+        self._ws = websocket.create_connection(self._page_websocket_url(), timeout=10, suppress_origin=True)
+        self._ws.settimeout(0.5)
+        self._send('Page.enable')
+        self._send('Page.startScreencast', self.params)
+
+        self._thread = threading.Thread(target=self._run, name="cdp-screencast")
+        self._thread.daemon = True
+        self._thread.start()
+        return True
+
+    def stop(self, timeout=5):
+        """Stop the screencast and close the socket; returns statistics"""
+        self._stop.set()
+        if self._ws:
+            try:
+                self._send('Page.stopScreencast')
+            except Exception:
+                pass  # Browser may already be gone
+        if self._thread:
+            self._thread.join(timeout)
+        if self._ws:
+            try:
+                self._ws.close()
+            except Exception:
+                pass
+            self._ws = None
+        return self.stats()
+
+    def stats(self):
+        return {
+            'received': self.received,
+            'emitted': self.emitted,
+            'duplicates': self.duplicates,
+            'rate_limited': self.rate_limited,
+            'error': self.error,
+        }
+
+    def _page_websocket_url(self):
+        """Find the DevTools websocket of the page the driver is controlling"""
+        capabilities = self.driver.capabilities
+        options = capabilities.get('goog:chromeOptions') or capabilities.get('ms:edgeOptions') or {}
+        address = options.get('debuggerAddress')
+        if not address:
+            raise RuntimeError("Browser does not expose a DevTools debugger address")
+
+        target_id = self.driver.execute_cdp_cmd('Target.getTargetInfo', {})['targetInfo']['targetId']
+        with urllib.request.urlopen(f"http://{address}/json/list", timeout=5) as response:
+            targets = json.loads(response.read().decode('utf-8'))
+        for target in targets:
+            if target.get('id') == target_id and target.get('webSocketDebuggerUrl'):
+                return target['webSocketDebuggerUrl']
+        return f"ws://{address}/devtools/page/{target_id}"
+
+    def _send(self, method, params=None):
+        message = {'id': next(self._ids), 'method': method, 'params': params or {}}
+        with self._send_lock:
+            self._ws.send(json.dumps(message))
+
+    def _run(self):
+        import websocket
+
+        while not self._stop.is_set():
+            try:
+                raw = self._ws.recv()
+            except websocket.WebSocketTimeoutException:
+                # Page went quiet - make sure the last rate-limited frame is not lost
+                self._flush_held()
+                continue
+            except Exception as e:
+                if not self._stop.is_set():
+                    self.error = str(e)
+                break
+
+            try:
+                message = json.loads(raw)
+            except ValueError:
+                continue
+            if message.get('method') == 'Page.screencastFrame':
+                self._handle_frame(message['params'])
+
+        self._flush_held(force=True)
+
+    def _handle_frame(self, params):
+        self.received += 1
+        # Chrome stops sending frames until the previous one is acknowledged
+        try:
+            self._send('Page.screencastFrameAck', {'sessionId': params['sessionId']})
+        except Exception as e:
+            self.error = str(e)
+            return
+
+        data = params['data']
+        timestamp = params.get('metadata', {}).get('timestamp') or time.time()
+
+        if timestamp - self._last_emit < 1.0 / self.max_fps:
+            # Hold the newest frame; it is emitted if nothing newer replaces it in time
+            if self._held:
+                self.rate_limited += 1
+            self._held = (data, timestamp)
+            return
+
+        self._held = None
+        self._emit(data, timestamp)
+
+    def _flush_held(self, force=False):
+        if self._held and (force or time.time() - self._last_emit >= 1.0 / self.max_fps):
+            data, timestamp = self._held
+            self._held = None
+            self._emit(data, timestamp)
+
+    def _emit(self, data, timestamp):
+        digest = hashlib.md5(data.encode('ascii')).digest()
+        if digest == self._last_digest:
+            self.duplicates += 1
+            return
+
+        self._last_emit = timestamp
+        self._last_digest = digest
+        self.emitted += 1
+        try:
+            self.on_frame(data, timestamp)
+        except Exception as e:
+            self.error = str(e)
@@ -8,12 +8,125 @@ class Config:
     BROWSER = os.getenv('BROWSER', 'chrome')
     HEADLESS = os.getenv('HEADLESS', 'false').lower() == 'true'
     WINDOW_SIZE = os.getenv('WINDOW_SIZE', '1920,1080')
+    BROWSER_PROFILE = os.getenv('BROWSER_PROFILE', 'default')  # default, headless-fast, debug-headed, low-memory
     
     # Test settings
     IMPLICIT_WAIT = int(os.getenv('IMPLICIT_WAIT', '10'))
     EXPLICIT_WAIT = int(os.getenv('EXPLICIT_WAIT', '20'))
     SCREENSHOT_ON_FAILURE = os.getenv('SCREENSHOT_ON_FAILURE', 'true').lower() == 'true'
-    
+    SCREENSHOT_POLICY = os.getenv('SCREENSHOT_POLICY', 'always').lower()
+    SCREENSHOT_EVERY_N = int(os.getenv('SCREENSHOT_EVERY_N', '5'))
+
+    # Driver pool settings
+    DRIVER_POOL_ENABLED = os.getenv('DRIVER_POOL_ENABLED', 'true').lower() == 'true'
+    DRIVER_POOL_SIZE = int(os.getenv('DRIVER_POOL_SIZE', '4'))
+    DRIVER_POOL_WARM_SIZE = int(os.getenv('DRIVER_POOL_WARM_SIZE', '1'))
+    DRIVER_POOL_MAX_USES = int(os.getenv('DRIVER_POOL_MAX_USES', '20'))
+    DRIVER_POOL_LEASE_TIMEOUT = int(os.getenv('DRIVER_POOL_LEASE_TIMEOUT', '120'))
+
+    # Driver resolution cache
+    DRIVER_MANIFEST_PATH = os.getenv('DRIVER_MANIFEST_PATH', '.driver_manifest.json')
+    DRIVER_CACHE_TTL = int(os.getenv('DRIVER_CACHE_TTL', '86400'))
+
+    # Execution scheduler (0 workers = size to CPU count and available RAM)
+    SCHEDULER_WORKERS = int(os.getenv('SCHEDULER_WORKERS', '0'))
+    BROWSER_MEMORY_MB = int(os.getenv('BROWSER_MEMORY_MB', '600'))
+    BATCH_MAX_CONCURRENCY = int(os.getenv('BATCH_MAX_CONCURRENCY', '4'))
+
+    # Where scripts run: process (executor processes, one browser each) or thread (inside the web process)
+    EXECUTOR_MODE = os.getenv('EXECUTOR_MODE', 'process').lower()
+
+    # Watchdog deadlines (seconds); a step may wait EXPLICIT_WAIT more than once (element, then page ready)
+    ACTION_TIMEOUT = int(os.getenv('ACTION_TIMEOUT', str(EXPLICIT_WAIT * 2 + 10)))
+    SCRIPT_TIMEOUT = int(os.getenv('SCRIPT_TIMEOUT', '300'))
+
+    # Session logs: newest LOG_BUFFER_LINES per session in memory, older lines spilled to gzip
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+    LOG_BUFFER_LINES = int(os.getenv('LOG_BUFFER_LINES', '1000'))
+    LOG_SPILL_DIR = os.getenv('LOG_SPILL_DIR', 'logs/sessions')
+    LOG_FETCH_LIMIT = int(os.getenv('LOG_FETCH_LIMIT', '1000'))
+
+    # Run store (SQLite run history shared by all server processes)
+    RUN_STORE_PATH = os.getenv('RUN_STORE_PATH', 'data/runs.db')
+    RUN_STORE_BATCH = int(os.getenv('RUN_STORE_BATCH', '200'))
+    RUN_STORE_MAX_PAGE = int(os.getenv('RUN_STORE_MAX_PAGE', '500'))
+    RUN_HISTORY_DAYS = float(os.getenv('RUN_HISTORY_DAYS', '30'))
+
+    # Progress event stream (/api/events)
+    EVENT_BUFFER_SIZE = int(os.getenv('EVENT_BUFFER_SIZE', '5000'))
+    EVENT_HEARTBEAT_SECONDS = float(os.getenv('EVENT_HEARTBEAT_SECONDS', '15'))
+    EVENT_STREAM_MAX_SECONDS = int(os.getenv('EVENT_STREAM_MAX_SECONDS', '300'))
+    EVENT_RETRY_MS = int(os.getenv('EVENT_RETRY_MS', '2000'))
+
+    # Prometheus metrics (/metrics); executor processes forward theirs, and their driver pool and
+    # video job state, every METRICS_FORWARD_INTERVAL seconds
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+    METRICS_FORWARD_INTERVAL = float(os.getenv('METRICS_FORWARD_INTERVAL', '5'))
+
+    # Readiness waits (NAVIGATION_WAIT: ready, network-idle or none)
+    NAVIGATION_WAIT = os.getenv('NAVIGATION_WAIT', 'ready').lower()
+    NETWORK_IDLE_MS = int(os.getenv('NETWORK_IDLE_MS', '500'))
+    NAVIGATION_FALLBACK_WAIT = float(os.getenv('NAVIGATION_FALLBACK_WAIT', '2'))
+    TEARDOWN_DELAY = float(os.getenv('TEARDOWN_DELAY', '0'))
+
+    # Background screenshot writer
+    SCREENSHOT_QUEUE_SIZE = int(os.getenv('SCREENSHOT_QUEUE_SIZE', '64'))
+    SCREENSHOT_QUEUE_TIMEOUT = float(os.getenv('SCREENSHOT_QUEUE_TIMEOUT', '1'))
+    SCREENSHOT_WORKERS = int(os.getenv('SCREENSHOT_WORKERS', '2'))
+
+    # Streaming video encoder
+    VIDEO_QUEUE_SIZE = int(os.getenv('VIDEO_QUEUE_SIZE', '16'))
+    VIDEO_QUEUE_TIMEOUT = float(os.getenv('VIDEO_QUEUE_TIMEOUT', '1'))
+    VIDEO_MAX_HOLD = float(os.getenv('VIDEO_MAX_HOLD', '0'))  # Seconds; 0 keeps real time, >0 time-compresses idle waits
+    SCREENCAST_MAX_FPS = float(os.getenv('SCREENCAST_MAX_FPS', '10'))
+    VIDEO_FORMAT = os.getenv('VIDEO_FORMAT', 'mp4').lower()  # mp4 (H.264) or webm (VP9)
+    VIDEO_PRESET = os.getenv('VIDEO_PRESET', 'veryfast')
+    VIDEO_DEDUP_THRESHOLD = float(os.getenv('VIDEO_DEDUP_THRESHOLD', '1.5'))
+    VIDEO_FALLBACK_FPS = float(os.getenv('VIDEO_FALLBACK_FPS', '10'))
+
+    # Video post-processing
+    VIDEO_POSTPROCESS_WORKERS = int(os.getenv('VIDEO_POSTPROCESS_WORKERS', '2'))
+    VIDEO_THUMBNAIL_WIDTH = int(os.getenv('VIDEO_THUMBNAIL_WIDTH', '320'))
+    THUMBNAIL_FORMAT = os.getenv('THUMBNAIL_FORMAT', 'jpg').lower()  # jpg or webp
+    THUMBNAIL_QUALITY = int(os.getenv('THUMBNAIL_QUALITY', '75'))
+    THUMBNAIL_CACHE_MAX_AGE = int(os.getenv('THUMBNAIL_CACHE_MAX_AGE', '86400'))
+    SPRITE_TILES = int(os.getenv('SPRITE_TILES', '20'))
+    SPRITE_COLUMNS = int(os.getenv('SPRITE_COLUMNS', '5'))
+    SPRITE_TILE_WIDTH = int(os.getenv('SPRITE_TILE_WIDTH', '160'))
+
+    # Video catalog (SQLite index behind /api/videos)
+    VIDEO_CATALOG_PATH = os.getenv('VIDEO_CATALOG_PATH', 'recorded_videos/.catalog.db')
+    VIDEO_CATALOG_MAX_PAGE = int(os.getenv('VIDEO_CATALOG_MAX_PAGE', '500'))
+
+    # Retention (background pass every RETENTION_INTERVAL seconds)
+    RETENTION_ENABLED = os.getenv('RETENTION_ENABLED', 'true').lower() == 'true'
+    RETENTION_INTERVAL = int(os.getenv('RETENTION_INTERVAL', '600'))
+    RETENTION_BATCH = int(os.getenv('RETENTION_BATCH', '50'))
+    RETENTION_TRANSCODES_PER_PASS = int(os.getenv('RETENTION_TRANSCODES_PER_PASS', '1'))
+    VIDEO_RETENTION_DAYS = float(os.getenv('VIDEO_RETENTION_DAYS', '7'))
+    VIDEO_FAILED_RETENTION_DAYS = float(os.getenv('VIDEO_FAILED_RETENTION_DAYS', '30'))
+    VIDEO_QUOTA_MB = int(os.getenv('VIDEO_QUOTA_MB', '10240'))
+    VIDEO_COMPACT_AFTER_DAYS = float(os.getenv('VIDEO_COMPACT_AFTER_DAYS', '2'))
+    VIDEO_COMPACT_CRF = int(os.getenv('VIDEO_COMPACT_CRF', '34'))
+    VIDEO_COMPACT_WIDTH = int(os.getenv('VIDEO_COMPACT_WIDTH', '1280'))
+    VIDEO_COMPACT_TIMEOUT = int(os.getenv('VIDEO_COMPACT_TIMEOUT', '600'))
+    SCREENSHOT_ARCHIVE_AFTER_DAYS = float(os.getenv('SCREENSHOT_ARCHIVE_AFTER_DAYS', '1'))
+    SCREENSHOT_RETENTION_DAYS = float(os.getenv('SCREENSHOT_RETENTION_DAYS', '14'))
+    SCREENSHOT_FAILED_RETENTION_DAYS = float(os.getenv('SCREENSHOT_FAILED_RETENTION_DAYS', '60'))
+    SCREENSHOT_QUOTA_MB = int(os.getenv('SCREENSHOT_QUOTA_MB', '2048'))
+
+    # Video serving: none (Flask streams with Range support), x-accel-redirect (nginx) or x-sendfile
+    VIDEO_OFFLOAD = os.getenv('VIDEO_OFFLOAD', 'none').lower()
+    VIDEO_OFFLOAD_PREFIX = os.getenv('VIDEO_OFFLOAD_PREFIX', '/protected-videos/')
+    VIDEO_CACHE_MAX_AGE = int(os.getenv('VIDEO_CACHE_MAX_AGE', '3600'))
+
+    # Recording backend: auto (screencast for Chrome/Edge, Xvfb otherwise), screencast or xvfb
+    RECORDING_BACKEND = os.getenv('RECORDING_BACKEND', 'auto').lower()
+    XVFB_DISPLAY_BASE = int(os.getenv('XVFB_DISPLAY_BASE', '99'))
+    XVFB_MAX_DISPLAYS = int(os.getenv('XVFB_MAX_DISPLAYS', '32'))
+    XVFB_START_TIMEOUT = float(os.getenv('XVFB_START_TIMEOUT', '10'))
+    XVFB_FRAMERATE = int(os.getenv('XVFB_FRAMERATE', '15'))
+
     # AI settings
     OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
     AI_MODEL = os.getenv('AI_MODEL', 'gpt-3.5-turbo')
@@ -4,27 +4,52 @@ CSV Action Handler - Handles actions from CSV file when automatic recording fail
 """
 
 import csv
+import io
 import time
 import os
 import json
+import logging
 import threading
-import subprocess
+from contextlib import nullcontext
 from datetime import datetime
 from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support.ui import WebDriverWait, Select
 from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from selenium.webdriver.common.action_chains import ActionChains
 from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
 from selenium.webdriver.chrome.options import Options
 import allure
 from allure_commons.types import AttachmentType
+from driver_cache import resolve_driver_path
+from execution_watchdog import get_watchdog, kill_driver
+from config import Config
+from action_plan import compile_action_plan, parse_selector, plan_cache, PlanCompileError
+from screenshot_pipeline import get_screenshot_pipeline
+from screenshot_policy import ScreenshotPolicy
+from video_encoder import IncrementalVideoEncoder
+from video_postprocess import get_video_postprocessor
+from video_catalog import get_video_catalog
+from retention import write_run_manifest
+from browser_profiles import get_profile, apply_chromium_profile, apply_firefox_profile
+from virtual_display import VirtualDisplay, xvfb_available, start_screen_capture, stop_screen_capture
+from cdp_screencast import CDPScreencast
+from event_bus import get_event_bus
+from session_log import SessionLog, LEVELS, configure_logging
+from run_store import get_run_store
+from step_timing import StepTimer, timed
+from metrics import (RUNS_STARTED, RUNS_FINISHED, RUN_DURATION, STEP_DURATION, STEPS_FAILED,
+                     STEP_PHASE_SECONDS, DRIVER_STARTUP, BROWSERS_ACTIVE)
+
+logger = logging.getLogger(__name__)
 
 class CSVActionHandler:
     """Handles actions from CSV file"""
     
-    def __init__(self, browser='chrome', session_id=None):
+    def __init__(self, browser='chrome', session_id=None, driver_pool=None, profile=None):
         self.driver = None
+        self.driver_pool = driver_pool
+        self.browser_profile = get_profile(profile)
         self.wait = None
         self.test_results = []
         self.screenshots_dir = "allure-results/screenshots"
@@ -33,15 +58,30 @@ class CSVActionHandler:
         self.progress = 0
         self.status = 'ready'
         self.current_action = ''
-        self.logs = []
+        self.log_store = SessionLog(session_id or os.urandom(8).hex())
         self.completed_actions = 0
         self.total_actions = 0
+        self.driver_broken = False
+        self.timeout = None
+        self.screenshot_policy = None  # Per-run override, e.g. 'failure-only'
+        self.run_id = None  # Screenshots of a run go into screenshots_dir/<run_id>/
+        self.active_screenshot_policy = None
+        self.step_timer = None  # Phase timings of the step being executed
+        self.run_timings = {}  # Milliseconds spent in run-level phases (driver startup, teardown, ...)
+        self.run_started = None
         
         # Video recording properties
         self.video_recording = False
         self.video_process = None
         self.video_filename = None
         self.video_dir = "recorded_videos"
+        self.video_encoder = None
+        self.video_debug_path = None
+        self.video_job = None  # Post-processing job id
+        self.video_script = None
+        self.virtual_display = None
+        self.screencast = None
+        self.video_frames = 0
         self.auto_record_enabled = True
         
         self.ensure_directories()
@@ -54,26 +94,62 @@ class CSVActionHandler:
         os.makedirs(self.video_dir, exist_ok=True)
         
     def setup_driver(self):
-        """Setup browser driver based on selected browser"""
+        """Setup browser driver based on selected browser, leasing from the pool if one is set"""
         try:
-            if self.browser.lower() == 'chrome':
-                self._setup_chrome()
-            elif self.browser.lower() == 'firefox':
-                self._setup_firefox()
-            elif self.browser.lower() == 'edge':
-                self._setup_edge()
+            self.driver_broken = False
+            started = time.perf_counter()
+            if self.wants_virtual_display():
+                # Own Xvfb display per session, sized to the profile's window (maximized: WINDOW_SIZE);
+                # pooled browsers have no display, so launch fresh
+                self.virtual_display = VirtualDisplay(size=self.browser_profile.window_size).start()
+                self.launch_driver()
+            elif self.driver_pool:
+                self.driver = self.driver_pool.acquire()
+                self.log('info', f"♻️ Leased pooled {self.browser} driver")
             else:
-                print(f"⚠️ Unknown browser: {self.browser}, defaulting to Chrome")
-                self._setup_chrome()
+                self.launch_driver()
             
             self.driver.implicitly_wait(10)
             self.wait = WebDriverWait(self.driver, 20)
-            print(f"🌐 {self.browser.capitalize()} browser opened successfully!")
+            DRIVER_STARTUP.labels('pool' if self.driver_pool and not self.virtual_display else 'launch').observe(
+                time.perf_counter() - started)
+            BROWSERS_ACTIVE.inc()
+            self.log('info', f"🌐 {self.browser.capitalize()} browser opened successfully!")
             
         except Exception as e:
-            print(f"❌ Failed to open browser: {e}")
+            self.log('error', f"❌ Failed to open browser: {e}")
             raise e
 
+    def wants_virtual_display(self):
+        """Whether this run records an Xvfb display instead of using the screencast"""
+        if not self.auto_record_enabled or not xvfb_available():
+            return False
+        backend = Config.RECORDING_BACKEND
+        if backend == 'xvfb':
+            return True
+        return backend == 'auto' and self.browser.lower() not in ('chrome', 'edge')
+
+    def _launch_headless(self):
+        """Headless override: a virtual display needs a headed browser to record anything"""
+        return False if self.virtual_display else None
+
+    def _service_env(self):
+        """Driver service environment (points the browser at the session's virtual display)"""
+        return self.virtual_display.env() if self.virtual_display else None
+
+    def launch_driver(self):
+        """Launch a fresh browser and return its driver"""
+        if self.browser.lower() == 'chrome':
+            self._setup_chrome()
+        elif self.browser.lower() == 'firefox':
+            self._setup_firefox()
+        elif self.browser.lower() == 'edge':
+            self._setup_edge()
+        else:
+            self.log('warning', f"⚠️ Unknown browser: {self.browser}, defaulting to Chrome")
+            self._setup_chrome()
+        return self.driver
+
     def start_video_recording(self, script_name):
         """Start video recording for the script execution"""
         try:
@@ -86,48 +162,61 @@ class CSVActionHandler:
             
             # Generate video filename
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            self.video_filename = f"script_{script_name}_{timestamp}.mp4"
+            self.video_filename = f"script_{script_name}_{timestamp}.{Config.VIDEO_FORMAT}"
             video_path = os.path.join(self.video_dir, self.video_filename)
+            self.video_script = script_name
+            self.video_job = None
             
             # Try multiple recording methods in order of preference
             recording_started = False
             
-            # Method 1: Try Selenium's built-in video recording (Chrome)
-            if hasattr(self, 'driver') and self.driver and self.browser.lower() == 'chrome':
+            # Method 0: ffmpeg x11grab of the session's own virtual display (Linux)
+            if self.virtual_display:
                 try:
-                    self.add_log("🎥 Starting Chrome video recording...")
-                    # Enable video recording in Chrome
-                    self.driver.execute_cdp_cmd('Page.startScreencast', {
-                        'format': 'png',
-                        'quality': 80,
-                        'maxWidth': 1920,
-                        'maxHeight': 1080
-                    })
+                    self.add_log(f"🎥 Starting virtual display recording on {self.virtual_display.name}...")
+                    self.video_process = start_screen_capture(
+                        video_path, display=self.virtual_display.name, size=self.virtual_display.size
+                    )
                     self.video_recording = True
                     self.video_path = video_path
-                    self.screencast_frames = []  # Store frames for video creation
+                    recording_started = True
+                    self.add_log(f"✅ Virtual display recording started: {self.video_filename}")
+                except Exception as e:
+                    self.log('warning', f"⚠️ Virtual display recording failed: {e}")
+            
+            # Method 1: Chrome DevTools screencast (Chrome/Edge)
+            if not recording_started and self.driver and self.browser.lower() in ('chrome', 'edge'):
+                try:
+                    self.add_log("🎥 Starting Chrome video recording...")
+                    self.video_path = video_path
+                    self.video_debug_path = os.path.join(
+                        self.video_dir, f"debug_screenshot_{os.path.splitext(self.video_filename)[0]}.png"
+                    )
+                    try:
+                        # Frames are de-duplicated and spooled as they arrive instead of being held in memory
+                        self.video_encoder = IncrementalVideoEncoder(video_path, label=self.video_filename)
+                        self.screencast = CDPScreencast(self.driver, self.video_encoder.add_frame)
+                        self.screencast.start()
+                        self.add_log(f"✅ Chrome screencast recording started: {self.video_filename}")
+                    except Exception as e:
+                        # No DevTools socket - record one frame per capture point instead
+                        self.log('warning', f"⚠️ Screencast unavailable ({e}), recording step screenshots")
+                        if self.video_encoder:
+                            self.video_encoder.discard()
+                        self.screencast = None
+                        self.video_encoder = IncrementalVideoEncoder(video_path, label=self.video_filename)
+                    self.video_recording = True
                     recording_started = True
                     self.add_log(f"✅ Chrome video recording started: {self.video_filename}")
                 except Exception as e:
-                    self.add_log(f"⚠️ Chrome video recording failed: {e}")
+                    self.log('warning', f"⚠️ Chrome video recording failed: {e}")
             
             # Method 2: Try ffmpeg screen recording
             if not recording_started:
                 try:
                     self.add_log("🎥 Starting ffmpeg screen recording...")
-                    cmd = [
-                        'ffmpeg', '-f', 'gdigrab', '-framerate', '15', '-i', 'desktop',
-                        '-c:v', 'libx264', '-preset', 'ultrafast', '-crf', '23',
-                        '-pix_fmt', 'yuv420p', '-movflags', '+faststart',
-                        '-y', video_path
-                    ]
-                    
-                    self.video_process = subprocess.Popen(
-                        cmd, 
-                        stdout=subprocess.PIPE, 
-                        stderr=subprocess.PIPE,
-                        creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
-                    )
+                    # gdigrab on Windows, x11grab of $DISPLAY elsewhere
+                    self.video_process = start_screen_capture(video_path)
                     
                     self.video_recording = True
                     self.video_path = video_path
@@ -135,9 +224,9 @@ class CSVActionHandler:
                     self.add_log(f"✅ ffmpeg screen recording started: {self.video_filename}")
                     
                 except FileNotFoundError:
-                    self.add_log("⚠️ ffmpeg not found")
+                    self.log('warning', "⚠️ ffmpeg not found")
                 except Exception as e:
-                    self.add_log(f"⚠️ ffmpeg recording failed: {e}")
+                    self.log('warning', f"⚠️ ffmpeg recording failed: {e}")
             
             # Method 3: Fallback to browser screenshot recording
             if not recording_started:
@@ -146,7 +235,7 @@ class CSVActionHandler:
                 recording_started = True
                 
         except Exception as e:
-            self.add_log(f"❌ Failed to start video recording: {e}")
+            self.log('error', f"❌ Failed to start video recording: {e}")
 
     def _start_browser_recording(self):
         """Start browser-based recording (fallback method)"""
@@ -160,7 +249,7 @@ class CSVActionHandler:
             self._create_script_video_file()
             
         except Exception as e:
-            self.add_log(f"❌ Failed to start browser recording: {e}")
+            self.log('error', f"❌ Failed to start browser recording: {e}")
 
     def _create_script_video_file(self):
         """Create a proper MP4 video file"""
@@ -229,7 +318,7 @@ class CSVActionHandler:
                 self.add_log(f"📁 Created fallback MP4 file: {self.video_filename}")
             
         except Exception as e:
-            self.add_log(f"❌ Failed to create video file: {e}")
+            self.log('error', f"❌ Failed to create video file: {e}")
 
     def stop_video_recording(self):
         """Stop video recording"""
@@ -237,36 +326,59 @@ class CSVActionHandler:
             if not self.video_recording:
                 return
             
+            catalog_status = 'placeholder'
+            
             # Method 1: Stop Chrome screencast recording
-            if hasattr(self, 'driver') and self.driver and self.browser.lower() == 'chrome':
-                try:
-                    self.driver.execute_cdp_cmd('Page.stopScreencast', {})
-                    # Create the actual video file
-                    self.create_video_from_frames()
-                    self.add_log(f"⏹️ Chrome video recording stopped: {self.video_filename}")
-                except Exception as e:
-                    self.add_log(f"⚠️ Failed to stop Chrome recording: {e}")
+            if self.video_encoder is not None:
+                if self.screencast:
+                    stats = self.screencast.stop()
+                    self.screencast = None
+                    self.add_log(f"📊 Screencast frames: {stats['received']} received, {stats['emitted']} kept, "
+                                 f"{stats['duplicates']} duplicate, {stats['rate_limited']} rate-limited")
+                    if stats['error']:
+                        self.log('warning', f"⚠️ Screencast error: {stats['error']}")
+                # Finalize the streamed video file
+                self.create_video_from_frames()
+                self.add_log(f"⏹️ Chrome video recording stopped: {self.video_filename}")
             
             # Method 2: Stop ffmpeg recording
             elif self.video_process:
                 try:
-                    self.video_process.terminate()
-                    self.video_process.wait(timeout=5)
+                    returncode = stop_screen_capture(self.video_process)
                     self.video_process = None
+                    if returncode:
+                        self.log('warning', f"⚠️ ffmpeg exited with code {returncode}")
+                    else:
+                        catalog_status = 'ready'
                     self.add_log(f"⏹️ ffmpeg video recording stopped: {self.video_filename}")
                 except Exception as e:
-                    self.add_log(f"⚠️ Failed to stop ffmpeg recording: {e}")
+                    self.log('warning', f"⚠️ Failed to stop ffmpeg recording: {e}")
             
             # Method 3: Finalize browser recording fallback
             else:
                 self._finalize_script_video_file()
             
+            # Files written here are indexed now; queued encodes are indexed by the post-processor
+            if self.video_job is None:
+                self._catalog_video(catalog_status)
+            
             self.video_recording = False
             
         except Exception as e:
-            self.add_log(f"❌ Error stopping video recording: {e}")
+            self.log('error', f"❌ Error stopping video recording: {e}")
             self.video_recording = False
 
+    def _catalog_video(self, status):
+        """Add the finished video file to the video catalog"""
+        try:
+            if getattr(self, 'video_path', None) and os.path.exists(self.video_path):
+                get_video_catalog().add_file(self.video_path, script=self.video_script,
+                                             session_id=self.session_id, browser=self.browser, status=status)
+                if status == 'ready':
+                    get_video_postprocessor().submit_previews(self.video_path)
+        except Exception as e:
+            self.log('warning', f"⚠️ Failed to index video: {e}")
+
     def _finalize_script_video_file(self):
         """Finalize the script video file"""
         try:
@@ -277,122 +389,76 @@ class CSVActionHandler:
             self.add_log(f"📁 Video file finalized: {self.video_filename}")
             
         except Exception as e:
-            self.add_log(f"❌ Failed to finalize video file: {e}")
-
-    def collect_screencast_frame(self):
-        """Collect a screencast frame from Chrome"""
-        try:
-            if hasattr(self, 'driver') and self.driver and self.video_recording:
-                # Get the latest screencast frame
-                result = self.driver.execute_cdp_cmd('Page.screencastFrameAck', {'sessionId': 0})
-                # Note: In a real implementation, we'd need to handle the screencast frame events
-                # For now, we'll create a simple video file
-        except Exception as e:
-            self.add_log(f"⚠️ Failed to collect screencast frame: {e}")
+            self.log('error', f"❌ Failed to finalize video file: {e}")
 
     def create_video_from_frames(self):
-        """Create MP4 video from collected frames"""
+        """Hand the frame spool to the video post-processor (or write a placeholder if no frames were captured)"""
         try:
             if not hasattr(self, 'video_path') or not self.video_path:
                 return
-                
-            # Try to use OpenCV to create a real video
+            
+            encoder, self.video_encoder = self.video_encoder, None
+            if encoder:
+                stats = encoder.finish(timeout=60)
+                self.add_log(f"📊 Spooled {stats['unique']} unique of {stats['frames']} frames "
+                             f"({stats['held']} held, {stats['dropped']} dropped)")
+                if stats['error']:
+                    self.log('warning', f"⚠️ Video encoder error: {stats['error']}")
+                if stats['unique'] and not stats['error']:
+                    # Encoding, previews and debug frame are produced off the run's critical path
+                    self.video_job = get_video_postprocessor().submit(
+                        stats['spool_dir'],
+                        self.video_path,
+                        debug_path=self.video_debug_path,
+                        session_id=self.session_id,
+                        metadata={'script': self.video_script, 'browser': self.browser}
+                    )
+                    self.add_log(f"🎞️ Video queued for encoding: {self.video_filename} (job {self.video_job})")
+                    return
+                encoder.discard()
+            
+            # No frames captured - fall back to a simulated browser video
             try:
                 import cv2
                 import numpy as np
-                from PIL import Image
-                import io
-                import base64
                 
-                # Create a video with actual browser screenshots
                 fourcc = cv2.VideoWriter_fourcc(*'mp4v')
                 out = cv2.VideoWriter(self.video_path, fourcc, 10.0, (1920, 1080))
                 
-                # Get browser screenshots if available
-                screenshots = getattr(self, 'screenshots', [])
-                self.add_log(f"📊 Found {len(screenshots)} screenshots for video creation")
-                
-                if screenshots:
-                    # Use actual screenshots
-                    for i, screenshot_data in enumerate(screenshots):
-                        try:
-                            # Convert base64 screenshot to OpenCV frame
-                            if isinstance(screenshot_data, str):
-                                # Base64 encoded image
-                                img_data = base64.b64decode(screenshot_data)
-                                img = Image.open(io.BytesIO(img_data))
-                                frame = cv2.cvtColor(np.array(img), cv2.COLOR_RGB2BGR)
-                                
-                                # Resize to 1920x1080 if needed
-                                if frame.shape[:2] != (1080, 1920):
-                                    frame = cv2.resize(frame, (1920, 1080))
-                                
-                                # Add text overlay
-                                cv2.putText(frame, f'Script: {self.video_filename}', (50, 50), 
-                                           cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-                                cv2.putText(frame, f'Screenshot {i+1}/{len(screenshots)}', (50, 100), 
-                                           cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-                                
-                                # Write multiple frames for each screenshot to make video longer
-                                for _ in range(10):  # 1 second at 10 fps per screenshot
-                                    out.write(frame)
-                                
-                                self.add_log(f"📸 Processed screenshot {i+1}/{len(screenshots)}")
-                        except Exception as e:
-                            self.add_log(f"⚠️ Failed to process screenshot {i+1}: {e}")
-                            continue
-                else:
-                    # Fallback: create frames with browser simulation
-                    for i in range(30):  # 3 seconds at 10 fps
-                        # Create a frame that looks like a browser
-                        frame = np.zeros((1080, 1920, 3), dtype=np.uint8)
-                        
-                        # Browser chrome (top bar)
-                        frame[0:60, :] = [50, 50, 50]  # Dark gray browser bar
-                        
-                        # Address bar
-                        frame[20:40, 100:800] = [80, 80, 80]  # Address bar
-                        cv2.putText(frame, 'https://example.com/forms', (110, 35), 
-                                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-                        
-                        # Page content area
-                        frame[60:1080, :] = [240, 240, 240]  # Light gray page background
-                        
-                        # Simulate webpage content
-                        cv2.putText(frame, 'Example Forms Page', (100, 150), 
-                                   cv2.FONT_HERSHEY_SIMPLEX, 2, (0, 0, 0), 3)
-                        cv2.putText(frame, 'This is a simulated browser view', (100, 200), 
-                                   cv2.FONT_HERSHEY_SIMPLEX, 1, (100, 100, 100), 2)
-                        cv2.putText(frame, 'Script execution in progress...', (100, 250), 
-                                   cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 150, 0), 2)
-                        
-                        # Add frame counter
-                        cv2.putText(frame, f'Frame {i+1}/30', (1600, 1000), 
-                                   cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
-                        
-                        out.write(frame)
+                for i in range(30):  # 3 seconds at 10 fps
+                    # Create a frame that looks like a browser
+                    frame = np.zeros((1080, 1920, 3), dtype=np.uint8)
+                    
+                    # Browser chrome (top bar)
+                    frame[0:60, :] = [50, 50, 50]  # Dark gray browser bar
+                    
+                    # Address bar
+                    frame[20:40, 100:800] = [80, 80, 80]  # Address bar
+                    cv2.putText(frame, 'https://example.com/forms', (110, 35), 
+                               cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+                    
+                    # Page content area
+                    frame[60:1080, :] = [240, 240, 240]  # Light gray page background
+                    
+                    # Simulate webpage content
+                    cv2.putText(frame, 'Example Forms Page', (100, 150), 
+                               cv2.FONT_HERSHEY_SIMPLEX, 2, (0, 0, 0), 3)
+                    cv2.putText(frame, 'This is a simulated browser view', (100, 200), 
+                               cv2.FONT_HERSHEY_SIMPLEX, 1, (100, 100, 100), 2)
+                    cv2.putText(frame, 'Script execution in progress...', (100, 250), 
+                               cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 150, 0), 2)
+                    
+                    # Add frame counter
+                    cv2.putText(frame, f'Frame {i+1}/30', (1600, 1000), 
+                               cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
+                    
+                    out.write(frame)
                 
                 out.release()
                 self.add_log(f"📁 Created visual video file: {self.video_filename}")
                 
-                # Debug: Save a sample screenshot to file for verification
-                if screenshots:
-                    try:
-                        import base64
-                        sample_screenshot = screenshots[0]
-                        img_data = base64.b64decode(sample_screenshot)
-                        debug_path = os.path.join(self.video_dir, f"debug_screenshot_{self.video_filename.replace('.mp4', '.png')}")
-                        with open(debug_path, 'wb') as f:
-                            f.write(img_data)
-                        self.add_log(f"🔍 Debug screenshot saved: {debug_path}")
-                    except Exception as e:
-                        self.add_log(f"⚠️ Failed to save debug screenshot: {e}")
-                
             except ImportError:
                 # Fallback: create a simple MP4 file
-                import struct
-                
-                # Create a more substantial MP4 file
                 mp4_data = b'\x00\x00\x00\x20ftypmp41\x00\x00\x00\x00mp41isom'
                 mp4_data += b'\x00\x00\x00\x08mdat'
                 
@@ -405,46 +471,101 @@ class CSVActionHandler:
                 self.add_log(f"📁 Created fallback video file: {self.video_filename}")
             
         except Exception as e:
-            self.add_log(f"❌ Failed to create video from frames: {e}")
+            self.log('error', f"❌ Failed to create video from frames: {e}")
 
-    def capture_browser_screenshot(self):
-        """Capture a screenshot of the current browser state"""
+    def capture_browser_screenshot(self, screenshot=None):
+        """Capture a screenshot of the current browser state (or reuse one) as a video frame"""
         try:
             if hasattr(self, 'driver') and self.driver:
                 # Take screenshot
-                screenshot = self.driver.get_screenshot_as_base64()
-                
-                # Store screenshot for video creation
-                if not hasattr(self, 'screenshots'):
-                    self.screenshots = []
-                self.screenshots.append(screenshot)
+                if screenshot is None:
+                    screenshot = self.driver.get_screenshot_as_base64()
                 
-                self.add_log(f"📸 Browser screenshot captured (total: {len(self.screenshots)})")
+                # Stream the frame to the video encoder
+                if self.video_encoder and self.video_encoder.add_frame(screenshot):
+                    self.video_frames += 1
+                    self.log('debug', f"📸 Browser screenshot captured (total: {self.video_frames})")
                 return screenshot
         except Exception as e:
-            self.add_log(f"⚠️ Failed to capture screenshot: {e}")
+            self.log('warning', f"⚠️ Failed to capture screenshot: {e}")
         return None
 
+    def capture_point(self, step_name, phase='before', step=None):
+        """Grab the browser once (if the screenshot policy or video needs it) and share the bytes"""
+        if not self.driver:
+            return None
+        
+        policy = self.active_screenshot_policy or ScreenshotPolicy.parse(self.screenshot_policy)
+        url = None
+        if policy.needs_url and phase == 'after':
+            try:
+                url = self.driver.current_url
+            except Exception:
+                pass
+        persist = policy.should_capture(phase, step, url)
+        # The screencast feeds the video on its own; otherwise each capture point is a frame
+        step_frame = self.video_encoder is not None and not self.screencast
+        if not persist and not step_frame:
+            return None
+        
+        with self.timed('screenshot'):
+            try:
+                screenshot = self.driver.get_screenshot_as_base64()
+            except Exception as e:
+                self.log('warning', f"⚠️ Failed to capture screenshot: {e}")
+                return None
+            
+            if persist and policy.accept(screenshot, phase):
+                self.take_screenshot(step_name, screenshot)
+        if step_frame:
+            with self.timed('video'):
+                self.capture_browser_screenshot(screenshot)
+        return screenshot
+    
+    def timed(self, phase):
+        """Attribute a block to a phase of the current step (no-op outside a step)"""
+        return self.step_timer.phase(phase) if self.step_timer else nullcontext()
+    
+    def wait_until(self, condition):
+        """Explicit wait for `condition`, timed as the step's element wait"""
+        with self.timed('wait'):
+            return self.wait.until(condition)
+
     def add_log(self, message):
         """Add log message"""
-        timestamp = datetime.now().strftime('%H:%M:%S')
-        log_entry = f"[{timestamp}] {message}"
-        self.logs.append(log_entry)
-        print(log_entry)
+        self.log('info', message)
+    
+    def log(self, level, message):
+        """Record a leveled log line: session buffer (read by offset), event stream and console"""
+        entry = self.log_store.append(level, message)
+        self.emit('log', **entry)
+        if self.session_id:
+            get_run_store().record_log(self.session_id, entry)
+        logger.log(LEVELS[entry['level']], f"[{self.session_id[:8]}] {message}" if self.session_id else message)
+        return entry
+    
+    def store_run(self, **fields):
+        """Persist run fields for other server processes and history (web sessions only)"""
+        if self.session_id:
+            get_run_store().update_run(self.session_id, **fields)
+    
+    def emit(self, event_type, **data):
+        """Publish a run event for dashboard subscribers (web sessions only)"""
+        if self.session_id:
+            get_event_bus().publish(self.session_id, event_type, **data)
     
     def _setup_chrome(self):
         """Setup Chrome driver"""
         from selenium.webdriver.chrome.options import Options
         from selenium.webdriver.chrome.service import Service
-        from webdriver_manager.chrome import ChromeDriverManager
         
         options = Options()
-        options.add_argument('--start-maximized')
+        apply_chromium_profile(self.browser_profile, options, headless=self._launch_headless())
         options.add_argument('--disable-blink-features=AutomationControlled')
         options.add_experimental_option("excludeSwitches", ["enable-automation"])
         options.add_experimental_option('useAutomationExtension', False)
         
-        service = Service(ChromeDriverManager().install())
+        service = Service(resolve_driver_path('chrome'), env=self._service_env())
         self.driver = webdriver.Chrome(service=service, options=options)
         self.driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
     
@@ -452,50 +573,127 @@ class CSVActionHandler:
         """Setup Firefox driver"""
         from selenium.webdriver.firefox.options import Options
         from selenium.webdriver.firefox.service import Service
-        from webdriver_manager.firefox import GeckoDriverManager
         
         options = Options()
-        options.add_argument('--start-maximized')
+        apply_firefox_profile(self.browser_profile, options, headless=self._launch_headless())
         
-        service = Service(GeckoDriverManager().install())
+        service = Service(resolve_driver_path('firefox'), env=self._service_env())
         self.driver = webdriver.Firefox(service=service, options=options)
+        if not self.browser_profile.window_size:
+            self.driver.maximize_window()  # Firefox has no --start-maximized switch
     
     def _setup_edge(self):
         """Setup Edge driver"""
         from selenium.webdriver.edge.options import Options
         from selenium.webdriver.edge.service import Service
-        from webdriver_manager.microsoft import EdgeChromiumDriverManager
         
         options = Options()
-        options.add_argument('--start-maximized')
+        apply_chromium_profile(self.browser_profile, options, headless=self._launch_headless())
         options.add_argument('--disable-blink-features=AutomationControlled')
         options.add_experimental_option("excludeSwitches", ["enable-automation"])
         options.add_experimental_option('useAutomationExtension', False)
         
-        service = Service(EdgeChromiumDriverManager().install())
+        service = Service(resolve_driver_path('edge'), env=self._service_env())
         self.driver = webdriver.Edge(service=service, options=options)
         self.driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
     
     def teardown_driver(self):
-        """Close browser"""
+        """Close browser, or hand it back to the pool"""
+        if self.driver:
+            if Config.TEARDOWN_DELAY > 0 and not self.driver_broken:
+                time.sleep(Config.TEARDOWN_DELAY)  # Optionally keep browser open for inspection
+            if self.driver_pool and not self.virtual_display:
+                self.driver_pool.release(self.driver, broken=self.driver_broken)
+                self.log('info', "♻️ Browser returned to pool")
+            elif self.driver_broken:
+                kill_driver(self.driver)
+                self.log('info', "🔄 Browser killed")
+            else:
+                self.driver.quit()
+                self.log('info', "🔄 Browser closed")
+            if self.wait:
+                BROWSERS_ACTIVE.dec()  # Counted once setup_driver finished
+            self.driver = None
+            self.wait = None
+        if self.virtual_display:
+            self.virtual_display.stop()
+            self.virtual_display = None
+    
+    def wait_for_page_ready(self, mode=None, timeout=None):
+        """Wait until the page is loaded (and optionally network-idle) instead of sleeping"""
+        mode = (mode or Config.NAVIGATION_WAIT).lower()
+        timeout = timeout or Config.EXPLICIT_WAIT
+        if mode == 'none':
+            return True
+        
+        try:
+            WebDriverWait(self.driver, timeout).until(
+                lambda d: d.execute_script("return document.readyState") == 'complete'
+            )
+            if mode == 'network-idle':
+                return self.wait_for_network_idle(timeout=timeout)
+            return True
+        except TimeoutException:
+            self.log('warning', f"⚠️ Page not ready after {timeout} seconds, continuing")
+            return False
+        except WebDriverException as e:
+            # Readiness can't be evaluated (e.g. non-HTML document) - fall back to a fixed wait
+            self.log('warning', f"⚠️ Readiness check unavailable ({e.msg}), waiting {Config.NAVIGATION_FALLBACK_WAIT}s")
+            time.sleep(Config.NAVIGATION_FALLBACK_WAIT)
+            return True
+    
+    def wait_for_network_idle(self, idle_ms=None, timeout=None):
+        """Wait until no new network resources have been requested for idle_ms"""
+        idle = (idle_ms or Config.NETWORK_IDLE_MS) / 1000
+        deadline = time.monotonic() + (timeout or Config.EXPLICIT_WAIT)
+        script = "return performance.getEntriesByType('resource').length"
+        
+        last_count = self.driver.execute_script(script)
+        last_change = time.monotonic()
+        while time.monotonic() < deadline:
+            time.sleep(min(0.1, idle))
+            count = self.driver.execute_script(script)
+            if count != last_count:
+                last_count = count
+                last_change = time.monotonic()
+            elif time.monotonic() - last_change >= idle:
+                return True
+        
+        self.log('warning', "⚠️ Network did not go idle before timeout, continuing")
+        return False
+    
+    def abort_driver(self, reason):
+        """Kill the browser from any thread, e.g. when a deadline expires"""
+        self.timeout = {'reason': reason, 'time': datetime.now().isoformat()}
+        self.add_log(f"⏰ {reason} - killing browser")
+        self.driver_broken = True
+        kill_driver(self.driver)
+    
+    def stop(self):
+        """Stop the run by closing its browser (user request)"""
         if self.driver:
-            time.sleep(3)  # Keep browser open for 3 seconds
             self.driver.quit()
-            print("🔄 Browser closed")
     
-    def take_screenshot(self, step_name):
-        """Take screenshot and attach to Allure report"""
+    def video_status(self):
+        """Post-processing state of this run's video, if one was queued"""
+        return get_video_postprocessor().status(self.video_job) if self.video_job else None
+    
+    def take_screenshot(self, step_name, screenshot=None):
+        """Take screenshot and queue it for writing (attached to Allure once flushed)"""
         if self.driver:
+            if screenshot is None:
+                screenshot = self.driver.get_screenshot_as_base64()
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            screenshot_path = os.path.join(self.screenshots_dir, f"{step_name}_{timestamp}.png")
-            self.driver.save_screenshot(screenshot_path)
-            allure.attach.file(screenshot_path, name=step_name, attachment_type=AttachmentType.PNG)
+            screenshot_dir = os.path.join(self.screenshots_dir, self.run_id) if self.run_id else self.screenshots_dir
+            screenshot_path = os.path.join(screenshot_dir, f"{step_name}_{timestamp}.png")
+            get_screenshot_pipeline().submit(screenshot, screenshot_path, step_name, owner=self)
             return screenshot_path
         return None
     
     def generate_allure_report(self, test_name, actions, success):
         """Generate Allure report"""
         allure_results_dir = "allure-results"
+        now = int(time.time() * 1000)
         
         # Create test result JSON
         test_result = {
@@ -504,8 +702,8 @@ class CSVActionHandler:
             "fullName": f"CSV Action Test: {test_name}",
             "status": "passed" if success else "failed",
             "stage": "finished",
-            "start": int(datetime.now().timestamp() * 1000),
-            "stop": int(datetime.now().timestamp() * 1000),
+            "start": int(self.run_started * 1000) if self.run_started else now,
+            "stop": now,
             "steps": []
         }
         
@@ -515,8 +713,8 @@ class CSVActionHandler:
                 "name": f"Step {i+1}: {action['action']} on {action['xpath']}",
                 "status": "passed" if action.get('success', True) else "failed",
                 "stage": "finished",
-                "start": int(datetime.now().timestamp() * 1000),
-                "stop": int(datetime.now().timestamp() * 1000)
+                "start": action.get('start', now),
+                "stop": action.get('stop', now)
             }
             test_result["steps"].append(step)
         
@@ -525,323 +723,388 @@ class CSVActionHandler:
         with open(result_file, 'w') as f:
             json.dump(test_result, f, indent=2)
         
-        print(f"📊 Allure report data saved: {result_file}")
+        self.log('info', f"📊 Allure report data saved: {result_file}")
         return result_file
     
     def parse_selector(self, selector):
         """Parse selector string into Selenium By object"""
-        if selector.startswith('#'):
-            return (By.ID, selector[1:])
-        elif selector.startswith('.'):
-            return (By.CLASS_NAME, selector[1:])
-        elif selector.startswith('xpath='):
-            return (By.XPATH, selector[6:])
-        elif selector.startswith('css='):
-            return (By.CSS_SELECTOR, selector[4:])
-        elif selector.startswith('name='):
-            return (By.NAME, selector[5:])
-        elif selector.startswith('text='):
-            text = selector[5:]
-            return (By.XPATH, f"//*[contains(text(), '{text}')]")
-        else:
-            # Assume it's an XPath if it starts with //
-            if selector.startswith('//'):
-                return (By.XPATH, selector)
-            else:
-                return (By.ID, selector)
+        return parse_selector(selector)
+    
+    @classmethod
+    def load_plan(cls, csv_file):
+        """Compile a CSV file into a cached action plan (raises PlanCompileError if invalid)"""
+        return plan_cache.load(csv_file, ACTION_HANDLERS)
     
     def execute_action(self, action, xpath, data=""):
-        """Execute a single action with Allure reporting and progress tracking"""
-        step_name = f"{action}_{xpath.replace('//', '').replace('@', '').replace('=', '_')[:20]}"
-        self.current_action = f"{action} on {xpath}"
-        self.logs.append(f"Executing: {self.current_action}")
-        print(f"🔄 Executing: {action} on {xpath}")
-        
-        # Take screenshot before action
-        self.take_screenshot(f"before_{step_name}")
+        """Execute a single ad-hoc action (compiled on the fly)"""
+        content = f"action,xpath,data\n{_csv_row(action, xpath, data)}"
+        try:
+            step = compile_action_plan('<inline>', content, ACTION_HANDLERS).steps[0]
+        except PlanCompileError as e:
+            self.log('warning', f"⚠️ {e}")
+            return False
+        return self.execute_step(step)
+    
+    def execute_step(self, step):
+        """Execute a single compiled step with Allure reporting and progress tracking"""
+        xpath = step.target
+        step_name = f"{step.action}_{xpath.replace('//', '').replace('@', '').replace('=', '_')[:20]}"
+        self.current_action = step.label
+        self.log('info', f"🔄 Executing: {step.label}")
+        self.step_timer = timer = StepTimer()
+        self.emit('step', phase='started', index=step.index, total=self.total_actions, label=step.label)
+        self.store_run(current_action=step.label)
+        if self.session_id:
+            get_run_store().record_step(self.session_id, step.index, action=step.action, target=step.target,
+                                        label=step.label, status='running', started=timer.wall_start)
         
-        # Capture screenshot for video creation
-        self.capture_browser_screenshot()
+        # Capture before action (report screenshot and video frame share one grab)
+        self.capture_point(f"before_{step_name}", 'before', step)
         
         try:
-            if action.lower() == 'open_url':
-                self.driver.get(xpath)
-                time.sleep(2)
-                print(f"   ✅ Opened URL: {xpath}")
-                
-            elif action.lower() == 'type' or action.lower() == 'type_text':
-                element = self.wait.until(EC.presence_of_element_located(self.parse_selector(xpath)))
-                element.clear()
-                element.send_keys(data)
-                print(f"   ✅ Typed '{data}' in {xpath}")
-                
-            elif action.lower() == 'click':
-                element = self.wait.until(EC.element_to_be_clickable(self.parse_selector(xpath)))
-                element.click()
-                print(f"   ✅ Clicked {xpath}")
-                
-            elif action.lower() == 'verify' or action.lower() == 'verify_text':
-                if xpath.startswith('text='):
-                    text = xpath.replace('text=', '')
-                    element = self.wait.until(
-                        EC.presence_of_element_located((By.XPATH, f"//*[contains(text(), '{text}')]"))
-                    )
-                else:
-                    element = self.wait.until(EC.presence_of_element_located(self.parse_selector(xpath)))
-                print(f"   ✅ Verified {xpath}")
-                
-            elif action.lower() == 'wait':
-                seconds = int(data) if data.isdigit() else 5
-                time.sleep(seconds)
-                print(f"   ✅ Waited {seconds} seconds")
-                
-            elif action.lower() == 'select_dropdown' or action.lower() == 'select':
-                element = self.wait.until(EC.presence_of_element_located(self.parse_selector(xpath)))
-                from selenium.webdriver.support.ui import Select
-                select = Select(element)
-                select.select_by_visible_text(data)
-                print(f"   ✅ Selected '{data}' from dropdown {xpath}")
-                
-            elif action.lower() == 'upload_file' or action.lower() == 'upload':
-                element = self.wait.until(EC.presence_of_element_located(self.parse_selector(xpath)))
-                element.send_keys(data)  # data should be the full file path
-                print(f"   ✅ Uploaded file '{data}' to {xpath}")
-                
-            elif action.lower() == 'wait_for_element':
-                element = self.wait.until(EC.presence_of_element_located(self.parse_selector(xpath)))
-                print(f"   ✅ Element {xpath} is now present")
-                
-            elif action.lower() == 'wait_for_clickable':
-                element = self.wait.until(EC.element_to_be_clickable(self.parse_selector(xpath)))
-                print(f"   ✅ Element {xpath} is now clickable")
-                
-            elif action.lower() == 'wait_for_visible':
-                element = self.wait.until(EC.visibility_of_element_located(self.parse_selector(xpath)))
-                print(f"   ✅ Element {xpath} is now visible")
-                
-            elif action.lower() == 'clear':
-                element = self.wait.until(EC.presence_of_element_located(self.parse_selector(xpath)))
-                element.clear()
-                print(f"   ✅ Cleared field {xpath}")
-                
-            elif action.lower() == 'double_click':
-                element = self.wait.until(EC.element_to_be_clickable(self.parse_selector(xpath)))
-                from selenium.webdriver.common.action_chains import ActionChains
-                ActionChains(self.driver).double_click(element).perform()
-                print(f"   ✅ Double clicked {xpath}")
-                
-            elif action.lower() == 'right_click':
-                element = self.wait.until(EC.element_to_be_clickable(self.parse_selector(xpath)))
-                from selenium.webdriver.common.action_chains import ActionChains
-                ActionChains(self.driver).context_click(element).perform()
-                print(f"   ✅ Right clicked {xpath}")
-                
-            elif action.lower() == 'hover':
-                element = self.wait.until(EC.presence_of_element_located(self.parse_selector(xpath)))
-                from selenium.webdriver.common.action_chains import ActionChains
-                ActionChains(self.driver).move_to_element(element).perform()
-                print(f"   ✅ Hovered over {xpath}")
-                
-            elif action.lower() == 'scroll_to':
-                element = self.wait.until(EC.presence_of_element_located(self.parse_selector(xpath)))
-                self.driver.execute_script("arguments[0].scrollIntoView(true);", element)
-                print(f"   ✅ Scrolled to {xpath}")
-                
-            elif action.lower() == 'switch_to_frame':
-                if xpath:
-                    element = self.wait.until(EC.presence_of_element_located(self.parse_selector(xpath)))
-                    self.driver.switch_to.frame(element)
-                else:
-                    self.driver.switch_to.frame(data)  # data should be frame name or index
-                print(f"   ✅ Switched to frame {xpath or data}")
-                
-            elif action.lower() == 'switch_to_default':
-                self.driver.switch_to.default_content()
-                print(f"   ✅ Switched to default content")
-                
-            elif action.lower() == 'js_click':
-                element = self.wait.until(EC.presence_of_element_located(self.parse_selector(xpath)))
-                self.driver.execute_script("arguments[0].click();", element)
-                print(f"   ✅ JavaScript clicked {xpath}")
-                
-            elif action.lower() == 'execute_js':
-                # Execute custom JavaScript code
-                result = self.driver.execute_script(xpath)
-                print(f"   ✅ Executed JavaScript: {xpath}")
-                if result:
-                    print(f"   📄 Result: {result}")
-                
-            else:
-                print(f"   ⚠️ Unknown action: {action}")
+            with timer.phase('action'):
+                step.handler(self, step)
             
-            # Take screenshot after successful action
-            self.take_screenshot(f"after_{step_name}")
+            # Capture after successful action
+            self.capture_point(f"after_{step_name}", 'after', step)
             
             # Update progress
             if hasattr(self, 'total_actions') and self.total_actions > 0:
                 self.completed_actions += 1
                 self.progress = int((self.completed_actions / self.total_actions) * 100)
-            
-            # Capture screenshot after successful action
-            self.capture_browser_screenshot()
+            self._emit_step_finished(step, True, timer)
             
             return True
             
         except Exception as e:
-            print(f"   ❌ Failed: {e}")
+            self.log('error', f"❌ Failed: {e}")
             # Take screenshot on failure
-            self.take_screenshot(f"failed_{step_name}")
+            self.capture_point(f"failed_{step_name}", 'failed', step)
             self.status = 'error'
+            self._emit_step_finished(step, False, timer, error=str(e))
             return False
     
+    def _emit_step_finished(self, step, success, timer, error=None):
+        timer.finish()
+        duration_ms, phases = timer.duration_ms, timer.breakdown()
+        STEP_DURATION.labels(step.action).observe(timer.elapsed)
+        for name, value in phases.items():
+            STEP_PHASE_SECONDS.labels(name).inc(value / 1000)
+        if not success:
+            STEPS_FAILED.labels(step.action).inc()
+        self.emit('step', phase='finished', index=step.index, total=self.total_actions, label=step.label,
+                  success=success, duration_ms=duration_ms, phases=phases, progress=self.progress, error=error)
+        self.store_run(progress=self.progress, completed_steps=self.completed_actions)
+        if self.session_id:
+            get_run_store().record_step(self.session_id, step.index, status='passed' if success else 'failed',
+                                        finished=timer.wall_start + timer.elapsed, duration_ms=duration_ms,
+                                        phases=phases, error=error)
+    
+    # Action implementations - bound to action names in ACTION_HANDLERS
+    
+    def _action_open_url(self, step):
+        self.driver.get(step.target)
+        with self.timed('wait'):
+            self.wait_for_page_ready(step.data or None)
+        self.log('info', f"✅ Opened URL: {step.target}")
+    
+    def _action_type(self, step):
+        element = self.wait_until(EC.presence_of_element_located(step.locator))
+        element.clear()
+        element.send_keys(step.data)
+        self.log('info', f"✅ Typed '{step.data}' in {step.target}")
+    
+    def _action_click(self, step):
+        element = self.wait_until(EC.element_to_be_clickable(step.locator))
+        element.click()
+        self.log('info', f"✅ Clicked {step.target}")
+    
+    def _action_verify(self, step):
+        self.wait_until(EC.presence_of_element_located(step.locator))
+        self.log('info', f"✅ Verified {step.target}")
+    
+    def _action_wait(self, step):
+        value = step.data or step.target
+        seconds = int(value) if value.isdigit() else 5
+        with self.timed('wait'):
+            time.sleep(seconds)
+        self.log('info', f"✅ Waited {seconds} seconds")
+    
+    def _action_select_dropdown(self, step):
+        element = self.wait_until(EC.presence_of_element_located(step.locator))
+        Select(element).select_by_visible_text(step.data)
+        self.log('info', f"✅ Selected '{step.data}' from dropdown {step.target}")
+    
+    def _action_upload_file(self, step):
+        element = self.wait_until(EC.presence_of_element_located(step.locator))
+        element.send_keys(step.data)  # data should be the full file path
+        self.log('info', f"✅ Uploaded file '{step.data}' to {step.target}")
+    
+    def _action_wait_for_element(self, step):
+        self.wait_until(EC.presence_of_element_located(step.locator))
+        self.log('info', f"✅ Element {step.target} is now present")
+    
+    def _action_wait_for_clickable(self, step):
+        self.wait_until(EC.element_to_be_clickable(step.locator))
+        self.log('info', f"✅ Element {step.target} is now clickable")
+    
+    def _action_wait_for_visible(self, step):
+        self.wait_until(EC.visibility_of_element_located(step.locator))
+        self.log('info', f"✅ Element {step.target} is now visible")
+    
+    def _action_wait_for_invisible(self, step):
+        self.wait_until(EC.invisibility_of_element_located(step.locator))
+        self.log('info', f"✅ Element {step.target} is no longer visible")
+    
+    def _action_wait_for_url(self, step):
+        self.wait_until(EC.url_contains(step.target))
+        self.log('info', f"✅ URL now contains {step.target}")
+    
+    def _action_wait_for_page_load(self, step):
+        with self.timed('wait'):
+            self.wait_for_page_ready(step.target if step.target in ('ready', 'network-idle') else 'ready')
+        self.log('info', "✅ Page loaded")
+    
+    def _action_wait_for_network_idle(self, step):
+        idle_ms = int(step.target) if step.target.isdigit() else None
+        with self.timed('wait'):
+            self.wait_for_network_idle(idle_ms)
+        self.log('info', "✅ Network is idle")
+    
+    def _action_clear(self, step):
+        element = self.wait_until(EC.presence_of_element_located(step.locator))
+        element.clear()
+        self.log('info', f"✅ Cleared field {step.target}")
+    
+    def _action_double_click(self, step):
+        element = self.wait_until(EC.element_to_be_clickable(step.locator))
+        ActionChains(self.driver).double_click(element).perform()
+        self.log('info', f"✅ Double clicked {step.target}")
+    
+    def _action_right_click(self, step):
+        element = self.wait_until(EC.element_to_be_clickable(step.locator))
+        ActionChains(self.driver).context_click(element).perform()
+        self.log('info', f"✅ Right clicked {step.target}")
+    
+    def _action_hover(self, step):
+        element = self.wait_until(EC.presence_of_element_located(step.locator))
+        ActionChains(self.driver).move_to_element(element).perform()
+        self.log('info', f"✅ Hovered over {step.target}")
+    
+    def _action_scroll_to(self, step):
+        element = self.wait_until(EC.presence_of_element_located(step.locator))
+        self.driver.execute_script("arguments[0].scrollIntoView(true);", element)
+        self.log('info', f"✅ Scrolled to {step.target}")
+    
+    def _action_switch_to_frame(self, step):
+        if step.locator:
+            element = self.wait_until(EC.presence_of_element_located(step.locator))
+            self.driver.switch_to.frame(element)
+        else:
+            self.driver.switch_to.frame(step.data)  # data should be frame name or index
+        self.log('info', f"✅ Switched to frame {step.target or step.data}")
+    
+    def _action_switch_to_default(self, step):
+        self.driver.switch_to.default_content()
+        self.log('info', "✅ Switched to default content")
+    
+    def _action_js_click(self, step):
+        element = self.wait_until(EC.presence_of_element_located(step.locator))
+        self.driver.execute_script("arguments[0].click();", element)
+        self.log('info', f"✅ JavaScript clicked {step.target}")
+    
+    def _action_execute_js(self, step):
+        # Execute custom JavaScript code
+        result = self.driver.execute_script(step.target)
+        self.log('info', f"✅ Executed JavaScript: {step.target}")
+        if result:
+            self.log('info', f"📄 Result: {result}")
+    
     def read_csv_actions(self, csv_file):
         """Read actions from CSV file"""
-        actions = []
-        
         if not os.path.exists(csv_file):
-            print(f"❌ CSV file not found: {csv_file}")
-            return actions
+            self.log('error', f"❌ CSV file not found: {csv_file}")
+            return []
         
         try:
-            with open(csv_file, 'r', newline='', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                
-                for row_num, row in enumerate(reader, 1):
-                    action = row.get('action', '').strip()
-                    xpath = row.get('xpath', '').strip()
-                    data = row.get('data', '').strip()
-                    
-                    if action and xpath:
-                        actions.append({
-                            'row': row_num,
-                            'action': action,
-                            'xpath': xpath,
-                            'data': data
-                        })
-                    else:
-                        print(f"⚠️ Skipping row {row_num}: missing action or xpath")
-        
+            plan = self.load_plan(csv_file)
         except Exception as e:
-            print(f"❌ Error reading CSV file: {e}")
+            self.log('error', f"❌ Error reading CSV file: {e}")
+            return []
         
-        return actions
+        return [
+            {'row': step.row, 'action': step.action, 'xpath': step.target, 'data': step.data}
+            for step in plan.steps
+        ]
     
     def run_actions_from_csv(self, csv_file):
         """Run actions from CSV file with Allure reporting and progress tracking"""
         test_name = os.path.splitext(os.path.basename(csv_file))[0]
-        print(f"🚀 Running actions from CSV: {csv_file}")
+        self.log('info', f"🚀 Running actions from CSV: {csv_file}")
         
         # Initialize progress tracking
         self.status = 'running'
         self.progress = 0
         self.completed_actions = 0
+        results = []
+        passed = False
+        self.run_started = time.time()
+        self.run_timings = {}
+        RUNS_STARTED.labels(self.browser).inc()
+        
+        self.run_id = f"{test_name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{(self.session_id or os.urandom(4).hex())[:8]}"
+        os.makedirs(os.path.join(self.screenshots_dir, self.run_id), exist_ok=True)
         
         try:
-            # Read actions from CSV
-            actions = self.read_csv_actions(csv_file)
-            
-            if not actions:
-                print("❌ No valid actions found in CSV file")
+            # Compile (or reuse) the action plan
+            try:
+                plan = self.load_plan(csv_file)
+                
+                # Run override > CSV metadata > SCREENSHOT_POLICY
+                self.active_screenshot_policy = ScreenshotPolicy.parse(
+                    self.screenshot_policy or plan.metadata.get('screenshot_policy')
+                )
+            except (OSError, ValueError) as e:
+                self.log('error', f"❌ Invalid script: {e}")
                 self.status = 'error'
                 return False
             
-            self.total_actions = len(actions)
-            print(f"📋 Found {len(actions)} actions to execute")
+            self.total_actions = len(plan)
+            self.store_run(total_steps=self.total_actions, artifacts=self.run_id)
+            self.log('info', f"📋 Found {len(plan)} actions to execute")
+            self.log('info', f"📸 Screenshot policy: {self.active_screenshot_policy.spec}")
             
             # Setup browser with timeout
-            print("🌐 Setting up browser...")
-            self.setup_driver()
+            self.log('info', "🌐 Setting up browser...")
+            with timed(self.run_timings, 'driver_startup'):
+                self.setup_driver()
             
             # Start video recording
-            print("🎥 Starting video recording...")
-            self.start_video_recording(test_name)
+            self.log('info', "🎥 Starting video recording...")
+            with timed(self.run_timings, 'video_start'):
+                self.start_video_recording(test_name)
             
             # Initialize Allure test
             with allure.step(f"CSV Action Test: {test_name}"):
                 try:
                     # Execute each action
-                    for i, action_data in enumerate(actions, 1):
-                        with allure.step(f"Step {i}: {action_data['action']} on {action_data['xpath']}"):
-                            print(f"\n📝 Step {i}/{len(actions)}: {action_data['action']} on {action_data['xpath']}")
-                            
-                            # Add timeout for each action
-                            import signal
+                    for step in plan.steps:
+                        i = step.index
+                        result = {'action': step.action, 'xpath': step.target, 'data': step.data}
+                        results.append(result)
+                        with allure.step(f"Step {i}: {step.label}"):
+                            self.log('info', f"📝 Step {i}/{len(plan)}: {step.label}")
                             
-                            def timeout_handler(signum, frame):
-                                raise TimeoutError(f"Action {i} timed out after 30 seconds")
-                            
-                            # Set timeout for action execution (30 seconds per action)
-                            signal.signal(signal.SIGALRM, timeout_handler)
-                            signal.alarm(30)
+                            # Arm the watchdog for this action
+                            timeout_reason = f"Action {i} timed out after {Config.ACTION_TIMEOUT} seconds"
+                            guard = get_watchdog().watch(
+                                Config.ACTION_TIMEOUT,
+                                lambda reason=timeout_reason: self.abort_driver(reason),
+                                name=f"{self.session_id or test_name}-action-{i}"
+                            )
                             
                             try:
-                                success = self.execute_action(
-                                    action_data['action'], 
-                                    action_data['xpath'], 
-                                    action_data['data']
-                                )
-                                signal.alarm(0)  # Cancel timeout
+                                with guard, timed(self.run_timings, 'steps'):
+                                    try:
+                                        success = self.execute_step(step)
+                                    finally:
+                                        result.update(self.step_timer.allure_times())
+                                if guard.expired:
+                                    raise TimeoutError(timeout_reason)
                                 
                                 # Store result for Allure report
-                                action_data['success'] = success
+                                result['success'] = success
                                 
                                 if not success:
-                                    print(f"❌ Test failed at step {i}")
-                                    allure.attach(f"Test failed at step {i}: {action_data['action']} on {action_data['xpath']}", 
+                                    self.log('error', f"❌ Test failed at step {i}")
+                                    allure.attach(f"Test failed at step {i}: {step.label}", 
                                                 name="Test Failure", attachment_type=AttachmentType.TEXT)
                                     return False
                                     
                             except TimeoutError as te:
-                                signal.alarm(0)  # Cancel timeout
-                                print(f"⏰ Action {i} timed out: {te}")
+                                self.log('error', f"⏰ Action {i} timed out: {te}")
+                                result['success'] = False
                                 self.status = 'error'
                                 allure.attach(f"Action {i} timed out: {te}", 
                                             name="Action Timeout", attachment_type=AttachmentType.TEXT)
                                 return False
                     
-                    print(f"\n🎉 ALL ACTIONS COMPLETED! Test passed successfully!")
+                    self.log('info', "🎉 ALL ACTIONS COMPLETED! Test passed successfully!")
                     self.status = 'completed'
                     self.progress = 100
                     allure.attach("All actions completed successfully", 
                                 name="Test Success", attachment_type=AttachmentType.TEXT)
+                    passed = True
                     return True
                     
                 except Exception as e:
-                    print(f"❌ Test failed with error: {e}")
+                    self.log('error', f"❌ Test failed with error: {e}")
                     self.status = 'error'
-                    self.logs.append(f"Test failed with error: {e}")
                     allure.attach(f"Test failed with error: {e}", 
                                 name="Test Error", attachment_type=AttachmentType.TEXT)
                     return False
                 
         except Exception as e:
-            print(f"❌ Failed to setup or execute script: {e}")
+            self.log('error', f"❌ Failed to setup or execute script: {e}")
             self.status = 'error'
-            self.logs.append(f"Setup failed with error: {e}")
             return False
             
         finally:
+            outcome = 'timeout' if self.timeout else ('passed' if passed else 'failed')
+            RUNS_FINISHED.labels(outcome).inc()
             try:
                 # Stop video recording
-                print("⏹️ Stopping video recording...")
-                self.stop_video_recording()
+                self.log('info', "⏹️ Stopping video recording...")
+                with timed(self.run_timings, 'video_stop'):
+                    self.stop_video_recording()
                 
                 # Close browser
-                print("🔄 Closing browser...")
-                self.teardown_driver()
+                self.log('info', "🔄 Closing browser...")
+                with timed(self.run_timings, 'teardown'):
+                    self.teardown_driver()
+                
+                # Let queued screenshots land on disk, then attach them from this (the Allure) thread
+                with timed(self.run_timings, 'screenshot_flush'):
+                    pipeline = get_screenshot_pipeline()
+                    pipeline.flush(owner=self, timeout=30)
+                    for path, name in pipeline.take_attachments(owner=self):
+                        allure.attach.file(path, name=name, attachment_type=AttachmentType.PNG)
+                
+                # Retention keeps failed runs longer than passing ones
+                self._record_outcome(test_name, outcome)
                 
                 # Generate Allure report
-                print("📊 Generating Allure report...")
-                self.generate_allure_report(test_name, actions if 'actions' in locals() else [], True)
+                self.log('info', "📊 Generating Allure report...")
+                with timed(self.run_timings, 'report'):
+                    self.generate_allure_report(test_name, results, True)
+                self.store_run(timings=self.run_timings)
                 
             except Exception as e:
-                print(f"⚠️ Error in cleanup: {e}")
+                self.log('warning', f"⚠️ Error in cleanup: {e}")
                 # Force close browser if it exists
                 if hasattr(self, 'driver') and self.driver:
+                    if self.wait:
+                        BROWSERS_ACTIVE.dec()
+                        self.wait = None
                     try:
                         self.driver.quit()
                     except:
                         pass
+            RUN_DURATION.observe(time.time() - self.run_started)
+    
+    def _record_outcome(self, test_name, outcome):
+        """Tag the run's screenshots and video with how the run ended"""
+        try:
+            write_run_manifest(
+                os.path.join(self.screenshots_dir, self.run_id),
+                run_id=self.run_id, script=test_name, session_id=self.session_id,
+                outcome=outcome, video=self.video_filename, finished=time.time()
+            )
+            if self.video_filename:
+                get_video_catalog().upsert(self.video_filename, outcome=outcome)
+            self.store_run(video=self.video_filename, video_job=self.video_job)
+        except Exception as e:
+            self.log('warning', f"⚠️ Failed to record run outcome: {e}")
     
     def create_sample_csv(self, test_name):
         """Create a sample CSV file for the user"""
@@ -921,8 +1184,46 @@ class CSVActionHandler:
             print(f"❌ Error generating Allure report: {e}")
             return False
 
+def _csv_row(*values):
+    """Render values as a single CSV line"""
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(values)
+    return buffer.getvalue()
+
+# Action name (and aliases) -> (handler, locator requirement)
+ACTION_HANDLERS = {
+    'open_url': (CSVActionHandler._action_open_url, None),
+    'type': (CSVActionHandler._action_type, 'required'),
+    'type_text': (CSVActionHandler._action_type, 'required'),
+    'click': (CSVActionHandler._action_click, 'required'),
+    'verify': (CSVActionHandler._action_verify, 'required'),
+    'verify_text': (CSVActionHandler._action_verify, 'required'),
+    'wait': (CSVActionHandler._action_wait, None),
+    'select_dropdown': (CSVActionHandler._action_select_dropdown, 'required'),
+    'select': (CSVActionHandler._action_select_dropdown, 'required'),
+    'upload_file': (CSVActionHandler._action_upload_file, 'required'),
+    'upload': (CSVActionHandler._action_upload_file, 'required'),
+    'wait_for_element': (CSVActionHandler._action_wait_for_element, 'required'),
+    'wait_for_clickable': (CSVActionHandler._action_wait_for_clickable, 'required'),
+    'wait_for_visible': (CSVActionHandler._action_wait_for_visible, 'required'),
+    'wait_for_invisible': (CSVActionHandler._action_wait_for_invisible, 'required'),
+    'wait_for_url': (CSVActionHandler._action_wait_for_url, None),
+    'wait_for_page_load': (CSVActionHandler._action_wait_for_page_load, None),
+    'wait_for_network_idle': (CSVActionHandler._action_wait_for_network_idle, None),
+    'clear': (CSVActionHandler._action_clear, 'required'),
+    'double_click': (CSVActionHandler._action_double_click, 'required'),
+    'right_click': (CSVActionHandler._action_right_click, 'required'),
+    'hover': (CSVActionHandler._action_hover, 'required'),
+    'scroll_to': (CSVActionHandler._action_scroll_to, 'required'),
+    'switch_to_frame': (CSVActionHandler._action_switch_to_frame, 'optional'),
+    'switch_to_default': (CSVActionHandler._action_switch_to_default, None),
+    'js_click': (CSVActionHandler._action_js_click, 'required'),
+    'execute_js': (CSVActionHandler._action_execute_js, None),
+}
+
 def main():
     """Main entry point"""
+    configure_logging()
     handler = CSVActionHandler()
     
     if len(os.sys.argv) > 1:
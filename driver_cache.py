@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Driver Cache - Resolves browser driver binaries once and remembers them across restarts
+"""
+
+import os
+import re
+import json
+import time
+import logging
+import threading
+import subprocess
+from datetime import datetime
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+def _install_chrome_driver():
+    from webdriver_manager.chrome import ChromeDriverManager
+    return ChromeDriverManager().install()
+
+
+def _install_firefox_driver():
+    from webdriver_manager.firefox import GeckoDriverManager
+    return GeckoDriverManager().install()
+
+
+def _install_edge_driver():
+    from webdriver_manager.microsoft import EdgeChromiumDriverManager
+    return EdgeChromiumDriverManager().install()
+
+
+DRIVER_INSTALLERS = {
+    'chrome': _install_chrome_driver,
+    'firefox': _install_firefox_driver,
+    'edge': _install_edge_driver,
+}
+
+
+class DriverCache:
+    """In-memory driver resolution cache with a TTL, backed by an on-disk manifest"""
+
+    def __init__(self, manifest_path=None, ttl=None):
+        self.manifest_path = manifest_path or Config.DRIVER_MANIFEST_PATH
+        self.ttl = Config.DRIVER_CACHE_TTL if ttl is None else ttl
+        self._entries = {}
+        self._manifest_mtime = None
+        self._lock = threading.Lock()
+        self._browser_locks = {browser: threading.Lock() for browser in DRIVER_INSTALLERS}
+        self._load_manifest()
+
+    def resolve(self, browser, force=False):
+        """Return the driver binary path for a browser, installing it only when needed"""
+        browser = browser.lower()
+        if browser not in DRIVER_INSTALLERS:
+            raise ValueError(f"Unsupported browser: {browser}")
+
+        self._refresh_manifest(browser)
+        if not force:
+            entry = self._fresh_entry(browser)
+            if entry:
+                return entry['path']
+
+        # Only one thread per browser talks to webdriver-manager at a time
+        with self._browser_locks[browser]:
+            if not force:
+                entry = self._fresh_entry(browser)
+                if entry:
+                    return entry['path']
+
+            started = time.monotonic()
+            path = DRIVER_INSTALLERS[browser]()
+            entry = {
+                'path': path,
+                'version': self._driver_version(path),
+                'resolved_at': time.time(),
+                'resolve_ms': round((time.monotonic() - started) * 1000, 1),
+            }
+            with self._lock:
+                self._entries[browser] = entry
+            self._save_manifest()
+            logger.info(f"🔧 Resolved {browser} driver {entry['version'] or ''}: {path}")
+            return path
+
+    def status(self, browser):
+        """Report the cached driver state for a browser without launching anything"""
+        browser = browser.lower()
+        self._refresh_manifest(browser)
+        with self._lock:
+            entry = dict(self._entries.get(browser) or {})
+
+        if not entry:
+            return {'available': False, 'message': f'{browser.capitalize()} driver not resolved yet'}
+
+        if not os.path.exists(entry['path']):
+            return {'available': False, 'message': f'{browser.capitalize()} driver missing at {entry["path"]}'}
+
+        age = time.time() - entry['resolved_at']
+        return {
+            'available': True,
+            'message': f'{browser.capitalize()} driver ready',
+            'path': entry['path'],
+            'version': entry.get('version'),
+            'resolved_at': datetime.fromtimestamp(entry['resolved_at']).isoformat(),
+            'stale': age > self.ttl,
+        }
+
+    def invalidate(self, browser=None):
+        """Forget cached resolutions so the next resolve reinstalls"""
+        with self._lock:
+            if browser:
+                self._entries.pop(browser.lower(), None)
+            else:
+                self._entries.clear()
+        self._save_manifest()
+
+    def _fresh_entry(self, browser):
+        with self._lock:
+            entry = self._entries.get(browser)
+        if not entry:
+            return None
+        if time.time() - entry['resolved_at'] > self.ttl:
+            return None
+        if not os.path.exists(entry['path']):
+            return None
+        return entry
+
+    def _driver_version(self, path):
+        """Ask the driver binary for its version (fast, no browser involved)"""
+        try:
+            result = subprocess.run([path, '--version'], capture_output=True, text=True, timeout=10)
+            match = re.search(r'(\d+(?:\.\d+)+)', result.stdout)
+            return match.group(1) if match else None
+        except Exception:
+            return None
+
+    def _manifest_mtime_now(self):
+        try:
+            return os.stat(self.manifest_path).st_mtime
+        except OSError:
+            return None
+
+    def _refresh_manifest(self, browser):
+        """Re-read the manifest when another process has rewritten it or an entry is missing"""
+        with self._lock:
+            known_mtime = self._manifest_mtime
+            missing = browser not in self._entries
+        mtime = self._manifest_mtime_now()
+        if mtime is not None and (mtime != known_mtime or missing):
+            self._load_manifest()
+
+    def _load_manifest(self):
+        try:
+            mtime = self._manifest_mtime_now()
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            entries = {
+                browser: entry for browser, entry in data.get('drivers', {}).items()
+                if browser in DRIVER_INSTALLERS and entry.get('path') and entry.get('resolved_at')
+            }
+            with self._lock:
+                # Entries resolved here but not yet on disk survive the reload
+                self._entries = {**self._entries, **entries}
+                self._manifest_mtime = mtime
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"⚠️ Ignoring unreadable driver manifest {self.manifest_path}: {e}")
+
+    def _save_manifest(self):
+        with self._lock:
+            data = {'drivers': dict(self._entries)}
+        try:
+            directory = os.path.dirname(self.manifest_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.manifest_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=2)
+            os.replace(tmp_path, self.manifest_path)
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to write driver manifest: {e}")
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_driver_cache():
+    """Process-wide driver cache"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = DriverCache()
+        return _cache
+
+
+def resolve_driver_path(browser, force=False):
+    """Resolve the driver binary for a browser through the shared cache"""
+    return get_driver_cache().resolve(browser, force=force)
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Driver Pool - Keeps warm, health-checked WebDriver instances per browser type
+"""
+
+import time
+import logging
+import threading
+from datetime import datetime
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Browsers whose profile can be wiped across every origin through CDP
+CHROMIUM_BROWSERS = ('chrome', 'edge')
+
+
+class DriverPoolTimeout(Exception):
+    """Raised when no driver could be leased within the lease timeout"""
+
+
+class PooledDriver:
+    """Bookkeeping wrapper around a pooled WebDriver instance"""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.uses = 0
+        self.created_at = time.monotonic()
+
+
+class DriverPool:
+    """Bounded pool of pre-launched drivers for a single browser type and launch profile"""
+
+    def __init__(self, browser, factory, max_size=None, warm_size=None,
+                 max_uses=None, lease_timeout=None, profile='default'):
+        self.browser = browser
+        self.profile = profile
+        self.factory = factory
+        self.max_size = max_size or Config.DRIVER_POOL_SIZE
+        self.warm_size = min(warm_size if warm_size is not None else Config.DRIVER_POOL_WARM_SIZE,
+                             self.max_size)
+        self.max_uses = max_uses or Config.DRIVER_POOL_MAX_USES
+        self.lease_timeout = lease_timeout or Config.DRIVER_POOL_LEASE_TIMEOUT
+
+        self._idle = []
+        self._leased = {}
+        self._launching = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+        # Statistics
+        self.created = 0
+        self.recycled = 0
+        self.crashed = 0
+        self.leases = 0
+        self.lease_timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.waiting = 0
+
+    @property
+    def size(self):
+        """Total number of drivers owned by the pool (idle, leased and launching)"""
+        return len(self._idle) + len(self._leased) + self._launching
+
+    def warm_up(self):
+        """Pre-launch drivers until the warm size is reached"""
+        while True:
+            with self._cond:
+                if self._closed or len(self._idle) + self._launching >= self.warm_size \
+                        or self.size >= self.max_size:
+                    return
+                self._launching += 1
+            entry = self._launch()
+            with self._cond:
+                if entry:
+                    self._idle.append(entry)
+                self._cond.notify()
+            if not entry:
+                return
+
+    def warm_up_async(self):
+        """Pre-launch drivers in a background thread"""
+        thread = threading.Thread(target=self.warm_up, name=f"driver-pool-warm-{self.browser}")
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def acquire(self, timeout=None):
+        """Lease a healthy driver, launching a new one if the pool has room"""
+        timeout = self.lease_timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+
+        while True:
+            entry = None
+            launch = False
+            with self._cond:
+                self.waiting += 1
+                try:
+                    while not self._idle and self.size >= self.max_size and not self._closed:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self.lease_timeouts += 1
+                            raise DriverPoolTimeout(
+                                f"No {self.browser} driver available after {timeout} seconds")
+                        self._cond.wait(remaining)
+                finally:
+                    self.waiting -= 1
+
+                if self._closed:
+                    raise RuntimeError(f"{self.browser} driver pool is closed")
+
+                if self._idle:
+                    entry = self._idle.pop()
+                else:
+                    self._launching += 1
+                    launch = True
+
+            if launch:
+                entry = self._launch()
+                with self._cond:
+                    if not entry:
+                        self._cond.notify()
+                        raise RuntimeError(f"Failed to launch {self.browser} driver")
+            elif not self._is_healthy(entry):
+                self._discard(entry, crashed=True)
+                continue
+
+            with self._cond:
+                entry.uses += 1
+                self._leased[id(entry.driver)] = entry
+                waited = time.monotonic() - started
+                self.leases += 1
+                self.total_wait += waited
+                self.max_wait = max(self.max_wait, waited)
+            return entry.driver
+
+    def release(self, driver, broken=False):
+        """Return a leased driver; it is reset, or recycled if worn out or broken"""
+        with self._cond:
+            entry = self._leased.pop(id(driver), None)
+        if entry is None:
+            # Not one of ours (or already discarded) - just make sure it is gone
+            self._quit(driver)
+            return
+
+        if broken or entry.uses >= self.max_uses or self._closed or not self._reset(entry):
+            self._discard(entry, crashed=broken)
+            return
+
+        with self._cond:
+            self._idle.append(entry)
+            self._cond.notify()
+
+    def close(self):
+        """Quit all idle drivers and refuse further leases"""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        for entry in idle:
+            self._quit(entry.driver)
+
+    def stats(self):
+        """Return pool statistics for the API"""
+        with self._cond:
+            return {
+                'browser': self.browser,
+                'profile': self.profile,
+                'max_size': self.max_size,
+                'warm_size': self.warm_size,
+                'size': self.size,
+                'idle': len(self._idle),
+                'leased': len(self._leased),
+                'launching': self._launching,
+                'waiting': self.waiting,
+                'max_uses': self.max_uses,
+                'created': self.created,
+                'recycled': self.recycled,
+                'crashed': self.crashed,
+                'leases': self.leases,
+                'lease_timeouts': self.lease_timeouts,
+                'lease_wait_avg_ms': round(self.total_wait / self.leases * 1000, 1) if self.leases else 0,
+                'lease_wait_max_ms': round(self.max_wait * 1000, 1),
+            }
+
+    def _launch(self):
+        """Launch a new driver through the factory; the caller has reserved a launching slot"""
+        try:
+            driver = self.factory()
+            with self._cond:
+                self.created += 1
+            return PooledDriver(driver)
+        except Exception as e:
+            logger.error(f"❌ Driver pool failed to launch {self.browser}: {e}")
+            return None
+        finally:
+            with self._cond:
+                self._launching -= 1
+
+    def _is_healthy(self, entry):
+        """Check that the browser behind the driver still responds"""
+        try:
+            return bool(entry.driver.window_handles)
+        except Exception:
+            return False
+
+    def _reset(self, entry):
+        """Wipe cookies, storage and extra windows across all origins so the next lease starts clean.
+
+        Returns False when the browser cannot be wiped completely; the caller then
+        discards the driver instead of handing another session a dirty profile.
+        """
+        driver = entry.driver
+        if self.browser not in CHROMIUM_BROWSERS:
+            # delete_all_cookies/localStorage only reach the current origin
+            return False
+        try:
+            handles = driver.window_handles
+            for handle in handles[1:]:
+                driver.switch_to.window(handle)
+                driver.close()
+            driver.switch_to.window(handles[0])
+            driver.switch_to.default_content()
+            driver.execute_cdp_cmd('Network.clearBrowserCookies', {})
+            driver.execute_cdp_cmd('Storage.clearDataForOrigin', {'origin': '*', 'storageTypes': 'all'})
+            driver.get('about:blank')
+            return True
+        except Exception as e:
+            logger.warning(f"⚠️ Driver pool failed to reset {self.browser} driver, recycling it: {e}")
+            return False
+
+    def _discard(self, entry, crashed=False):
+        """Quit a driver and free its slot"""
+        self._quit(entry.driver)
+        with self._cond:
+            if crashed:
+                self.crashed += 1
+            else:
+                self.recycled += 1
+            self._cond.notify()
+
+    def _quit(self, driver):
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_driver_pool(browser, factory, profile='default'):
+    """Get (or create) the shared pool for a browser type and launch profile"""
+    key = (browser.lower(), profile)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = DriverPool(browser.lower(), factory, profile=profile)
+            _pools[key] = pool
+            if pool.warm_size:
+                pool.warm_up_async()
+        return pool
+
+
+def get_pool_stats():
+    """Statistics for every pool created in this process"""
+    with _pools_lock:
+        pools = list(_pools.values())
+    return {
+        'timestamp': datetime.now().isoformat(),
+        'pools': [pool.stats() for pool in pools]
+    }
+
+
+def close_all_pools():
+    """Quit all pooled drivers"""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
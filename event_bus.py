@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Event Bus - In-process fan-out of run events (status, steps, logs) with a replay buffer
+"""
+
+import time
+import threading
+from collections import deque
+from itertools import islice
+
+from config import Config
+
+
+class EventBus:
+    """Publishes run events to any number of readers
+
+    Every event gets a process-wide, increasing id, so one reader can follow
+    all sessions and resume after a reconnect from the last id it saw. Only
+    the newest EVENT_BUFFER_SIZE events are kept; a reader that falls further
+    behind is told so and should resync from a snapshot.
+    """
+
+    def __init__(self, buffer_size=None):
+        self._events = deque(maxlen=buffer_size or Config.EVENT_BUFFER_SIZE)
+        self._next_id = 1
+        self._cond = threading.Condition()
+
+    def publish(self, session_id, event_type, **data):
+        """Record an event and wake up waiting readers; returns its id"""
+        with self._cond:
+            event = {
+                'id': self._next_id,
+                'session_id': session_id,
+                'type': event_type,
+                'time': time.time(),
+                'data': data
+            }
+            self._next_id += 1
+            self._events.append(event)
+            self._cond.notify_all()
+        return event['id']
+
+    @property
+    def last_id(self):
+        with self._cond:
+            return self._next_id - 1
+
+    def read(self, after=0, sessions=None, timeout=None):
+        """Events newer than `after`, optionally only for `sessions`
+
+        Waits up to `timeout` seconds when there is nothing new. Returns
+        (events, cursor, missed): `cursor` is the id to resume from and
+        `missed` is True when events after `after` were already dropped
+        (or `after` came from a previous server process).
+        """
+        with self._cond:
+            if timeout:
+                self._cond.wait_for(lambda: self._next_id - 1 != after, timeout)
+            last_id = self._next_id - 1
+            oldest = self._events[0]['id'] if self._events else self._next_id
+            missed = after > last_id or (after > 0 and after + 1 < oldest)
+            if after > last_id:
+                after = 0
+            start = max(0, after + 1 - oldest)
+            events = list(islice(self._events, start, None))
+
+        if sessions:
+            events = [event for event in events if event['session_id'] in sessions]
+        return events, last_id, missed
+
+
+_bus = None
+_bus_lock = threading.Lock()
+
+
+def get_event_bus():
+    """Process-wide event bus"""
+    global _bus
+    with _bus_lock:
+        if _bus is None:
+            _bus = EventBus()
+        return _bus
+
+
+def set_event_bus(bus):
+    """Replace the process-wide bus (executor processes forward events to the web process)"""
+    global _bus
+    with _bus_lock:
+        _bus = bus
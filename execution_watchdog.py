@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Watchdog - Thread-safe deadlines for actions and scripts, replacing signal.alarm
+"""
+
+import time
+import heapq
+import itertools
+import logging
+import threading
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+
+class WatchHandle:
+    """A single armed deadline; usable as a context manager"""
+
+    def __init__(self, watchdog, deadline, on_timeout, name):
+        self.watchdog = watchdog
+        self.deadline = deadline
+        self.on_timeout = on_timeout
+        self.name = name
+        self.cancelled = False
+        self.expired = False
+
+    def cancel(self):
+        """Disarm the deadline (no-op if it already fired)"""
+        self.cancelled = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.cancel()
+        return False
+
+
+class Watchdog:
+    """Single background thread that fires timeout callbacks when deadlines pass"""
+
+    def __init__(self):
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self.fired = 0
+        self._thread = threading.Thread(target=self._run, name="watchdog")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def watch(self, seconds, on_timeout, name=''):
+        """Arm a deadline `seconds` from now; `on_timeout` runs if it is not cancelled in time"""
+        handle = WatchHandle(self, time.monotonic() + seconds, on_timeout, name)
+        with self._cond:
+            heapq.heappush(self._heap, (handle.deadline, next(self._seq), handle))
+            self._cond.notify()
+        return handle
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    # Drop deadlines that were cancelled before they came due
+                    while self._heap and self._heap[0][2].cancelled:
+                        heapq.heappop(self._heap)
+                    if not self._heap:
+                        self._cond.wait()
+                        continue
+                    remaining = self._heap[0][0] - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                handle = heapq.heappop(self._heap)[2]
+                if handle.cancelled:
+                    continue
+                handle.expired = True
+                self.fired += 1
+
+            # Callbacks may block (e.g. quitting a hung driver), so never run them on this thread
+            callback = threading.Thread(target=self._fire, args=(handle,), name=f"watchdog-{handle.name}")
+            callback.daemon = True
+            callback.start()
+
+    def _fire(self, handle):
+        try:
+            logger.warning(f"⏰ Watchdog deadline expired: {handle.name}")
+            handle.on_timeout()
+        except Exception as e:
+            logger.warning(f"⚠️ Watchdog callback for {handle.name} failed: {e}")
+
+
+def kill_driver(driver, grace=5):
+    """Quit a (possibly hung) driver, killing its service process and browser tree if quit does not return"""
+    if not driver:
+        return
+    process = getattr(getattr(driver, 'service', None), 'process', None)
+    # Snapshot the browser tree now: once the driver process dies its children are reparented
+    tree = _process_tree(process)
+
+    quitter = threading.Thread(target=_quietly_quit, args=(driver,), name="watchdog-quit")
+    quitter.daemon = True
+    quitter.start()
+    quitter.join(grace)
+    if not quitter.is_alive():
+        _kill_survivors(tree)
+        return
+
+    if tree:
+        _kill_survivors(tree)
+        logger.warning(f"🔪 Killed hung driver process tree of {process.pid}")
+    elif process:
+        try:
+            process.kill()
+            logger.warning(f"🔪 Killed hung driver process {process.pid}")
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to kill driver process: {e}")
+
+
+def _process_tree(process):
+    """The driver service process and every browser process it launched (needs psutil)"""
+    if psutil is None or process is None:
+        return []
+    try:
+        root = psutil.Process(process.pid)
+        return [root] + root.children(recursive=True)
+    except psutil.Error:
+        return []
+
+
+def _kill_survivors(tree):
+    """Kill whatever is still running from a snapshotted process tree, children first"""
+    for proc in reversed(tree):
+        try:
+            proc.kill()
+        except psutil.NoSuchProcess:
+            pass
+        except psutil.Error as e:
+            logger.warning(f"⚠️ Failed to kill browser process {proc.pid}: {e}")
+    if tree:
+        psutil.wait_procs(tree, timeout=3)
+
+
+def _quietly_quit(driver):
+    try:
+        driver.quit()
+    except Exception:
+        pass
+
+
+_watchdog = None
+_watchdog_lock = threading.Lock()
+
+
+def get_watchdog():
+    """Process-wide watchdog"""
+    global _watchdog
+    with _watchdog_lock:
+        if _watchdog is None:
+            _watchdog = Watchdog()
+        return _watchdog
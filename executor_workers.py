@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+"""
+Executor Workers - Runs scripts in separate executor processes so the web tier only serves the API
+"""
+
+import time
+import atexit
+import logging
+import threading
+import weakref
+import multiprocessing
+from datetime import datetime
+
+from config import Config
+from event_bus import get_event_bus
+from session_log import SessionLog
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+VIDEO_JOB_MAX_AGE = 3600  # Finished post-processing jobs are forgotten after this many seconds
+
+
+class ForwardingEventBus:
+    """Event bus inside an executor process: ships every event to the web process"""
+
+    def __init__(self, events):
+        self._events = events
+
+    def publish(self, session_id, event_type, **data):
+        self._events.put(('event', session_id, event_type, data))
+
+    def forward_metrics(self):
+        """Ship metrics recorded since the last call (merged into the web process registry)"""
+        changes = REGISTRY.drain()
+        if changes:
+            self._events.put(('metrics', None, changes))
+
+    def forward_state(self, worker_id):
+        """Ship this executor's driver pools and video jobs, which only exist in this process"""
+        from driver_pool import get_pool_stats
+        from video_postprocess import get_video_postprocessor
+
+        postprocessor = get_video_postprocessor()
+        postprocessor.cleanup(max_age=VIDEO_JOB_MAX_AGE)
+        self._events.put(('stats', worker_id, {
+            'pools': get_pool_stats()['pools'],
+            'video_jobs': postprocessor.list_jobs(),
+        }))
+
+
+def get_job_pool(browser, profile):
+    """Shared driver pool for a job's browser and profile
+
+    The pool keeps the factory for later launches (refills, replacements),
+    so it must be bound to this browser and profile, not the job loop's.
+    """
+    from csv_action_handler import CSVActionHandler
+    from driver_pool import get_driver_pool
+
+    return get_driver_pool(browser, lambda: CSVActionHandler(browser, profile=profile).launch_driver(),
+                           profile=profile)
+
+
+def worker_main(worker_id, jobs, control, events):
+    """Executor process: runs one job at a time, each with its own handler and driver"""
+    import event_bus
+    from csv_action_handler import CSVActionHandler
+    from driver_pool import close_all_pools
+    from run_store import get_run_store
+    from session_log import configure_logging
+
+    configure_logging()
+    forwarder = ForwardingEventBus(events)
+    event_bus.set_event_bus(forwarder)
+    current = {}
+
+    def report_loop():
+        while True:
+            time.sleep(Config.METRICS_FORWARD_INTERVAL)
+            forwarder.forward_metrics()
+            forwarder.forward_state(worker_id)
+
+    threading.Thread(target=report_loop, name=f"executor-{worker_id}-report", daemon=True).start()
+
+    def control_loop():
+        # Aborts and stops arrive while the main thread is busy running the script
+        while True:
+            message = control.get()
+            if message is None:
+                return
+            command, session_id, reason = message
+            if command == 'cleanup':
+                from video_postprocess import get_video_postprocessor
+                get_video_postprocessor().cleanup(max_age=reason)
+                continue
+            handler = current.get(session_id)
+            if handler is None:
+                continue
+            try:
+                if command == 'abort':
+                    handler.abort_driver(reason)
+                elif command == 'stop':
+                    handler.stop()
+            except Exception as e:
+                logger.warning(f"⚠️ Executor {worker_id}: {command} failed for {session_id}: {e}")
+
+    threading.Thread(target=control_loop, name=f"executor-{worker_id}-control", daemon=True).start()
+
+    while True:
+        job = jobs.get()
+        if job is None:
+            break
+        browser, profile = job['browser'], job['profile']
+        driver_pool = None
+        if Config.DRIVER_POOL_ENABLED:
+            driver_pool = get_job_pool(browser, profile)
+        handler = CSVActionHandler(browser, job['session_id'], driver_pool=driver_pool, profile=profile)
+        handler.auto_record_enabled = job['auto_record']
+        handler.screenshot_policy = job['screenshot_policy']
+        current[job['session_id']] = handler
+
+        result, error = False, None
+        try:
+            result = handler.run_actions_from_csv(job['script'])
+        except Exception as e:
+            error = str(e)
+        finally:
+            current.pop(job['session_id'], None)
+            # Readers in other processes should see the final steps and logs once we report done
+            get_run_store().flush(timeout=10)
+            # The web process keeps its own copy of the log, so drop this side's spill files
+            handler.log_store.discard()
+            forwarder.forward_metrics()
+            forwarder.forward_state(worker_id)
+
+        events.put(('done', job['session_id'], {
+            'result': result,
+            'error': error,
+            'status': handler.status,
+            'progress': handler.progress,
+            'current_action': handler.current_action,
+            'timeout': handler.timeout,
+            'video_job': handler.video_job,
+        }))
+
+    close_all_pools()
+
+
+class RemoteRun:
+    """Web-process view of a run executing in an executor process
+
+    Mirrors the handler attributes the web tier reads (status, progress,
+    logs, ...) from the events the executor sends back, and forwards
+    aborts and stops to it.
+    """
+
+    driver = None  # The browser lives in the executor process
+
+    def __init__(self, pool, browser, session_id, profile=None):
+        self.pool = pool
+        self.browser = browser
+        self.session_id = session_id
+        self.profile = profile
+        self.status = 'ready'
+        self.progress = 0
+        self.current_action = ''
+        self.timeout = None
+        self.video_job = None
+        self.video = None
+        self.auto_record_enabled = True
+        self.screenshot_policy = None
+        # Separate spill file from the executor's own log of this session
+        self.log_store = SessionLog(f"{session_id}.web")
+
+    def run_actions_from_csv(self, csv_file):
+        """Run the script in an executor process and wait for it to finish"""
+        self.status = 'running'
+        outcome = self.pool.run(self, csv_file)
+        for key in ('status', 'progress', 'current_action', 'timeout', 'video_job'):
+            if outcome.get(key) is not None:
+                setattr(self, key, outcome[key])
+        if outcome.get('error'):
+            self.status = 'error'
+            raise RuntimeError(outcome['error'])
+        return outcome['result']
+
+    def apply_event(self, event_type, data):
+        if event_type == 'log':
+            self.log_store.append(data['level'], data['message'])
+        elif event_type == 'step':
+            if data['phase'] == 'started':
+                self.current_action = data['label']
+            else:
+                self.progress = data['progress']
+                if not data['success']:
+                    self.status = 'error'
+        elif event_type == 'video':
+            self.video_job = data['job_id']
+            self.video = data
+
+    def video_status(self):
+        if self.video:
+            return self.video
+        return {'job_id': self.video_job, 'status': 'queued'} if self.video_job else None
+
+    def abort_driver(self, reason):
+        self.timeout = {'reason': reason, 'time': datetime.now().isoformat()}
+        self.pool.control(self.session_id, 'abort', reason)
+
+    def stop(self):
+        self.pool.control(self.session_id, 'stop')
+
+
+class ExecutorProcess:
+    """One executor process and its private job and control queues"""
+
+    def __init__(self, context, worker_id, events):
+        self.worker_id = worker_id
+        self.jobs = context.Queue()
+        self.control = context.Queue()
+        self.process = context.Process(
+            target=worker_main, args=(worker_id, self.jobs, self.control, events),
+            name=f"executor-{worker_id}"
+        )
+        # Not a daemon: executors start their own video encoding pools
+        self.process.start()
+        self.session_id = None
+        self.jobs_run = 0
+
+    def stop(self, timeout=5):
+        try:
+            self.jobs.put(None)
+            self.control.put(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+
+
+class ExecutorPool:
+    """Fixed set of executor processes fed from the scheduler
+
+    The scheduler keeps deciding what runs next (priorities, batch limits);
+    its worker threads only hand jobs to an idle executor and wait. Events
+    from the executors are republished on this process's event bus, so the
+    progress stream and run store see them as before. An executor that dies
+    fails its run and is replaced.
+    """
+
+    def __init__(self, workers):
+        self.workers = workers
+        self._context = multiprocessing.get_context('spawn')
+        self._events = self._context.Queue()
+        self._cond = threading.Condition()
+        self._executors = [ExecutorProcess(self._context, i, self._events) for i in range(workers)]
+        self._idle = list(self._executors)
+        self._waiting = {}  # session_id -> {'done': Event, 'outcome': dict}
+        self._remotes = weakref.WeakValueDictionary()  # session_id -> RemoteRun, also after the run
+        self._state = {}  # worker_id -> latest pools and video jobs reported by that executor
+        self.restarts = 0
+
+        reader = threading.Thread(target=self._read_events, name="executor-events")
+        reader.daemon = True
+        reader.start()
+
+    def run(self, remote, csv_file):
+        """Execute on the next idle executor; returns the outcome the executor reported"""
+        session_id = remote.session_id
+        with self._cond:
+            self._cond.wait_for(lambda: self._idle)
+            executor = self._idle.pop()
+            executor.session_id = session_id
+            state = {'done': threading.Event(), 'outcome': None}
+            self._waiting[session_id] = state
+            self._remotes[session_id] = remote
+
+        try:
+            executor.jobs.put({
+                'session_id': session_id,
+                'script': csv_file,
+                'browser': remote.browser,
+                'profile': remote.profile,
+                'auto_record': remote.auto_record_enabled,
+                'screenshot_policy': remote.screenshot_policy,
+            })
+            while not state['done'].wait(1):
+                if not executor.process.is_alive():
+                    exitcode = executor.process.exitcode
+                    logger.error(f"❌ Executor {executor.worker_id} (pid {executor.process.pid}) exited with code {exitcode}")
+                    state['outcome'] = {'result': False, 'status': 'error',
+                                        'error': f"Executor process exited with code {exitcode}"}
+                    executor = self._replace(executor)
+                    break
+            return state['outcome']
+        finally:
+            with self._cond:
+                self._waiting.pop(session_id, None)
+                executor.session_id = None
+                executor.jobs_run += 1
+                self._idle.append(executor)
+                self._cond.notify()
+
+    def control(self, session_id, command, reason=None):
+        """Send an abort/stop to the executor running `session_id`"""
+        with self._cond:
+            executor = next((e for e in self._executors if e.session_id == session_id), None)
+        if executor:
+            executor.control.put((command, session_id, reason))
+
+    def cleanup_video_jobs(self, max_age=VIDEO_JOB_MAX_AGE):
+        """Have every executor forget finished post-processing jobs older than `max_age` seconds"""
+        with self._cond:
+            executors = list(self._executors)
+        for executor in executors:
+            executor.control.put(('cleanup', None, max_age))
+
+    def pool_stats(self):
+        """Driver pools of all executors, as last reported"""
+        with self._cond:
+            state = dict(self._state)
+        return [dict(pool, executor=worker_id) for worker_id, report in sorted(state.items())
+                for pool in report['pools']]
+
+    def video_jobs(self):
+        """Video post-processing jobs of all executors, as last reported"""
+        with self._cond:
+            state = dict(self._state)
+        return [job for report in state.values() for job in report['video_jobs']]
+
+    def video_job(self, job_id):
+        return next((job for job in self.video_jobs() if job['job_id'] == job_id), None)
+
+    def _replace(self, executor):
+        replacement = ExecutorProcess(self._context, executor.worker_id, self._events)
+        with self._cond:
+            self._executors[self._executors.index(executor)] = replacement
+            self._state.pop(executor.worker_id, None)  # Its pools and jobs died with it
+            self.restarts += 1
+        return replacement
+
+    def _read_events(self):
+        bus = get_event_bus()
+        while True:
+            try:
+                kind, session_id, *payload = self._events.get()
+            except (EOFError, OSError):
+                return
+            if kind == 'event':
+                event_type, data = payload
+                remote = self._remotes.get(session_id)
+                if remote is not None:
+                    remote.apply_event(event_type, data)
+                bus.publish(session_id, event_type, **data)
+            elif kind == 'done':
+                with self._cond:
+                    state = self._waiting.get(session_id)
+                if state:
+                    state['outcome'] = payload[0]
+                    state['done'].set()
+            elif kind == 'metrics':
+                REGISTRY.merge(payload[0])
+            elif kind == 'stats':
+                with self._cond:
+                    self._state[session_id] = payload[0]  # session_id carries the worker id here
+
+    def stats(self):
+        with self._cond:
+            return {
+                'workers': self.workers,
+                'idle': len(self._idle),
+                'restarts': self.restarts,
+                'executors': [{
+                    'worker_id': executor.worker_id,
+                    'pid': executor.process.pid,
+                    'alive': executor.process.is_alive(),
+                    'session_id': executor.session_id,
+                    'jobs_run': executor.jobs_run,
+                } for executor in self._executors]
+            }
+
+    def shutdown(self):
+        for executor in list(self._executors):
+            executor.stop()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def current_executor_pool():
+    """The executor pool if one has been started in this process, else None"""
+    with _pool_lock:
+        return _pool
+
+
+def get_executor_pool(workers=None):
+    """Process-wide executor pool (started on first use)"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ExecutorPool(workers or 1)
+            atexit.register(_pool.shutdown)
+            logger.info(f"🧩 Executor pool started with {_pool.workers} processes")
+        return _pool
@@ -0,0 +1,10 @@
+#!/usr/bin/env python3
+"""
+Gunicorn configuration - loaded automatically from the working directory (Procfile)
+"""
+
+
+def post_worker_init(worker):
+    """Start the web server's background services in each worker once the app is loaded"""
+    from web_server import start_background_services
+    start_background_services()
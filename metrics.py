@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+Metrics - Lightweight Prometheus-style counters, gauges and histograms served at /metrics
+"""
+
+import sys
+import time
+import threading
+from bisect import bisect_left
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class Registry:
+    """All metrics of a process, rendered in the Prometheus text format
+
+    Executor processes never serve /metrics: they drain what they recorded
+    since the last drain and the web process merges it into its own
+    registry, so one scrape covers the whole server.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+    def drain(self):
+        """Values recorded since the last drain, reset to zero: [(name, labels, value), ...]"""
+        with self._lock:
+            metrics = [metric for metric in self._metrics.values() if metric.forwarded]
+        return [(metric.name, labels, value) for metric in metrics for labels, value in metric.drain()]
+
+    def merge(self, changes):
+        """Add values drained in another process"""
+        for name, labels, value in changes:
+            metric = self._metrics.get(name)
+            if metric is not None:
+                metric.child(labels).merge(value)
+
+
+REGISTRY = Registry()
+
+
+def _format_labels(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value):
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _Metric:
+    kind = None
+    forwarded = True
+
+    def __init__(self, name, help, labelnames=(), registry=REGISTRY):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._unlabeled = self.child(())
+        registry.register(self)
+
+    def labels(self, *values):
+        """The time series for these label values (pass strings, or bind it once on hot paths)"""
+        child = self._children.get(values)
+        return child if child is not None else self.child(tuple(str(value) for value in values))
+
+    def child(self, labels):
+        child = self._children.get(labels)
+        if child is None:
+            if len(labels) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {labels}")
+            with self._lock:
+                child = self._children.setdefault(labels, self._new_child())
+        return child
+
+    def drain(self):
+        with self._lock:
+            children = list(self._children.items())
+        return [(labels, value) for labels, child in children for value in [child.drain()] if value]
+
+    def samples(self):
+        with self._lock:
+            children = sorted(self._children.items())
+        return [line for labels, child in children for line in self._child_samples(labels, child)]
+
+    def _child_samples(self, labels, child):
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(child.value)}"]
+
+
+class _Value:
+    # acquire()/release() instead of `with`: these run on every step and request
+    __slots__ = ('value', '_lock')
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        self._lock.acquire()
+        self.value += amount
+        self._lock.release()
+
+    def dec(self, amount=1):
+        self._lock.acquire()
+        self.value -= amount
+        self._lock.release()
+
+    def drain(self):
+        with self._lock:
+            value, self.value = self.value, 0.0
+        return value
+
+    merge = inc
+
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+
+    kind = 'counter'
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1):
+        self._unlabeled.inc(amount)
+
+
+class Gauge(_Metric):
+    """Value that goes up and down; only inc/dec, so executor changes add up in the web process"""
+
+    kind = 'gauge'
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1):
+        self._unlabeled.inc(amount)
+
+    def dec(self, amount=1):
+        self._unlabeled.dec(amount)
+
+
+class _HistogramValue:
+    __slots__ = ('bounds', 'counts', 'sum', '_lock')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # Per bucket, last is +Inf; cumulated when rendered
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect_left(self.bounds, value)
+        self._lock.acquire()
+        self.counts[index] += 1
+        self.sum += value
+        self._lock.release()
+
+    def drain(self):
+        with self._lock:
+            if not any(self.counts):
+                return None
+            value = (self.counts, self.sum)
+            self.counts = [0] * len(self.counts)
+            self.sum = 0.0
+        return value
+
+    def merge(self, value):
+        counts, total = value
+        with self._lock:
+            self.counts = [mine + theirs for mine, theirs in zip(self.counts, counts)]
+            self.sum += total
+
+
+class Histogram(_Metric):
+    """Distribution of observed values (seconds, bytes, ...) over fixed buckets"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=DURATION_BUCKETS, registry=REGISTRY):
+        self.buckets = tuple(sorted(float(bound) for bound in buckets))
+        super().__init__(name, help, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value):
+        self._unlabeled.observe(value)
+
+    def _child_samples(self, labels, child):
+        with child._lock:
+            counts, total = list(child.counts), child.sum
+        lines = []
+        cumulative = 0
+        for bound, count in zip((*self.buckets, '+Inf'), counts):
+            cumulative += count
+            le = 'le="+Inf"' if bound == '+Inf' else f'le="{_format_value(bound)}"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+        label_text = _format_labels(self.labelnames, labels)
+        lines.append(f"{self.name}_sum{label_text} {_format_value(total)}")
+        lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+class GaugeFunc(_Metric):
+    """Gauge read from a callback at scrape time (queue depths, pool sizes)"""
+
+    kind = 'gauge'
+    forwarded = False
+
+    def __init__(self, name, help, callback, registry=REGISTRY):
+        self.callback = callback
+        super().__init__(name, help, (), registry)
+
+    def _new_child(self):
+        return _Value()
+
+    def _child_samples(self, labels, child):
+        try:
+            value = self.callback()
+        except Exception:
+            return []  # Source not available (e.g. not started yet) - omit the sample
+        return [f"{self.name} {_format_value(value)}"] if value is not None else []
+
+
+# Metrics recorded by the executor (in whichever process runs the script)
+
+RUNS_STARTED = Counter('automation_runs_started_total', 'Script runs started', ('browser',))
+RUNS_FINISHED = Counter('automation_runs_finished_total', 'Script runs finished, by outcome', ('outcome',))
+RUN_DURATION = Histogram('automation_run_duration_seconds', 'Wall time of a script run, setup to teardown',
+                         buckets=(1, 5, 10, 30, 60, 120, 300, 600, 1800))
+STEP_DURATION = Histogram('automation_step_duration_seconds', 'Duration of one executed step', ('action',),
+                          buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60))
+STEPS_FAILED = Counter('automation_steps_failed_total', 'Steps that failed', ('action',))
+STEP_PHASE_SECONDS = Counter('automation_step_phase_seconds_total',
+                             'Step time spent per phase (wait, action, screenshot, video, other)', ('phase',))
+DRIVER_STARTUP = Histogram('automation_driver_startup_seconds', 'Time to get a ready browser for a run',
+                           ('source',), buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 60))
+BROWSERS_ACTIVE = Gauge('automation_browsers_active', 'Browsers currently held by a run')
+BYTES_WRITTEN = Counter('automation_artifact_bytes_written_total', 'Bytes of screenshots and videos written',
+                        ('kind',))
+
+# Recorded by the web server
+
+HTTP_DURATION = Histogram('automation_http_request_duration_seconds', 'API request latency by route',
+                          ('method', 'route', 'status'))
+
+
+def benchmark(iterations=200000):
+    """Per-operation cost of the hot-path calls, in nanoseconds"""
+    registry = Registry()
+    counter = Counter('bench_total', 'Benchmark counter', registry=registry)
+    labeled = Counter('bench_labeled_total', 'Benchmark labeled counter', ('action',), registry=registry)
+    histogram = Histogram('bench_seconds', 'Benchmark histogram', ('action',), registry=registry)
+    series = histogram.labels('click')
+
+    operations = {
+        'counter.inc()': counter.inc,
+        'counter.labels(action).inc()': lambda: labeled.labels('click').inc(),
+        'histogram.observe() (bound series)': lambda: series.observe(0.3),
+        'histogram.labels(action).observe()': lambda: histogram.labels('click').observe(0.3),
+    }
+    results = {}
+    for name, operation in {'empty call (baseline)': lambda: None, **operations}.items():
+        started = time.perf_counter()
+        for _ in range(iterations):
+            operation()
+        results[name] = round((time.perf_counter() - started) / iterations * 1e9)
+
+    started = time.perf_counter()
+    registry.render()
+    results['render (3 metrics, once)'] = round((time.perf_counter() - started) * 1e9)
+    return results
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    print(f"📏 Metrics microbenchmark ({count} iterations, ns per operation)")
+    for name, nanoseconds in benchmark(count).items():
+        print(f"  {name:40} {nanoseconds:>8}")
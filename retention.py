@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+"""
+Retention - Age and size quotas, transcoding and screenshot archiving for recorded artifacts
+"""
+
+import os
+import json
+import time
+import shutil
+import zipfile
+import logging
+import threading
+import subprocess
+from datetime import datetime
+
+from config import Config
+from video_catalog import get_video_catalog
+from video_thumbnails import remove_previews
+
+logger = logging.getLogger(__name__)
+
+DAY = 86400
+MB = 1024 * 1024
+
+RUN_MANIFEST = 'run.json'
+ARCHIVE_DIRNAME = 'archive'
+FAILED_OUTCOMES = ('failed', 'timeout', 'error')
+
+
+def is_failed(outcome):
+    return outcome in FAILED_OUTCOMES
+
+
+def delete_video(video_dir, name, catalog=None):
+    """Remove a video with its previews and debug frame; returns bytes freed"""
+    freed = 0
+    stem = os.path.splitext(name)[0]
+    for path in (os.path.join(video_dir, name), os.path.join(video_dir, f"debug_screenshot_{stem}.png")):
+        try:
+            freed += os.path.getsize(path)
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+    remove_previews(video_dir, name)
+    (catalog or get_video_catalog()).remove(name)
+    return freed
+
+
+def transcode_video(path):
+    """Re-encode a video at a lower bitrate in place; returns the new size or None if not smaller"""
+    tmp_path = os.path.join(os.path.dirname(path), f".compact_{os.path.basename(path)}")
+    if path.lower().endswith('.webm'):
+        codec = ['-c:v', 'libvpx-vp9', '-b:v', '0', '-crf', str(Config.VIDEO_COMPACT_CRF + 12),
+                 '-deadline', 'good', '-cpu-used', '5']
+    else:
+        codec = ['-c:v', 'libx264', '-preset', 'veryfast', '-crf', str(Config.VIDEO_COMPACT_CRF),
+                 '-movflags', '+faststart']
+    cmd = [
+        'ffmpeg', '-hide_banner', '-loglevel', 'error', '-y', '-i', path,
+        '-vf', f"scale='min({Config.VIDEO_COMPACT_WIDTH},iw)':-2", '-vsync', 'vfr',
+        '-pix_fmt', 'yuv420p', '-an', '-threads', '1', *codec, tmp_path
+    ]
+    try:
+        subprocess.run(cmd, check=True, capture_output=True, timeout=Config.VIDEO_COMPACT_TIMEOUT)
+        new_size = os.path.getsize(tmp_path)
+        if new_size >= os.path.getsize(path):
+            return None
+        os.replace(tmp_path, path)
+        return new_size
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+class _Budget:
+    """Caps the work done per pass so retention stays incremental"""
+
+    def __init__(self, operations):
+        self.remaining = operations
+
+    def take(self):
+        if self.remaining <= 0:
+            return False
+        self.remaining -= 1
+        return True
+
+
+class RetentionEngine:
+    """Applies retention tiers to recorded videos and step screenshots
+
+    Videos: transcoded to a lower bitrate after VIDEO_COMPACT_AFTER_DAYS,
+    deleted after VIDEO_RETENTION_DAYS (VIDEO_FAILED_RETENTION_DAYS for
+    failed runs), oldest passing runs first once VIDEO_QUOTA_MB is exceeded.
+
+    Screenshots: each run's directory is packed into one ZIP after
+    SCREENSHOT_ARCHIVE_AFTER_DAYS; archives follow the same age and quota
+    rules as videos.
+    """
+
+    def __init__(self, video_dir='recorded_videos', screenshots_dir='allure-results/screenshots', catalog=None):
+        self.video_dir = video_dir
+        self.screenshots_dir = screenshots_dir
+        self.archive_dir = os.path.join(screenshots_dir, ARCHIVE_DIRNAME)
+        self.catalog = catalog or get_video_catalog()
+        self._run_lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self.last_report = None
+
+    def run_once(self, budget=None):
+        """One incremental pass; returns what was done"""
+        if not self._run_lock.acquire(blocking=False):
+            return None
+        lock_file = self._acquire_process_lock()
+        if lock_file is False:
+            self._run_lock.release()
+            return None  # Another server process is running retention
+        try:
+            started = time.monotonic()
+            budget = _Budget(budget or Config.RETENTION_BATCH)
+            report = {
+                'videos_deleted': 0,
+                'videos_transcoded': 0,
+                'screenshot_runs_archived': 0,
+                'archives_deleted': 0,
+                'bytes_freed': 0,
+            }
+            self._expire_videos(report, budget)
+            self._compact_videos(report)
+            self._archive_screenshots(report, budget)
+            self._expire_archives(report, budget)
+            report['budget_exhausted'] = budget.remaining <= 0
+            report['duration_ms'] = round((time.monotonic() - started) * 1000, 1)
+            report['finished'] = datetime.now().isoformat()
+            self.last_report = report
+            return report
+        finally:
+            self._release_process_lock(lock_file)
+            self._run_lock.release()
+
+    # Videos
+
+    def _expire_videos(self, report, budget):
+        now = time.time()
+        rows = self.catalog.retention_rows()
+        kept = []
+        for row in rows:
+            if row['status'] == 'processing':
+                continue
+            age = now - row['created']
+            if row['status'] == 'failed' and age > DAY:
+                # Encode never produced a file
+                self.catalog.remove(row['name'])
+                continue
+            limit = Config.VIDEO_FAILED_RETENTION_DAYS if is_failed(row['outcome']) else Config.VIDEO_RETENTION_DAYS
+            if age > limit * DAY:
+                if not budget.take():
+                    return
+                report['bytes_freed'] += delete_video(self.video_dir, row['name'], self.catalog)
+                report['videos_deleted'] += 1
+            else:
+                kept.append(row)
+
+        # Size quota: drop the oldest passing runs first, failed runs last
+        total = sum(row['size'] or 0 for row in kept)
+        quota = Config.VIDEO_QUOTA_MB * MB
+        for row in sorted(kept, key=lambda row: (is_failed(row['outcome']), row['created'])):
+            if total <= quota or not budget.take():
+                break
+            freed = delete_video(self.video_dir, row['name'], self.catalog)
+            total -= row['size'] or freed
+            report['bytes_freed'] += freed
+            report['videos_deleted'] += 1
+
+    def _compact_videos(self, report):
+        if Config.VIDEO_COMPACT_AFTER_DAYS <= 0 or not shutil.which('ffmpeg'):
+            return
+        cutoff = time.time() - Config.VIDEO_COMPACT_AFTER_DAYS * DAY
+        # Transcoding is the expensive step, so only a few per pass
+        remaining = Config.RETENTION_TRANSCODES_PER_PASS
+        for row in self.catalog.retention_rows():
+            if remaining <= 0 or row['created'] > cutoff:
+                break
+            if row['compacted'] or row['status'] != 'ready':
+                continue
+            remaining -= 1
+            path = os.path.join(self.video_dir, row['name'])
+            try:
+                new_size = transcode_video(path)
+            except (subprocess.SubprocessError, OSError) as e:
+                logger.warning(f"⚠️ Retention: failed to transcode {row['name']}: {e}")
+                new_size = None
+            fields = {'compacted': 1}
+            if new_size is not None:
+                report['bytes_freed'] += (row['size'] or 0) - new_size
+                report['videos_transcoded'] += 1
+                fields.update(size=new_size, modified=time.time())
+            self.catalog.upsert(row['name'], **fields)
+
+    # Screenshots
+
+    def _archive_screenshots(self, report, budget):
+        if not os.path.isdir(self.screenshots_dir):
+            return
+        cutoff = time.time() - Config.SCREENSHOT_ARCHIVE_AFTER_DAYS * DAY
+        loose = {}
+        with os.scandir(self.screenshots_dir) as entries:
+            for entry in entries:
+                if entry.name == ARCHIVE_DIRNAME:
+                    continue
+                if entry.is_dir():
+                    manifest_path = os.path.join(entry.path, RUN_MANIFEST)
+                    # Runs still in progress have no manifest yet; abandoned ones get a day's grace
+                    finished = os.path.exists(manifest_path)
+                    mtime = os.path.getmtime(manifest_path) if finished else entry.stat().st_mtime
+                    if mtime < (cutoff if finished else cutoff - DAY):
+                        if not budget.take():
+                            return
+                        self._archive_run(entry.path, report)
+                elif entry.is_file() and entry.stat().st_mtime < cutoff:
+                    # Screenshots taken outside a run: bundle them per day
+                    day = datetime.fromtimestamp(entry.stat().st_mtime).strftime('%Y%m%d')
+                    loose.setdefault(day, []).append(entry.path)
+
+        for day, paths in loose.items():
+            if not budget.take():
+                return
+            self._write_archive(os.path.join(self.archive_dir, f"loose_{day}.zip"), paths, append=True)
+            report['screenshot_runs_archived'] += 1
+
+    def _archive_run(self, run_dir, report):
+        outcome = None
+        try:
+            with open(os.path.join(run_dir, RUN_MANIFEST), 'r', encoding='utf-8') as f:
+                outcome = json.load(f).get('outcome')
+        except (OSError, ValueError):
+            pass
+        # The outcome goes in the name so expiry never has to open the archive
+        name = f"{os.path.basename(run_dir)}__{outcome or 'unknown'}.zip"
+        paths = [os.path.join(run_dir, filename) for filename in sorted(os.listdir(run_dir))]
+        self._write_archive(os.path.join(self.archive_dir, name), paths)
+        shutil.rmtree(run_dir, ignore_errors=True)
+        report['screenshot_runs_archived'] += 1
+
+    def _write_archive(self, archive_path, paths, append=False):
+        os.makedirs(self.archive_dir, exist_ok=True)
+        tmp_path = f"{archive_path}.tmp"
+        if append and os.path.exists(archive_path):
+            shutil.copyfile(archive_path, tmp_path)
+        # PNGs are already compressed - store them and save the CPU
+        with zipfile.ZipFile(tmp_path, 'a' if append else 'w', compression=zipfile.ZIP_STORED) as archive:
+            existing = set(archive.namelist())
+            for path in paths:
+                if os.path.basename(path) not in existing:
+                    archive.write(path, arcname=os.path.basename(path))
+        os.replace(tmp_path, archive_path)
+        if append:
+            for path in paths:
+                os.remove(path)
+
+    def _expire_archives(self, report, budget):
+        if not os.path.isdir(self.archive_dir):
+            return
+        now = time.time()
+        archives = []
+        with os.scandir(self.archive_dir) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name.endswith('.zip'):
+                    stat = entry.stat()
+                    outcome = entry.name[:-4].rsplit('__', 1)[-1] if '__' in entry.name else None
+                    archives.append((entry.path, stat.st_mtime, stat.st_size, is_failed(outcome)))
+
+        kept = []
+        for path, mtime, size, failed in archives:
+            limit = Config.SCREENSHOT_FAILED_RETENTION_DAYS if failed else Config.SCREENSHOT_RETENTION_DAYS
+            if now - mtime > limit * DAY:
+                if not budget.take():
+                    return
+                os.remove(path)
+                report['archives_deleted'] += 1
+                report['bytes_freed'] += size
+            else:
+                kept.append((path, mtime, size, failed))
+
+        total = sum(size for _, _, size, _ in kept)
+        quota = Config.SCREENSHOT_QUOTA_MB * MB
+        for path, mtime, size, failed in sorted(kept, key=lambda item: (item[3], item[1])):
+            if total <= quota or not budget.take():
+                break
+            os.remove(path)
+            total -= size
+            report['archives_deleted'] += 1
+            report['bytes_freed'] += size
+
+    # Background loop
+
+    def start(self, interval=None):
+        """Run passes in the background every `interval` seconds"""
+        if self._thread and self._thread.is_alive():
+            return
+        interval = interval or Config.RETENTION_INTERVAL
+
+        def loop():
+            while not self._stop.wait(interval):
+                try:
+                    report = self.run_once()
+                    if report and (report['videos_deleted'] or report['videos_transcoded']
+                                   or report['screenshot_runs_archived'] or report['archives_deleted']):
+                        logger.info(f"🧹 Retention: {report['videos_deleted']} videos deleted, "
+                              f"{report['videos_transcoded']} transcoded, "
+                              f"{report['screenshot_runs_archived']} screenshot runs archived, "
+                              f"{report['bytes_freed'] / MB:.1f} MB freed")
+                except Exception as e:
+                    logger.warning(f"⚠️ Retention pass failed: {e}")
+
+        self._thread = threading.Thread(target=loop, name="retention")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _acquire_process_lock(self):
+        """Advisory lock so only one server process runs retention; None where unsupported"""
+        try:
+            import fcntl
+        except ImportError:
+            return None
+        os.makedirs(self.video_dir, exist_ok=True)
+        lock_file = open(os.path.join(self.video_dir, '.retention.lock'), 'w')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return lock_file
+        except OSError:
+            lock_file.close()
+            return False
+
+    def _release_process_lock(self, lock_file):
+        if lock_file:
+            lock_file.close()  # Closing releases the flock
+
+
+def write_run_manifest(run_dir, **fields):
+    """Record how a run ended next to its screenshots (read when archiving)"""
+    os.makedirs(run_dir, exist_ok=True)
+    with open(os.path.join(run_dir, RUN_MANIFEST), 'w', encoding='utf-8') as f:
+        json.dump(fields, f)
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_retention_engine():
+    """Process-wide retention engine"""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = RetentionEngine()
+        return _engine
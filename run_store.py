@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+Run Store - Durable SQLite (WAL) record of script runs, their steps and logs, shared by every server process
+"""
+
+import os
+import json
+import time
+import queue
+import socket
+import logging
+import sqlite3
+import threading
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    script TEXT NOT NULL,
+    browser TEXT,
+    profile TEXT,
+    batch_id TEXT,
+    status TEXT NOT NULL,
+    progress INTEGER NOT NULL DEFAULT 0,
+    current_action TEXT,
+    total_steps INTEGER,
+    completed_steps INTEGER NOT NULL DEFAULT 0,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    error TEXT,
+    timeout TEXT,
+    video TEXT,
+    video_job TEXT,
+    artifacts TEXT,
+    worker TEXT,
+    timings TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_runs_created ON runs (created);
+CREATE INDEX IF NOT EXISTS idx_runs_script ON runs (script, created);
+CREATE INDEX IF NOT EXISTS idx_runs_status ON runs (status, created);
+CREATE INDEX IF NOT EXISTS idx_runs_batch ON runs (batch_id);
+
+CREATE TABLE IF NOT EXISTS steps (
+    run_id TEXT NOT NULL,
+    step INTEGER NOT NULL,
+    action TEXT,
+    target TEXT,
+    label TEXT,
+    status TEXT NOT NULL,
+    started REAL,
+    finished REAL,
+    duration_ms REAL,
+    error TEXT,
+    phases TEXT,
+    PRIMARY KEY (run_id, step)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS run_logs (
+    run_id TEXT NOT NULL,
+    offset INTEGER NOT NULL,
+    time REAL NOT NULL,
+    level TEXT NOT NULL,
+    message TEXT NOT NULL,
+    PRIMARY KEY (run_id, offset)
+) WITHOUT ROWID;
+"""
+
+RUN_COLUMNS = ('script', 'browser', 'profile', 'batch_id', 'status', 'progress', 'current_action',
+               'total_steps', 'completed_steps', 'created', 'started', 'finished', 'error', 'timeout',
+               'video', 'video_job', 'artifacts', 'worker', 'timings')
+
+STEP_COLUMNS = ('action', 'target', 'label', 'status', 'started', 'finished', 'duration_ms', 'error', 'phases')
+
+# Stored as JSON text, returned as dicts
+JSON_COLUMNS = ('timings', 'phases')
+
+# Columns added after the first release, migrated in place
+MIGRATIONS = (
+    ('runs', 'timings', 'ALTER TABLE runs ADD COLUMN timings TEXT'),
+    ('steps', 'phases', 'ALTER TABLE steps ADD COLUMN phases TEXT'),
+)
+
+SORT_COLUMNS = ('created', 'started', 'finished', 'script', 'status')
+
+ACTIVE_STATUSES = ('queued', 'running')
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _encode(fields):
+    for key in JSON_COLUMNS:
+        if isinstance(fields.get(key), dict):
+            fields[key] = json.dumps(fields[key])
+    return fields
+
+
+def _decode(row):
+    record = dict(row)
+    for key in JSON_COLUMNS:
+        if record.get(key):
+            record[key] = json.loads(record[key])
+    return record
+
+
+class RunStore:
+    """Run history with a single background writer and lock-free readers
+
+    Writes from the action thread are only queued; one thread per process
+    applies them in batched transactions, so recording a step or a log line
+    never waits on the disk. WAL mode lets every server process read while
+    another writes, and all lookups go through the primary key or an index.
+    """
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or Config.RUN_STORE_PATH
+        os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+            for table, column, statement in MIGRATIONS:
+                if column not in {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}:
+                    conn.execute(statement)
+        self._local = threading.local()
+        self._queue = queue.Queue()
+        self._writer = threading.Thread(target=self._writer_loop, name="run-store-writer")
+        self._writer.daemon = True
+        self._writer.start()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    # Writes (queued)
+
+    def create_run(self, run_id, script, **fields):
+        fields.setdefault('status', 'queued')
+        fields.setdefault('created', time.time())
+        fields.setdefault('worker', WORKER_ID)
+        self._queue.put(('run', run_id, dict(fields, script=script)))
+
+    def update_run(self, run_id, **fields):
+        self._queue.put(('run', run_id, fields))
+
+    def record_step(self, run_id, step, **fields):
+        self._queue.put(('step', run_id, step, fields))
+
+    def record_log(self, run_id, entry):
+        self._queue.put(('log', run_id, entry))
+
+    def flush(self, timeout=None):
+        """Wait until everything queued so far is committed"""
+        done = threading.Event()
+        self._queue.put(('flush', done))
+        return done.wait(timeout)
+
+    def _writer_loop(self):
+        conn = self._connect()
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < Config.RUN_STORE_BATCH:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            flushed = []
+            try:
+                with conn:
+                    for item in batch:
+                        if item[0] == 'flush':
+                            flushed.append(item[1])
+                            continue
+                        try:
+                            self._apply(conn, item)
+                        except sqlite3.InterfaceError as e:
+                            # A value SQLite cannot store - skip the change, keep the batch
+                            logger.warning(f"⚠️ Run store skipped a {item[0]} change for {item[1]}: {e}")
+            except sqlite3.Error as e:
+                logger.error(f"❌ Run store write failed ({len(batch)} changes lost): {e}")
+            for event in flushed:
+                event.set()
+
+    def _apply(self, conn, item):
+        kind, run_id = item[0], item[1]
+        if kind == 'run':
+            fields = _encode({key: value for key, value in item[2].items() if key in RUN_COLUMNS})
+            if 'script' in fields:
+                columns = ', '.join(['run_id', *fields])
+                placeholders = ', '.join('?' for _ in range(len(fields) + 1))
+                conn.execute(f'INSERT OR REPLACE INTO runs ({columns}) VALUES ({placeholders})',
+                             [run_id, *fields.values()])
+            elif fields:
+                assignments = ', '.join(f"{key} = ?" for key in fields)
+                conn.execute(f'UPDATE runs SET {assignments} WHERE run_id = ?', [*fields.values(), run_id])
+        elif kind == 'step':
+            fields = _encode({key: value for key, value in item[3].items() if key in STEP_COLUMNS})
+            columns = ', '.join(['run_id', 'step', *fields])
+            placeholders = ', '.join('?' for _ in range(len(fields) + 2))
+            updates = ', '.join(f"{key} = excluded.{key}" for key in fields)
+            conn.execute(f'INSERT INTO steps ({columns}) VALUES ({placeholders}) '
+                         f'ON CONFLICT(run_id, step) DO UPDATE SET {updates}',
+                         [run_id, item[2], *fields.values()])
+        elif kind == 'log':
+            entry = item[2]
+            conn.execute('INSERT OR IGNORE INTO run_logs (run_id, offset, time, level, message) VALUES (?, ?, ?, ?, ?)',
+                         (run_id, entry['offset'], entry['time'], entry['level'], entry['message']))
+
+    # Reads
+
+    def _reader(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def get_run(self, run_id):
+        row = self._reader().execute('SELECT * FROM runs WHERE run_id = ?', (run_id,)).fetchone()
+        return _decode(row) if row else None
+
+    def get_steps(self, run_id):
+        rows = self._reader().execute('SELECT * FROM steps WHERE run_id = ? ORDER BY step', (run_id,)).fetchall()
+        return [_decode(row) for row in rows]
+
+    def read_logs(self, run_id, since=0, limit=None):
+        """Log entries from offset `since` on; returns (entries, next cursor)"""
+        rows = self._reader().execute(
+            'SELECT offset, time, level, message FROM run_logs WHERE run_id = ? AND offset >= ? ORDER BY offset LIMIT ?',
+            (run_id, max(0, since), limit or Config.LOG_FETCH_LIMIT)
+        ).fetchall()
+        entries = [dict(row) for row in rows]
+        return entries, entries[-1]['offset'] + 1 if entries else since
+
+    def tail_logs(self, run_id, count=10):
+        rows = self._reader().execute(
+            'SELECT offset, time, level, message FROM run_logs WHERE run_id = ? ORDER BY offset DESC LIMIT ?',
+            (run_id, count)
+        ).fetchall()
+        return [dict(row) for row in reversed(rows)]
+
+    def count_logs(self, run_id):
+        row = self._reader().execute('SELECT MAX(offset) FROM run_logs WHERE run_id = ?', (run_id,)).fetchone()
+        return 0 if row[0] is None else row[0] + 1
+
+    def query_runs(self, page=1, per_page=50, sort='created', order='desc', script=None, status=None,
+                   batch_id=None, since=None, until=None):
+        """Return (rows, total) for one page of run history"""
+        where = []
+        params = []
+        if script:
+            where.append('script = ?')
+            params.append(script)
+        if status:
+            where.append('status = ?')
+            params.append(status)
+        if batch_id:
+            where.append('batch_id = ?')
+            params.append(batch_id)
+        if since is not None:
+            where.append('created >= ?')
+            params.append(since)
+        if until is not None:
+            where.append('created < ?')
+            params.append(until)
+        clause = f"WHERE {' AND '.join(where)}" if where else ''
+
+        sort = sort if sort in SORT_COLUMNS else 'created'
+        order = 'ASC' if str(order).lower() == 'asc' else 'DESC'
+        per_page = max(1, min(int(per_page), Config.RUN_STORE_MAX_PAGE))
+        offset = (max(1, int(page)) - 1) * per_page
+
+        conn = self._reader()
+        total = conn.execute(f'SELECT COUNT(*) FROM runs {clause}', params).fetchone()[0]
+        rows = conn.execute(
+            f'SELECT * FROM runs {clause} ORDER BY {sort} {order}, run_id {order} LIMIT ? OFFSET ?',
+            [*params, per_page, offset]
+        ).fetchall()
+        return [_decode(row) for row in rows], total
+
+    # Maintenance
+
+    def recover_orphans(self):
+        """Mark runs left queued/running by a dead process on this host as failed"""
+        host = socket.gethostname()
+        orphaned = []
+        rows = self._reader().execute(
+            f"SELECT run_id, worker FROM runs WHERE status IN ({', '.join('?' for _ in ACTIVE_STATUSES)})",
+            ACTIVE_STATUSES
+        ).fetchall()
+        for run_id, worker in rows:
+            worker_host, _, pid = (worker or '').rpartition(':')
+            if worker_host != host or not pid.isdigit() or int(pid) == os.getpid():
+                continue
+            try:
+                os.kill(int(pid), 0)
+            except ProcessLookupError:
+                orphaned.append(run_id)
+            except OSError:
+                pass  # Alive but owned by another user
+        for run_id in orphaned:
+            self.update_run(run_id, status='error', error='Server process exited during the run',
+                            finished=time.time())
+        return len(orphaned)
+
+    def purge(self, older_than_days=None):
+        """Delete finished runs (with their steps and logs) older than the retention window"""
+        cutoff = time.time() - (older_than_days or Config.RUN_HISTORY_DAYS) * 86400
+        conn = self._connect()
+        try:
+            with conn:
+                stale = f"SELECT run_id FROM runs WHERE created < ? AND status NOT IN ({', '.join('?' for _ in ACTIVE_STATUSES)})"
+                params = (cutoff, *ACTIVE_STATUSES)
+                conn.execute(f'DELETE FROM run_logs WHERE run_id IN ({stale})', params)
+                conn.execute(f'DELETE FROM steps WHERE run_id IN ({stale})', params)
+                return conn.execute(f'DELETE FROM runs WHERE run_id IN ({stale})', params).rowcount
+        finally:
+            conn.close()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_run_store():
+    """Process-wide run store"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = RunStore()
+        return _store
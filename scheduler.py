@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Execution Scheduler - Runs queued scripts on a fixed-size worker pool
+"""
+
+import os
+import time
+import itertools
+import logging
+import threading
+
+from config import Config
+from browser_profiles import get_profile
+
+logger = logging.getLogger(__name__)
+
+
+def available_memory_mb():
+    """Best-effort available memory in MB (None if it cannot be determined)"""
+    try:
+        with open('/proc/meminfo', 'r') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) // 1024
+    except Exception:
+        pass
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_AVPHYS_PAGES') // (1024 * 1024)
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def default_worker_count():
+    """Size the worker pool to CPU count, capped by how many browsers fit in RAM"""
+    if Config.SCHEDULER_WORKERS > 0:
+        return Config.SCHEDULER_WORKERS
+
+    workers = os.cpu_count() or 1
+    memory = available_memory_mb()
+    if memory:
+        # Lighter launch profiles fit more browsers in the same RAM
+        workers = min(workers, max(1, memory // get_profile().memory_mb))
+    return max(1, workers)
+
+
+class ScheduledJob:
+    """A queued unit of work"""
+
+    def __init__(self, job_id, fn, priority, seq, group):
+        self.job_id = job_id
+        self.fn = fn
+        self.priority = priority
+        self.seq = seq
+        self.group = group
+        self.submitted_at = time.monotonic()
+
+    @property
+    def sort_key(self):
+        # Higher priority first, then FIFO
+        return (-self.priority, self.seq)
+
+
+class ExecutionScheduler:
+    """Priority/FIFO queue in front of a bounded pool of worker threads"""
+
+    def __init__(self, workers=None):
+        self.workers = workers or default_worker_count()
+        self._pending = []
+        self._running = {}
+        self._group_limits = {}
+        self._group_running = {}
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._shutdown = False
+
+        # Statistics
+        self.completed = 0
+        self.failed = 0
+        self.total_queue_wait = 0.0
+
+        self._threads = []
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker_loop, name=f"scheduler-worker-{i}")
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, job_id, fn, priority=0, group=None):
+        """Queue a job and return its 1-based queue position"""
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError("Scheduler is shut down")
+            self._pending.append(ScheduledJob(job_id, fn, priority, next(self._seq), group))
+            self._cond.notify()
+        return self.queue_position(job_id)
+
+    def cancel(self, job_id):
+        """Remove a job that has not started yet"""
+        with self._cond:
+            for job in self._pending:
+                if job.job_id == job_id:
+                    self._pending.remove(job)
+                    return True
+        return False
+
+    def set_group_limit(self, group, limit):
+        """Cap how many jobs of a group (e.g. a batch) may run at once"""
+        with self._cond:
+            self._group_limits[group] = max(1, int(limit))
+            self._cond.notify_all()
+
+    def queue_position(self, job_id):
+        """1-based position in the queue, 0 if running, None if unknown or finished"""
+        with self._cond:
+            if job_id in self._running:
+                return 0
+            ordered = sorted(self._pending, key=lambda job: job.sort_key)
+            for position, job in enumerate(ordered, 1):
+                if job.job_id == job_id:
+                    return position
+        return None
+
+    def stats(self):
+        """Scheduler statistics for the API"""
+        with self._cond:
+            started = self.completed + self.failed + len(self._running)
+            return {
+                'workers': self.workers,
+                'running': len(self._running),
+                'queued': len(self._pending),
+                'completed': self.completed,
+                'failed': self.failed,
+                'queue_wait_avg_ms': round(self.total_queue_wait / started * 1000, 1) if started else 0,
+            }
+
+    def shutdown(self):
+        """Stop accepting jobs and drop everything still queued"""
+        with self._cond:
+            self._shutdown = True
+            self._pending.clear()
+            self._cond.notify_all()
+
+    def _next_job(self):
+        """Pick the highest-priority job whose group is under its concurrency cap"""
+        eligible = [
+            job for job in self._pending
+            if job.group is None
+            or self._group_running.get(job.group, 0) < self._group_limits.get(job.group, self.workers)
+        ]
+        if not eligible:
+            return None
+        job = min(eligible, key=lambda job: job.sort_key)
+        self._pending.remove(job)
+        return job
+
+    def _worker_loop(self):
+        while True:
+            with self._cond:
+                job = None
+                while not self._shutdown:
+                    job = self._next_job()
+                    if job:
+                        break
+                    self._cond.wait()
+                if self._shutdown:
+                    return
+                self._running[job.job_id] = job
+                if job.group is not None:
+                    self._group_running[job.group] = self._group_running.get(job.group, 0) + 1
+                self.total_queue_wait += time.monotonic() - job.submitted_at
+
+            failed = False
+            try:
+                job.fn()
+            except Exception as e:
+                failed = True
+                logger.error(f"❌ Scheduled job {job.job_id} failed: {e}")
+            finally:
+                with self._cond:
+                    self._running.pop(job.job_id, None)
+                    if job.group is not None:
+                        self._group_running[job.group] -= 1
+                        if not self._group_running[job.group]:
+                            del self._group_running[job.group]
+                            if not any(pending.group == job.group for pending in self._pending):
+                                self._group_limits.pop(job.group, None)
+                    if failed:
+                        self.failed += 1
+                    else:
+                        self.completed += 1
+                    self._cond.notify_all()
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """Process-wide execution scheduler"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = ExecutionScheduler()
+            logger.info(f"🧵 Execution scheduler started with {_scheduler.workers} workers")
+        return _scheduler
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Screenshot Pipeline - Decodes and writes screenshots off the action thread
+"""
+
+import queue
+import base64
+import logging
+import threading
+
+from config import Config
+from metrics import BYTES_WRITTEN
+
+logger = logging.getLogger(__name__)
+
+SCREENSHOT_BYTES = BYTES_WRITTEN.labels('screenshot')
+
+
+class ScreenshotPipeline:
+    """Bounded queue of captured screenshots drained by background workers
+
+    Allure keeps its step context per thread, so workers never attach:
+    written screenshots are kept per owner until it collects them with
+    `take_attachments` on its own thread.
+    """
+
+    def __init__(self, max_queue=None, workers=None):
+        self._queue = queue.Queue(maxsize=max_queue or Config.SCREENSHOT_QUEUE_SIZE)
+        self._pending = {}
+        self._attachments = {}
+        self._cond = threading.Condition()
+
+        # Statistics
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.bytes_written = 0
+
+        self._threads = []
+        for i in range(workers or Config.SCREENSHOT_WORKERS):
+            thread = threading.Thread(target=self._worker_loop, name=f"screenshot-writer-{i}")
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, screenshot_b64, path, name, owner=None, attach=True):
+        """Queue a base64 screenshot for writing; returns False if it had to be dropped"""
+        with self._cond:
+            self._pending[owner] = self._pending.get(owner, 0) + 1
+        try:
+            # Brief backpressure, then drop rather than stall the action thread
+            self._queue.put((screenshot_b64, path, name, owner, attach), timeout=Config.SCREENSHOT_QUEUE_TIMEOUT)
+            return True
+        except queue.Full:
+            self._done(owner)
+            with self._cond:
+                self.dropped += 1
+            logger.warning(f"⚠️ Screenshot queue full, dropped {name}")
+            return False
+
+    def flush(self, owner=None, timeout=None):
+        """Wait until every screenshot submitted by `owner` has been written"""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._pending.get(owner), timeout)
+
+    def take_attachments(self, owner=None):
+        """(path, name) of the written screenshots `owner` wants attached, clearing the list"""
+        with self._cond:
+            return self._attachments.pop(owner, [])
+
+    def stats(self):
+        with self._cond:
+            return {
+                'queued': self._queue.qsize(),
+                'written': self.written,
+                'dropped': self.dropped,
+                'failed': self.failed,
+                'bytes_written': self.bytes_written,
+            }
+
+    def _worker_loop(self):
+        while True:
+            screenshot_b64, path, name, owner, attach = self._queue.get()
+            try:
+                png = base64.b64decode(screenshot_b64)
+                with open(path, 'wb') as f:
+                    f.write(png)
+                with self._cond:
+                    if attach:
+                        self._attachments.setdefault(owner, []).append((path, name))
+                    self.written += 1
+                    self.bytes_written += len(png)
+                SCREENSHOT_BYTES.inc(len(png))
+            except Exception as e:
+                with self._cond:
+                    self.failed += 1
+                logger.warning(f"⚠️ Failed to write screenshot {path}: {e}")
+            finally:
+                self._done(owner)
+
+    def _done(self, owner):
+        with self._cond:
+            remaining = self._pending.get(owner, 1) - 1
+            if remaining > 0:
+                self._pending[owner] = remaining
+            else:
+                self._pending.pop(owner, None)
+            self._cond.notify_all()
+
+
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+
+def get_screenshot_pipeline():
+    """Process-wide screenshot pipeline"""
+    global _pipeline
+    with _pipeline_lock:
+        if _pipeline is None:
+            _pipeline = ScreenshotPipeline()
+        return _pipeline
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Screenshot Policy - Decides which capture points are persisted as report screenshots
+"""
+
+import re
+import hashlib
+
+from config import Config
+
+SCREENSHOT_MODES = ('failure-only', 'every-n-steps', 'on-navigation', 'on-visual-change', 'always')
+
+NAVIGATION_ACTIONS = ('open_url',)
+
+
+class ScreenshotPolicy:
+    """Per-run screenshot policy
+
+    Modes:
+        failure-only      only failed steps
+        every-N-steps     after every Nth step (e.g. every-5-steps)
+        on-navigation     after steps that change the page URL
+        on-visual-change  after steps whose screenshot differs from the last one kept
+        always            before and after every step
+    Failed steps are captured in every mode while SCREENSHOT_ON_FAILURE is on.
+    """
+
+    def __init__(self, mode='always', every=5, on_failure=None):
+        if mode not in SCREENSHOT_MODES:
+            raise ValueError(f"Unknown screenshot policy: {mode}")
+        self.mode = mode
+        self.every = max(1, int(every))
+        self.on_failure = Config.SCREENSHOT_ON_FAILURE if on_failure is None else on_failure
+        self._last_url = None
+        self._last_digest = None
+
+    @classmethod
+    def parse(cls, spec):
+        """Build a policy from a spec such as 'failure-only' or 'every-5-steps'"""
+        spec = (spec or Config.SCREENSHOT_POLICY).strip().lower()
+        match = re.fullmatch(r'every-(\d+)-steps?', spec)
+        if match:
+            return cls('every-n-steps', every=int(match.group(1)))
+        if spec == 'every-n-steps':
+            return cls('every-n-steps', every=Config.SCREENSHOT_EVERY_N)
+        return cls(spec)
+
+    @property
+    def spec(self):
+        return f"every-{self.every}-steps" if self.mode == 'every-n-steps' else self.mode
+
+    @property
+    def needs_url(self):
+        return self.mode == 'on-navigation'
+
+    def should_capture(self, phase, step=None, url=None):
+        """Whether a capture point ('before', 'after' or 'failed') should be persisted"""
+        if phase == 'failed':
+            return self.on_failure
+        if self.mode == 'always':
+            return True
+        if phase != 'after':
+            return False
+        if self.mode == 'every-n-steps':
+            return step is not None and step.index % self.every == 0
+        if self.mode == 'on-navigation':
+            changed = url is not None and url != self._last_url
+            self._last_url = url or self._last_url
+            return changed or (step is not None and step.action in NAVIGATION_ACTIONS)
+        if self.mode == 'on-visual-change':
+            return True
+        return False
+
+    def accept(self, screenshot, phase):
+        """Final check once pixels are available (drops unchanged frames in on-visual-change mode)"""
+        if self.mode != 'on-visual-change' or phase == 'failed':
+            return True
+        digest = hashlib.md5(screenshot.encode('ascii')).hexdigest()
+        if digest == self._last_digest:
+            return False
+        self._last_digest = digest
+        return True
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Session Log - Bounded per-session log buffer with gzip spill and cursor reads, plus console logging setup
+"""
+
+import os
+import sys
+import gzip
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+import logging.handlers
+from collections import deque
+
+from config import Config
+
+LEVELS = {
+    'debug': logging.DEBUG,
+    'info': logging.INFO,
+    'warning': logging.WARNING,
+    'error': logging.ERROR,
+}
+
+
+class SessionLog:
+    """Log lines of one session, addressed by offset (0, 1, 2, ... for the whole run)
+
+    The newest LOG_BUFFER_LINES entries stay in memory; older ones are
+    spilled in chunks to a gzip file (one gzip member per chunk), so memory
+    stays flat for long or looping scripts and readers can still page
+    through everything with a cursor.
+    """
+
+    def __init__(self, name, capacity=None, spill_dir=None):
+        self.capacity = max(4, capacity or Config.LOG_BUFFER_LINES)
+        self.spill_path = os.path.join(spill_dir or Config.LOG_SPILL_DIR, f"{name}.jsonl.gz")
+        self._entries = deque()
+        self._base = 0  # Offset of the oldest entry still in memory
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        """Offset the next entry will get (total lines logged)"""
+        with self._lock:
+            return self._base + len(self._entries)
+
+    def append(self, level, message):
+        """Store a line; returns the entry {'offset', 'time', 'level', 'message'}"""
+        with self._lock:
+            entry = {
+                'offset': self._base + len(self._entries),
+                'time': time.time(),
+                'level': level if level in LEVELS else 'info',
+                'message': message
+            }
+            self._entries.append(entry)
+            if len(self._entries) > self.capacity:
+                # Spill a quarter at a time: fewer, larger gzip members
+                self._spill(self.capacity // 4)
+        return entry
+
+    def _spill(self, count):
+        chunk = [self._entries.popleft() for _ in range(count)]
+        os.makedirs(os.path.dirname(self.spill_path) or '.', exist_ok=True)
+        with gzip.open(self.spill_path, 'at', encoding='utf-8') as f:
+            f.writelines(json.dumps(entry) + '\n' for entry in chunk)
+        self._base += count
+
+    def read(self, since=0, limit=None):
+        """Entries from offset `since` on (at most `limit`); returns (entries, next cursor)"""
+        limit = limit or Config.LOG_FETCH_LIMIT
+        since = max(0, since)
+        with self._lock:
+            base = self._base
+            end = base + len(self._entries)
+            memory = [self._entries[i] for i in range(max(0, since - base), min(len(self._entries), since - base + limit))] \
+                if since < end else []
+
+        entries = self._read_spilled(since, min(base, since + limit)) if since < base else []
+        entries = (entries + memory)[:limit]
+        return entries, entries[-1]['offset'] + 1 if entries else min(since, end)
+
+    def _read_spilled(self, start, stop):
+        entries = []
+        try:
+            with gzip.open(self.spill_path, 'rt', encoding='utf-8') as f:
+                for offset, line in enumerate(f):
+                    if offset >= stop:
+                        break
+                    if offset >= start:
+                        entries.append(json.loads(line))
+        except (OSError, EOFError, ValueError):
+            pass  # Spill removed or truncated - return what is in memory
+        return entries
+
+    def tail(self, count=10):
+        with self._lock:
+            return list(self._entries)[-count:]
+
+    def discard(self):
+        """Drop the spill file (session forgotten)"""
+        try:
+            os.remove(self.spill_path)
+        except FileNotFoundError:
+            pass
+
+
+def format_entry(entry):
+    """Plain-text form of an entry, as shown in consoles and reports"""
+    return f"[{time.strftime('%H:%M:%S', time.localtime(entry['time']))}] {entry['message']}"
+
+
+_listener = None
+_listener_lock = threading.Lock()
+
+
+def configure_logging(level=None):
+    """Send log records to stdout from a background thread
+
+    Callers only enqueue records, so a burst of log lines from many sessions
+    never blocks a step on a slow terminal or pipe. Safe to call repeatedly.
+    """
+    global _listener
+    with _listener_lock:
+        if _listener is not None:
+            return
+        records = queue.SimpleQueue()
+        stream = logging.StreamHandler(sys.stdout)
+        stream.setFormatter(logging.Formatter('%(asctime)s %(levelname)-7s %(message)s', '%H:%M:%S'))
+        _listener = logging.handlers.QueueListener(records, stream)
+        _listener.start()
+        atexit.register(_listener.stop)  # Drain queued records on exit
+
+        root = logging.getLogger()
+        root.addHandler(logging.handlers.QueueHandler(records))
+        root.setLevel(LEVELS.get((level or Config.LOG_LEVEL).lower(), logging.INFO))
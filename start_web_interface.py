@@ -151,7 +151,8 @@ def main():
     
     try:
         # Import and run the web server
-        from web_server import app
+        from web_server import app, start_background_services
+        start_background_services()
         app.run(host='0.0.0.0', port=5000, debug=False, threaded=True)
     except KeyboardInterrupt:
         print("\n🛑 Server stopped by user")
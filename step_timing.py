@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Step Timing - Monotonic per-phase timings of executed steps and run-level latency breakdowns
+"""
+
+import time
+from contextlib import contextmanager
+
+# Phases measured inside a step; 'other' is whatever they do not cover (logging, events, bookkeeping)
+STEP_PHASES = ('wait', 'action', 'screenshot', 'video', 'other')
+
+
+class StepTimer:
+    """Accumulates the time one step spends in each phase
+
+    Phases may nest (a page-ready wait inside a network-idle wait); only the
+    outermost entry of a phase is counted. Waits happen inside the action
+    handler, so 'action' is reported net of them.
+    """
+
+    __slots__ = ('wall_start', '_start', '_end', '_seconds', '_active')
+
+    def __init__(self):
+        self.wall_start = time.time()
+        self._start = time.perf_counter()
+        self._end = None
+        self._seconds = dict.fromkeys(STEP_PHASES[:-1], 0.0)
+        self._active = set()
+
+    @contextmanager
+    def phase(self, name):
+        if name in self._active:
+            yield
+            return
+        self._active.add(name)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._seconds[name] += time.perf_counter() - started
+            self._active.discard(name)
+
+    def finish(self):
+        if self._end is None:
+            self._end = time.perf_counter()
+        return self
+
+    @property
+    def elapsed(self):
+        return (self._end or time.perf_counter()) - self._start
+
+    @property
+    def duration_ms(self):
+        return round(self.elapsed * 1000, 1)
+
+    def breakdown(self):
+        """Milliseconds per phase; the phases add up to duration_ms"""
+        seconds = dict(self._seconds)
+        seconds['action'] = max(0.0, seconds['action'] - seconds['wait'])
+        seconds['other'] = max(0.0, self.elapsed - sum(seconds.values()))
+        return {name: round(value * 1000, 1) for name, value in seconds.items()}
+
+    def allure_times(self):
+        """Epoch milliseconds for the Allure step 'start' and 'stop' fields"""
+        start = int(self.wall_start * 1000)
+        return {'start': start, 'stop': start + int(self.elapsed * 1000)}
+
+
+@contextmanager
+def timed(timings, name):
+    """Record the duration of a block in `timings[name]` (milliseconds)"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = round(timings.get(name, 0.0) + (time.perf_counter() - started) * 1000, 1)
+
+
+def summarize_steps(steps):
+    """Totals per phase, per action type and the slowest steps for a run's step rows"""
+    phase_totals = dict.fromkeys(STEP_PHASES, 0.0)
+    by_action = {}
+    for step in steps:
+        for name, value in (step.get('phases') or {}).items():
+            phase_totals[name] = phase_totals.get(name, 0.0) + value
+        duration = step.get('duration_ms')
+        if duration is None:
+            continue
+        stats = by_action.setdefault(step['action'], {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+        stats['count'] += 1
+        stats['total_ms'] += duration
+        stats['max_ms'] = max(stats['max_ms'], duration)
+
+    for stats in by_action.values():
+        stats['total_ms'] = round(stats['total_ms'], 1)
+        stats['avg_ms'] = round(stats['total_ms'] / stats['count'], 1)
+    slowest = sorted((step for step in steps if step.get('duration_ms') is not None),
+                     key=lambda step: step['duration_ms'], reverse=True)[:5]
+    return {
+        'steps_ms': round(sum(step.get('duration_ms') or 0 for step in steps), 1),
+        'phases': {name: round(value, 1) for name, value in phase_totals.items()},
+        'by_action': by_action,
+        'slowest': [{'step': step['step'], 'action': step['action'], 'label': step.get('label'),
+                     'duration_ms': step['duration_ms']} for step in slowest],
+    }
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Video Catalog - SQLite index of recorded videos with paginated, filterable queries
+"""
+
+import os
+import json
+import time
+import shutil
+import sqlite3
+import threading
+import subprocess
+
+from config import Config
+
+VIDEO_EXTENSIONS = ('.webm', '.mp4', '.avi', '.mov')
+
+SORT_COLUMNS = ('created', 'size', 'duration', 'name', 'script', 'status')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS videos (
+    name TEXT PRIMARY KEY,
+    size INTEGER NOT NULL DEFAULT 0,
+    created REAL NOT NULL,
+    modified REAL,
+    duration REAL,
+    width INTEGER,
+    height INTEGER,
+    codec TEXT,
+    script TEXT,
+    session_id TEXT,
+    browser TEXT,
+    status TEXT NOT NULL DEFAULT 'ready',
+    outcome TEXT,
+    compacted INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_videos_created ON videos (created);
+CREATE INDEX IF NOT EXISTS idx_videos_script ON videos (script, created);
+CREATE INDEX IF NOT EXISTS idx_videos_status ON videos (status, created);
+CREATE INDEX IF NOT EXISTS idx_videos_session ON videos (session_id);
+"""
+
+COLUMNS = ('name', 'size', 'created', 'modified', 'duration', 'width', 'height',
+           'codec', 'script', 'session_id', 'browser', 'status', 'outcome', 'compacted')
+
+# Columns added after the first release, migrated in place
+MIGRATIONS = {
+    'outcome': 'ALTER TABLE videos ADD COLUMN outcome TEXT',
+    'compacted': 'ALTER TABLE videos ADD COLUMN compacted INTEGER NOT NULL DEFAULT 0',
+}
+
+
+def probe_video(path):
+    """Read duration, resolution and codec with ffprobe (or OpenCV when ffprobe is missing)"""
+    if shutil.which('ffprobe'):
+        try:
+            output = subprocess.run(
+                ['ffprobe', '-v', 'error', '-select_streams', 'v:0',
+                 '-show_entries', 'stream=codec_name,width,height:format=duration',
+                 '-of', 'json', path],
+                capture_output=True, text=True, timeout=30
+            ).stdout
+            info = json.loads(output or '{}')
+            stream = (info.get('streams') or [{}])[0]
+            duration = info.get('format', {}).get('duration')
+            return {
+                'duration': float(duration) if duration not in (None, 'N/A') else None,
+                'width': stream.get('width'),
+                'height': stream.get('height'),
+                'codec': stream.get('codec_name'),
+            }
+        except (subprocess.SubprocessError, ValueError, OSError):
+            pass
+
+    try:
+        import cv2
+    except ImportError:
+        return {}
+    capture = cv2.VideoCapture(path)
+    try:
+        if not capture.isOpened():
+            return {}
+        fps = capture.get(cv2.CAP_PROP_FPS)
+        frames = capture.get(cv2.CAP_PROP_FRAME_COUNT)
+        fourcc = int(capture.get(cv2.CAP_PROP_FOURCC))
+        return {
+            'duration': frames / fps if fps and frames > 0 else None,
+            'width': int(capture.get(cv2.CAP_PROP_FRAME_WIDTH)) or None,
+            'height': int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT)) or None,
+            'codec': ''.join(chr((fourcc >> 8 * i) & 0xFF) for i in range(4)).strip('\x00 ') or None,
+        }
+    finally:
+        capture.release()
+
+
+class VideoCatalog:
+    """Persistent index of the videos in the recordings directory
+
+    Writers (post-processor, uploads, deletes, retention) keep it current,
+    so listing never has to touch the filesystem.
+    """
+
+    def __init__(self, db_path=None, video_dir='recorded_videos'):
+        self.db_path = db_path or Config.VIDEO_CATALOG_PATH
+        self.video_dir = video_dir
+        os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            existing = {row[1] for row in self._conn.execute('PRAGMA table_info(videos)')}
+            if existing:
+                for column, statement in MIGRATIONS.items():
+                    if column not in existing:
+                        self._conn.execute(statement)
+            self._conn.executescript(SCHEMA)
+
+    def upsert(self, name, **fields):
+        """Insert or update a video row; only the given fields are changed"""
+        fields = {key: value for key, value in fields.items() if key in COLUMNS and key != 'name'}
+        fields.setdefault('created', time.time())
+        columns = ', '.join(['name', *fields])
+        placeholders = ', '.join('?' for _ in range(len(fields) + 1))
+        # Keep the original creation time when a row is updated
+        updates = ', '.join(f"{key} = excluded.{key}" for key in fields if key != 'created')
+        sql = f"INSERT INTO videos ({columns}) VALUES ({placeholders}) ON CONFLICT(name) DO "
+        sql += f"UPDATE SET {updates}" if updates else "NOTHING"
+        with self._lock, self._conn:
+            self._conn.execute(sql, [name, *fields.values()])
+
+    def add_file(self, path, **fields):
+        """Index a finished video file, probing its size, duration, resolution and codec"""
+        stat = os.stat(path)
+        metadata = probe_video(path)
+        metadata.update({key: value for key, value in fields.items() if value is not None})
+        metadata.setdefault('status', 'ready')
+        metadata.setdefault('created', stat.st_mtime)
+        self.upsert(os.path.basename(path), size=stat.st_size, modified=stat.st_mtime, **metadata)
+
+    def remove(self, name):
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM videos WHERE name = ?', (name,))
+
+    def get(self, name):
+        with self._lock:
+            row = self._conn.execute('SELECT * FROM videos WHERE name = ?', (name,)).fetchone()
+        return dict(row) if row else None
+
+    def query(self, page=1, per_page=50, sort='created', order='desc', script=None, status=None,
+              session_id=None, search=None, since=None, until=None, outcome=None):
+        """Return (rows, total) for one page of videos"""
+        where = []
+        params = []
+        if outcome:
+            where.append('outcome = ?')
+            params.append(outcome)
+        if script:
+            where.append('script = ?')
+            params.append(script)
+        if status:
+            where.append('status = ?')
+            params.append(status)
+        if session_id:
+            where.append('session_id = ?')
+            params.append(session_id)
+        if search:
+            where.append("name LIKE ? ESCAPE '\\'")
+            params.append('%' + search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%')
+        if since is not None:
+            where.append('created >= ?')
+            params.append(since)
+        if until is not None:
+            where.append('created < ?')
+            params.append(until)
+        clause = f"WHERE {' AND '.join(where)}" if where else ''
+
+        sort = sort if sort in SORT_COLUMNS else 'created'
+        order = 'ASC' if str(order).lower() == 'asc' else 'DESC'
+        per_page = max(1, min(int(per_page), Config.VIDEO_CATALOG_MAX_PAGE))
+        offset = (max(1, int(page)) - 1) * per_page
+
+        with self._lock:
+            total = self._conn.execute(f'SELECT COUNT(*) FROM videos {clause}', params).fetchone()[0]
+            rows = self._conn.execute(
+                f'SELECT * FROM videos {clause} ORDER BY {sort} {order}, name {order} LIMIT ? OFFSET ?',
+                [*params, per_page, offset]
+            ).fetchall()
+        return [dict(row) for row in rows], total
+
+    def retention_rows(self):
+        """Every video, oldest first, with the fields retention decisions need"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT name, size, created, status, outcome, compacted FROM videos ORDER BY created ASC'
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def names(self):
+        with self._lock:
+            return {row[0] for row in self._conn.execute('SELECT name FROM videos')}
+
+    def sync(self, directory=None):
+        """Reconcile the index with the directory (files added or removed behind our back)"""
+        directory = directory or self.video_dir
+        on_disk = {}
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name.lower().endswith(VIDEO_EXTENSIONS):
+                    on_disk[entry.name] = entry.path
+
+        indexed = self.names()
+        added = 0
+        for name in on_disk.keys() - indexed:
+            try:
+                self.add_file(on_disk[name])
+                added += 1
+            except OSError:
+                pass  # Deleted while we were scanning
+        removed = 0
+        for name in indexed - on_disk.keys():
+            row = self.get(name)
+            # Videos still being encoded have no file yet
+            if row and row['status'] != 'processing':
+                self.remove(name)
+                removed += 1
+        return {'added': added, 'removed': removed, 'total': len(on_disk)}
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_video_catalog():
+    """Process-wide video catalog"""
+    global _catalog
+    with _catalog_lock:
+        if _catalog is None:
+            _catalog = VideoCatalog()
+        return _catalog
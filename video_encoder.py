@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+Video Encoder - Spools de-duplicated frames as they arrive and encodes them
+as a variable-frame-rate video at the browser's native resolution
+"""
+
+import os
+import json
+import time
+import queue
+import base64
+import shutil
+import hashlib
+import logging
+import threading
+import subprocess
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+MANIFEST_NAME = 'frames.jsonl'
+FIRST_FRAME_NAME = 'first_frame'
+
+
+class IncrementalVideoEncoder:
+    """Spools base64 frames on a background thread behind a bounded queue,
+    so memory per session stays flat.
+
+    A frame that is byte-identical, or whose mean pixel difference from the
+    last kept frame is below VIDEO_DEDUP_THRESHOLD, is not stored again - the
+    last kept frame is simply held on screen for longer. Once `finish()`
+    returns, the spool is handed to `encode_spool` (normally through the
+    video post-processor).
+    """
+
+    def __init__(self, path, label=None, spool_dir=None, max_queue=None):
+        self.path = path
+        self.label = label or os.path.basename(path)
+        self.spool_dir = spool_dir or os.path.join(
+            os.path.dirname(path) or '.', '.spool', os.path.splitext(os.path.basename(path))[0]
+        )
+
+        self._queue = queue.Queue(maxsize=max_queue or Config.VIDEO_QUEUE_SIZE)
+        self._manifest = None
+        self._last_digest = None
+        self._last_thumb = None
+        self._closed = False
+        self.error = None
+
+        # Statistics
+        self.frames = 0
+        self.unique = 0
+        self.held = 0
+        self.dropped = 0
+
+        self._thread = threading.Thread(target=self._run, name=f"video-encoder-{self.label}")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def add_frame(self, screenshot_b64, timestamp=None):
+        """Queue a base64 PNG/JPEG frame; returns False if it had to be dropped"""
+        if self._closed or self.error:
+            return False
+        try:
+            self._queue.put((screenshot_b64, timestamp or time.time()), timeout=Config.VIDEO_QUEUE_TIMEOUT)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def finish(self, timeout=None):
+        """Flush queued frames into the spool; returns encoder statistics"""
+        if not self._closed:
+            self._closed = True
+            try:
+                self._queue.put(_STOP, timeout=timeout)
+            except queue.Full:
+                pass
+        self._thread.join(timeout)
+        return self.stats()
+
+    def discard(self, timeout=None):
+        """Stop spooling and delete the spool"""
+        stats = self.finish(timeout)
+        shutil.rmtree(self.spool_dir, ignore_errors=True)
+        return stats
+
+    def stats(self):
+        return {
+            'path': self.path,
+            'spool_dir': self.spool_dir,
+            'frames': self.frames,
+            'unique': self.unique,
+            'held': self.held,
+            'dropped': self.dropped,
+            'error': self.error,
+        }
+
+    def _run(self):
+        try:
+            import cv2
+            import numpy as np
+        except ImportError as e:
+            self.error = f"OpenCV not available: {e}"
+            self._drain()
+            return
+
+        try:
+            os.makedirs(self.spool_dir, exist_ok=True)
+            self._manifest = open(os.path.join(self.spool_dir, MANIFEST_NAME), 'a', encoding='utf-8')
+            while True:
+                item = self._queue.get()
+                if item is _STOP:
+                    self._write_manifest({'end': time.time()})
+                    break
+                self._spool(item[0], item[1], cv2, np)
+        except Exception as e:
+            self.error = str(e)
+            self._drain()
+        finally:
+            if self._manifest:
+                self._manifest.close()
+
+    def _spool(self, screenshot_b64, timestamp, cv2, np):
+        self.frames += 1
+
+        # Cheap exact check on the encoded bytes first
+        digest = hashlib.md5(screenshot_b64.encode('ascii')).digest()
+        if digest == self._last_digest:
+            self.held += 1
+            return
+
+        img_data = base64.b64decode(screenshot_b64)
+        frame = cv2.imdecode(np.frombuffer(img_data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if frame is None:
+            self.dropped += 1
+            return
+
+        # Near-identical check (cursor blink, anti-aliasing) on a small grayscale thumbnail
+        thumb = cv2.resize(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), (160, 90), interpolation=cv2.INTER_AREA)
+        if self._last_thumb is not None:
+            difference = float(np.mean(cv2.absdiff(thumb, self._last_thumb)))
+            if difference < Config.VIDEO_DEDUP_THRESHOLD:
+                self._last_digest = digest
+                self.held += 1
+                return
+
+        self.unique += 1
+        self._last_digest = digest
+        self._last_thumb = thumb
+
+        cv2.putText(frame, f'Script: {self.label}', (50, 50),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+        cv2.putText(frame, f'Screenshot {self.unique}', (50, 100),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+
+        filename = f"frame_{self.unique:06d}.png"
+        cv2.imwrite(os.path.join(self.spool_dir, filename), frame, [cv2.IMWRITE_PNG_COMPRESSION, 1])
+        height, width = frame.shape[:2]
+        self._write_manifest({'file': filename, 'ts': timestamp, 'width': width, 'height': height})
+
+        # Keep the first frame exactly as captured for the debug screenshot
+        if self.unique == 1:
+            with open(os.path.join(self.spool_dir, FIRST_FRAME_NAME), 'wb') as f:
+                f.write(img_data)
+
+    def _write_manifest(self, record):
+        self._manifest.write(json.dumps(record) + '\n')
+        self._manifest.flush()
+
+    def _drain(self):
+        """Discard anything still queued so producers never block on a dead encoder"""
+        while True:
+            try:
+                if self._queue.get_nowait() is _STOP:
+                    return
+            except queue.Empty:
+                return
+
+
+def read_spool(spool_dir):
+    """Return the spooled frames, each with the time it stays on screen
+
+    Frames keep their real on-screen time, so the video follows the run's
+    wall clock. A positive VIDEO_MAX_HOLD caps each hold instead, which
+    time-compresses long idle waits.
+    """
+    frames = []
+    end = None
+    with open(os.path.join(spool_dir, MANIFEST_NAME), 'r', encoding='utf-8') as f:
+        for line in f:
+            record = json.loads(line)
+            if 'end' in record:
+                end = record['end']
+            else:
+                frames.append(record)
+
+    minimum = 1.0 / Config.VIDEO_FALLBACK_FPS
+    for current, following in zip(frames, frames[1:] + [None]):
+        until = following['ts'] if following else (end or current['ts'])
+        current['duration'] = max(until - current['ts'], minimum)
+        if Config.VIDEO_MAX_HOLD > 0:
+            current['duration'] = min(current['duration'], Config.VIDEO_MAX_HOLD)
+    return frames
+
+
+def encode_spool(spool_dir, output_path, progress=None):
+    """Encode a frame spool into a VFR H.264 (.mp4) or VP9 (.webm) video
+
+    Falls back to a constant-frame-rate OpenCV encode when ffmpeg is not
+    installed. `progress(fraction)` is called as encoding advances.
+    """
+    started = time.monotonic()
+    frames = read_spool(spool_dir)
+    if not frames:
+        return {'error': 'No frames to encode'}
+
+    # Native resolution of the first frame, rounded down to even dimensions for yuv420p
+    width = frames[0]['width'] - frames[0]['width'] % 2
+    height = frames[0]['height'] - frames[0]['height'] % 2
+    duration = sum(frame['duration'] for frame in frames)
+
+    if shutil.which('ffmpeg'):
+        result = _encode_ffmpeg(spool_dir, output_path, frames, width, height, duration, progress)
+    else:
+        result = _encode_opencv(spool_dir, output_path, frames, width, height, progress)
+
+    result.update({
+        'width': width,
+        'height': height,
+        'duration': round(duration, 2),
+        'unique_frames': len(frames),
+        'encode_ms': round((time.monotonic() - started) * 1000, 1),
+    })
+    return result
+
+
+def _encode_ffmpeg(spool_dir, output_path, frames, width, height, duration, progress):
+    concat_path = os.path.join(spool_dir, 'frames.ffconcat')
+    with open(concat_path, 'w', encoding='utf-8') as f:
+        f.write('ffconcat version 1.0\n')
+        for frame in frames:
+            f.write(f"file '{frame['file']}'\nduration {frame['duration']:.3f}\n")
+        # The concat demuxer ignores the last duration unless the last file is repeated
+        f.write(f"file '{frames[-1]['file']}'\n")
+
+    if output_path.lower().endswith('.webm'):
+        codec = ['-c:v', 'libvpx-vp9', '-b:v', '0', '-crf', '40', '-deadline', 'realtime', '-row-mt', '1']
+    else:
+        codec = ['-c:v', 'libx264', '-preset', Config.VIDEO_PRESET, '-crf', '28', '-tune', 'stillimage',
+                 '-movflags', '+faststart']
+
+    cmd = [
+        'ffmpeg', '-hide_banner', '-loglevel', 'error', '-y',
+        '-f', 'concat', '-safe', '0', '-i', concat_path,
+        '-vf', f'scale={width}:{height}', '-vsync', 'vfr', '-pix_fmt', 'yuv420p',
+        *codec, '-progress', 'pipe:1', '-nostats', output_path
+    ]
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    for line in process.stdout:
+        if progress and line.startswith('out_time_us=') and duration:
+            try:
+                progress(min(1.0, int(line.split('=', 1)[1]) / 1e6 / duration))
+            except ValueError:
+                pass
+    stderr = process.stderr.read()
+    process.wait()
+    if process.returncode != 0:
+        return {'error': f"ffmpeg failed: {stderr.strip()[-500:]}", 'encoder': 'ffmpeg'}
+    if progress:
+        progress(1.0)
+    return {'encoder': 'ffmpeg', 'codec': 'vp9' if output_path.lower().endswith('.webm') else 'h264'}
+
+
+def _encode_opencv(spool_dir, output_path, frames, width, height, progress):
+    import cv2
+
+    fps = Config.VIDEO_FALLBACK_FPS
+    fourcc = cv2.VideoWriter_fourcc(*('VP90' if output_path.lower().endswith('.webm') else 'mp4v'))
+    writer = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
+    last_frame = None
+    try:
+        for i, frame_info in enumerate(frames, 1):
+            frame = cv2.imread(os.path.join(spool_dir, frame_info['file']))
+            if frame is None:
+                # Truncated or corrupt spool file - hold the previous frame instead of failing the video
+                logger.warning(f"⚠️ Skipping unreadable video frame {frame_info['file']} in {spool_dir}")
+                frame = last_frame
+                if frame is None:
+                    continue
+            elif frame.shape[:2] != (height, width):
+                frame = cv2.resize(frame, (width, height))
+            # Constant frame rate - held frames have to be repeated
+            for _ in range(max(1, round(frame_info['duration'] * fps))):
+                writer.write(frame)
+            last_frame = frame
+            if progress:
+                progress(i / len(frames))
+    finally:
+        writer.release()
+    return {'encoder': 'opencv', 'codec': 'vp9' if output_path.lower().endswith('.webm') else 'mpeg4'}
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Video Post-Processor - Encodes finished frame spools in a background process pool
+"""
+
+import os
+import json
+import time
+import uuid
+import shutil
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from config import Config
+from metrics import BYTES_WRITTEN
+from video_encoder import encode_spool, FIRST_FRAME_NAME
+from video_thumbnails import previews_from_spool, previews_from_video
+from video_catalog import get_video_catalog
+from event_bus import get_event_bus
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_NAME = 'progress.json'
+VIDEO_BYTES = BYTES_WRITTEN.labels('video')
+
+
+def _write_progress(spool_dir, stage, fraction):
+    """Publish progress for the parent process (atomic replace, no shared state needed)"""
+    path = os.path.join(spool_dir, PROGRESS_NAME)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'stage': stage, 'progress': round(fraction, 3), 'updated': time.time()}, f)
+    os.replace(tmp_path, path)
+
+
+def process_spool(spool_dir, output_path, debug_path=None, previews=True):
+    """Turn a frame spool into the final video, poster/sprite previews and a debug frame
+
+    Runs inside a pool worker. The video is encoded inside the spool directory
+    and moved into place when complete, so partial files are never listed.
+    """
+    _write_progress(spool_dir, 'encoding', 0.0)
+
+    # Debug frame: the first captured frame exactly as the browser sent it
+    first_frame = os.path.join(spool_dir, FIRST_FRAME_NAME)
+    if debug_path and os.path.exists(first_frame):
+        shutil.copyfile(first_frame, debug_path)
+
+    partial_path = os.path.join(spool_dir, os.path.basename(output_path))
+    result = encode_spool(spool_dir, partial_path,
+                          progress=lambda fraction: _write_progress(spool_dir, 'encoding', fraction * 0.95))
+    if result.get('error'):
+        return result
+    os.replace(partial_path, output_path)
+    result['path'] = output_path
+    result['size'] = os.path.getsize(output_path)
+
+    if previews:
+        _write_progress(spool_dir, 'thumbnail', 0.95)
+        try:
+            result['previews'] = previews_from_spool(spool_dir, os.path.dirname(output_path) or '.',
+                                                     os.path.basename(output_path))
+        except Exception as e:
+            result['thumbnail_error'] = str(e)
+
+    shutil.rmtree(spool_dir, ignore_errors=True)
+    return result
+
+
+class VideoPostProcessor:
+    """Process pool for video finalization with per-job status and progress"""
+
+    def __init__(self, workers=None):
+        self.workers = workers or Config.VIDEO_POSTPROCESS_WORKERS
+        self._executor = None
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        if self._executor is None:
+            # Spawn, not fork: the parent holds browser sockets and many threads
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context('spawn')
+            )
+        return self._executor
+
+    def submit(self, spool_dir, output_path, debug_path=None, session_id=None, metadata=None):
+        """Queue a finished spool for encoding; returns the job id
+
+        The video is listed in the catalog as 'processing' straight away and
+        updated with its real size, duration, resolution and codec when done.
+        """
+        job_id = str(uuid.uuid4())
+        self._catalog(os.path.basename(output_path), status='processing', session_id=session_id,
+                      **(metadata or {}))
+        job = {
+            'job_id': job_id,
+            'session_id': session_id,
+            'spool_dir': spool_dir,
+            'output': os.path.basename(output_path),
+            'status': 'queued',
+            'progress': 0.0,
+            'submitted': time.time(),
+            'finished': None,
+            'result': None,
+            'error': None
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+            future = self._submit(process_spool, spool_dir, output_path, debug_path)
+        future.add_done_callback(lambda f: self._finished(job_id, f))
+        return job_id
+
+    def submit_previews(self, video_path):
+        """Build poster and sprite for a video that was not encoded from a spool (ffmpeg capture, uploads)"""
+        with self._lock:
+            future = self._submit(previews_from_video, video_path)
+
+        def report(f):
+            try:
+                f.result()
+            except Exception as e:
+                logger.warning(f"⚠️ Preview generation failed for {os.path.basename(video_path)}: {e}")
+
+        future.add_done_callback(report)
+        return future
+
+    def _submit(self, fn, *args):
+        """Submit to the pool (caller holds the lock)"""
+        try:
+            return self._get_executor().submit(fn, *args)
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM) - start a fresh pool and retry once
+            self._executor = None
+            return self._get_executor().submit(fn, *args)
+
+    def _finished(self, job_id, future):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job['finished'] = time.time()
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {'error': str(e)}
+            job['result'] = result
+            if result.get('error'):
+                job['status'] = 'error'
+                job['error'] = result['error']
+            else:
+                job['status'] = 'completed'
+                job['progress'] = 1.0
+        logger.log(logging.ERROR if job['status'] == 'error' else logging.INFO,
+                   f"🎞️ Video job {job_id} {job['status']}: {job['output']}")
+        if job['session_id']:
+            get_event_bus().publish(job['session_id'], 'video', job_id=job_id, status=job['status'],
+                                    output=job['output'], error=job['error'])
+
+        if job['status'] == 'completed':
+            VIDEO_BYTES.inc(result.get('size') or 0)
+            self._catalog(job['output'], status='ready', size=result.get('size'), modified=time.time(),
+                          duration=result.get('duration'), width=result.get('width'),
+                          height=result.get('height'), codec=result.get('codec'))
+        else:
+            self._catalog(job['output'], status='failed')
+
+    def _catalog(self, name, **fields):
+        try:
+            get_video_catalog().upsert(name, **{key: value for key, value in fields.items() if value is not None})
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to update video catalog for {name}: {e}")
+
+    def status(self, job_id):
+        """Current state of a job, including live encoding progress"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            job = dict(job)
+
+        if job['status'] == 'queued':
+            try:
+                with open(os.path.join(job['spool_dir'], PROGRESS_NAME), 'r', encoding='utf-8') as f:
+                    progress = json.load(f)
+                job['status'] = progress['stage']
+                job['progress'] = progress['progress']
+            except (OSError, ValueError):
+                pass  # Not picked up by a worker yet
+        job.pop('spool_dir', None)
+        return job
+
+    def list_jobs(self, active_only=False):
+        with self._lock:
+            job_ids = list(self._jobs)
+        jobs = [self.status(job_id) for job_id in job_ids]
+        if active_only:
+            jobs = [job for job in jobs if job and job['status'] not in ('completed', 'error')]
+        return [job for job in jobs if job]
+
+    def cleanup(self, max_age=3600):
+        """Forget finished jobs older than `max_age` seconds"""
+        cutoff = time.time() - max_age
+        with self._lock:
+            for job_id in [job_id for job_id, job in self._jobs.items()
+                           if job['finished'] and job['finished'] < cutoff]:
+                del self._jobs[job_id]
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor:
+            executor.shutdown(wait=wait)
+
+
+_postprocessor = None
+_postprocessor_lock = threading.Lock()
+
+
+def get_video_postprocessor():
+    """Process-wide video post-processor"""
+    global _postprocessor
+    with _postprocessor_lock:
+        if _postprocessor is None:
+            _postprocessor = VideoPostProcessor()
+        return _postprocessor
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Video Thumbnails - Poster images and hover-scrub sprite sheets for recordings
+"""
+
+import os
+import json
+import math
+
+from config import Config
+
+THUMBNAIL_DIRNAME = 'thumbnails'
+
+PREVIEW_KINDS = ('poster', 'sprite', 'sprite.json')
+
+
+def preview_paths(video_dir, video_name):
+    """Where the previews for a video live: {'poster', 'sprite', 'sprite.json'}"""
+    stem = os.path.splitext(os.path.basename(video_name))[0]
+    thumb_dir = os.path.join(video_dir, THUMBNAIL_DIRNAME)
+    extension = 'webp' if Config.THUMBNAIL_FORMAT == 'webp' else 'jpg'
+    return {
+        'poster': os.path.join(thumb_dir, f"{stem}.{extension}"),
+        'sprite': os.path.join(thumb_dir, f"{stem}.sprite.{extension}"),
+        'sprite.json': os.path.join(thumb_dir, f"{stem}.sprite.json"),
+    }
+
+
+def remove_previews(video_dir, video_name):
+    for path in preview_paths(video_dir, video_name).values():
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def _write_image(cv2, path, image):
+    if path.endswith('.webp'):
+        params = [cv2.IMWRITE_WEBP_QUALITY, Config.THUMBNAIL_QUALITY]
+    else:
+        params = [cv2.IMWRITE_JPEG_QUALITY, Config.THUMBNAIL_QUALITY]
+    # Write beside the target and swap in, so readers never see a half-written image
+    tmp_path = f"{path}.tmp{os.path.splitext(path)[1]}"
+    if not cv2.imwrite(tmp_path, image, params):
+        raise RuntimeError(f"Could not encode {path}")
+    os.replace(tmp_path, path)
+
+
+def _scale(cv2, image, width):
+    height, original_width = image.shape[:2]
+    width = min(width, original_width)
+    return cv2.resize(image, (width, max(1, round(height * width / original_width))), interpolation=cv2.INTER_AREA)
+
+
+def build_previews(samples, video_dir, video_name, duration=None):
+    """Write the poster and sprite sheet from `samples`: a list of (seconds, BGR image)
+
+    The poster is the last sample (the final page state tells runs apart
+    best); the sprite is a grid of evenly spaced samples with a JSON index
+    the dashboard uses to scrub on hover.
+    """
+    import cv2
+    import numpy as np
+
+    if not samples:
+        raise ValueError("No frames to build previews from")
+    paths = preview_paths(video_dir, video_name)
+    os.makedirs(os.path.dirname(paths['poster']), exist_ok=True)
+
+    _write_image(cv2, paths['poster'], _scale(cv2, samples[-1][1], Config.VIDEO_THUMBNAIL_WIDTH))
+
+    tiles = [_scale(cv2, image, Config.SPRITE_TILE_WIDTH) for _, image in samples]
+    tile_height, tile_width = tiles[0].shape[:2]
+    columns = min(len(tiles), Config.SPRITE_COLUMNS)
+    rows = math.ceil(len(tiles) / columns)
+    sheet = np.zeros((rows * tile_height, columns * tile_width, 3), dtype=np.uint8)
+    for index, tile in enumerate(tiles):
+        if tile.shape[:2] != (tile_height, tile_width):
+            tile = cv2.resize(tile, (tile_width, tile_height))
+        row, column = divmod(index, columns)
+        sheet[row * tile_height:(row + 1) * tile_height, column * tile_width:(column + 1) * tile_width] = tile
+    _write_image(cv2, paths['sprite'], sheet)
+
+    index = {
+        'tile_width': tile_width,
+        'tile_height': tile_height,
+        'columns': columns,
+        'rows': rows,
+        'count': len(tiles),
+        'duration': duration,
+        'times': [round(seconds, 2) for seconds, _ in samples],
+    }
+    with open(paths['sprite.json'], 'w', encoding='utf-8') as f:
+        json.dump(index, f)
+    return paths
+
+
+def _sample_times(duration, count):
+    """`count` evenly spaced timestamps across `duration`, centered in each slot"""
+    return [duration * (i + 0.5) / count for i in range(count)]
+
+
+def previews_from_spool(spool_dir, video_dir, video_name):
+    """Build previews from a frame spool (no video decoding needed)"""
+    import cv2
+    from video_encoder import read_spool
+
+    frames = read_spool(spool_dir)
+    starts = []
+    elapsed = 0.0
+    for frame in frames:
+        starts.append(elapsed)
+        elapsed += frame['duration']
+
+    samples = []
+    position = 0
+    for seconds in _sample_times(elapsed, min(Config.SPRITE_TILES, len(frames))):
+        # Frame on screen at `seconds`
+        while position + 1 < len(frames) and starts[position + 1] <= seconds:
+            position += 1
+        samples.append((seconds, frames[position]['file']))
+    samples[-1] = (starts[-1], frames[-1]['file'])
+
+    images = {}
+    loaded = []
+    for seconds, filename in samples:
+        if filename not in images:
+            images[filename] = cv2.imread(os.path.join(spool_dir, filename))
+        loaded.append((seconds, images[filename]))
+    return build_previews(loaded, video_dir, video_name, duration=round(elapsed, 2))
+
+
+def previews_from_video(video_path):
+    """Build previews by seeking through a finished video file"""
+    import cv2
+
+    capture = cv2.VideoCapture(video_path)
+    try:
+        if not capture.isOpened():
+            raise RuntimeError(f"Cannot open {video_path}")
+        fps = capture.get(cv2.CAP_PROP_FPS) or 0
+        frame_count = capture.get(cv2.CAP_PROP_FRAME_COUNT) or 0
+        duration = frame_count / fps if fps and frame_count > 0 else 0
+
+        samples = []
+        if duration:
+            for seconds in _sample_times(duration, Config.SPRITE_TILES):
+                capture.set(cv2.CAP_PROP_POS_MSEC, seconds * 1000)
+                ok, image = capture.read()
+                if ok:
+                    samples.append((seconds, image))
+        if not samples:
+            # Unknown length (e.g. VFR WebM) - take the first frame
+            capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, image = capture.read()
+            if ok:
+                samples.append((0.0, image))
+    finally:
+        capture.release()
+
+    return build_previews(samples, os.path.dirname(video_path) or '.', os.path.basename(video_path),
+                          duration=round(duration, 2) if duration else None)
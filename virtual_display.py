@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Virtual Display - Per-session Xvfb displays and ffmpeg screen capture for Linux hosts
+"""
+
+import os
+import sys
+import time
+import shutil
+import logging
+import threading
+import subprocess
+
+try:
+    import fcntl
+except ImportError:  # Windows - no virtual displays there anyway
+    fcntl = None
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+def xvfb_available():
+    """Whether this host can run virtual displays"""
+    return sys.platform.startswith('linux') and shutil.which('Xvfb') is not None
+
+
+def parse_window_size(value=None):
+    """Parse a 'width,height' (or 'widthxheight') string into an even-sized tuple"""
+    value = (value or Config.WINDOW_SIZE).lower().replace('x', ',')
+    width, height = (int(part) for part in value.split(',')[:2])
+    return width - width % 2, height - height % 2
+
+
+class DisplayAllocator:
+    """Hands out X display numbers so parallel sessions never share a screen
+
+    Executor processes each have their own allocator, so a number is also
+    claimed with an exclusive flock on a per-display file: a number locked by
+    another process is skipped, and the lock dies with its holder.
+    """
+
+    def __init__(self, base=None, count=None):
+        self.base = Config.XVFB_DISPLAY_BASE if base is None else base
+        self.count = count or Config.XVFB_MAX_DISPLAYS
+        self._in_use = {}  # number -> claim file (None without fcntl)
+        self._lock = threading.Lock()
+
+    def allocate(self, skip=()):
+        with self._lock:
+            for number in range(self.base, self.base + self.count):
+                # Skip displays owned by other processes (stale or foreign X servers)
+                if number in self._in_use or number in skip or os.path.exists(f"/tmp/.X{number}-lock"):
+                    continue
+                claim = self._claim(number)
+                if claim is False:
+                    continue
+                self._in_use[number] = claim
+                return number
+        raise RuntimeError(f"No free X display in :{self.base}-:{self.base + self.count - 1}")
+
+    @staticmethod
+    def _claim(number):
+        """Lock the display's claim file; False if another process holds it"""
+        if fcntl is None:
+            return None
+        claim = open(f"/tmp/.X{number}-claim", 'a')
+        try:
+            fcntl.flock(claim, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            claim.close()
+            return False
+        return claim
+
+    def release(self, number):
+        with self._lock:
+            claim = self._in_use.pop(number, None)
+        if claim is not None:
+            claim.close()
+
+    def stats(self):
+        with self._lock:
+            return {'in_use': sorted(self._in_use), 'capacity': self.count}
+
+
+class VirtualDisplay:
+    """One Xvfb server for one session"""
+
+    def __init__(self, size=None, depth=24, allocator=None):
+        # x11grab and the encoders need even dimensions
+        self.size = tuple(value - value % 2 for value in size) if size else parse_window_size()
+        self.depth = depth
+        self.allocator = allocator or get_display_allocator()
+        self.number = None
+        self.process = None
+
+    @property
+    def name(self):
+        return f":{self.number}"
+
+    def start(self, timeout=None, attempts=3):
+        """Launch Xvfb and wait until it accepts connections
+
+        If Xvfb exits right away the number was taken by an X server we could
+        not see (no lock file yet), so the next free number is tried.
+        """
+        timeout = timeout or Config.XVFB_START_TIMEOUT
+        width, height = self.size
+        failed = set()
+        for attempt in range(attempts):
+            self.number = self.allocator.allocate(skip=failed)
+            try:
+                if self._launch(timeout):
+                    break
+            except Exception:
+                self.stop()
+                raise
+            failed.add(self.number)
+            code = self.process.returncode
+            self.stop()
+            if attempt == attempts - 1:
+                raise RuntimeError(f"Xvfb exited with code {code} on displays "
+                                   f"{', '.join(f':{number}' for number in sorted(failed))}")
+        logger.debug(f"🖥️ Virtual display {self.name} started ({width}x{height})")
+        return self
+
+    def _launch(self, timeout):
+        """Start Xvfb on self.number; False if it exited during startup"""
+        width, height = self.size
+        self.process = subprocess.Popen(
+            ['Xvfb', self.name, '-screen', '0', f'{width}x{height}x{self.depth}',
+             '-nolisten', 'tcp', '-ac', '-nocursor'],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        )
+        socket_path = f"/tmp/.X11-unix/X{self.number}"
+        deadline = time.monotonic() + timeout
+        while not os.path.exists(socket_path):
+            if self.process.poll() is not None:
+                return False
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"Xvfb {self.name} did not start within {timeout}s")
+            time.sleep(0.05)
+        return True
+
+    def env(self):
+        """Environment for processes that should draw on this display"""
+        env = dict(os.environ)
+        env['DISPLAY'] = self.name
+        return env
+
+    def stop(self):
+        if self.process:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+            self.process = None
+        if self.number is not None:
+            self.allocator.release(self.number)
+            self.number = None
+
+
+def screen_capture_command(video_path, display=None, size=None, framerate=None):
+    """ffmpeg command recording an X display (Linux) or the desktop (Windows)
+
+    Uses software-only realtime presets so it runs on GPU-less servers.
+    """
+    framerate = str(framerate or Config.XVFB_FRAMERATE)
+    if display:
+        width, height = size or parse_window_size()
+        source = ['-f', 'x11grab', '-draw_mouse', '0', '-video_size', f'{width}x{height}',
+                  '-framerate', framerate, '-i', f'{display}.0']
+    elif os.name == 'nt':
+        source = ['-f', 'gdigrab', '-framerate', framerate, '-i', 'desktop']
+    elif os.environ.get('DISPLAY'):
+        source = ['-f', 'x11grab', '-framerate', framerate, '-i', os.environ['DISPLAY']]
+    else:
+        raise RuntimeError("No display to capture")
+
+    if video_path.lower().endswith('.webm'):
+        codec = ['-c:v', 'libvpx-vp9', '-deadline', 'realtime', '-cpu-used', '8', '-row-mt', '1',
+                 '-b:v', '0', '-crf', '40']
+    else:
+        codec = ['-c:v', 'libx264', '-preset', 'ultrafast', '-tune', 'zerolatency', '-crf', '28',
+                 '-movflags', '+faststart']
+
+    return ['ffmpeg', '-hide_banner', '-loglevel', 'error', '-y', *source,
+            *codec, '-pix_fmt', 'yuv420p', video_path]
+
+
+def start_screen_capture(video_path, display=None, size=None):
+    """Start ffmpeg recording in the background; stop it with `stop_screen_capture`"""
+    return subprocess.Popen(
+        screen_capture_command(video_path, display, size),
+        stdin=subprocess.PIPE,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
+    )
+
+
+def stop_screen_capture(process, timeout=10):
+    """Ask ffmpeg to finish the file cleanly ('q'), terminating only if it ignores us"""
+    try:
+        process.communicate(input=b'q', timeout=timeout)
+    except subprocess.TimeoutExpired:
+        process.terminate()
+        try:
+            process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+    except (BrokenPipeError, ValueError):
+        process.wait(timeout=timeout)
+    return process.returncode
+
+
+_allocator = None
+_allocator_lock = threading.Lock()
+
+
+def get_display_allocator():
+    """Process-wide X display allocator"""
+    global _allocator
+    with _allocator_lock:
+        if _allocator is None:
+            _allocator = DisplayAllocator()
+        return _allocator
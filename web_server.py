@@ -5,28 +5,76 @@ AI Agent Web Server - Flask Backend for Browser Automation Dashboard
 
 import os
 import json
+import logging
 import subprocess
 import threading
 import time
 import glob
 from datetime import datetime, timedelta
-from flask import Flask, request, jsonify, send_from_directory, send_file
+from flask import Flask, Response, g, request, jsonify, send_from_directory, send_file, stream_with_context
 from flask_cors import CORS
-import csv
+from urllib.parse import quote
+from werkzeug.utils import safe_join
 from csv_action_handler import CSVActionHandler
+from action_plan import PlanCompileError
+from screenshot_policy import ScreenshotPolicy
+from driver_pool import get_driver_pool, get_pool_stats
+from driver_cache import get_driver_cache, resolve_driver_path
+from scheduler import get_scheduler
+from browser_profiles import PROFILES, get_profile
+from execution_watchdog import get_watchdog
+from video_postprocess import get_video_postprocessor
+from video_catalog import get_video_catalog
+from retention import get_retention_engine, delete_video
+from event_bus import get_event_bus
+from session_log import configure_logging
+from run_store import get_run_store
+from step_timing import summarize_steps
+from metrics import REGISTRY, CONTENT_TYPE, HTTP_DURATION, GaugeFunc
+from executor_workers import RemoteRun, get_executor_pool, current_executor_pool
+from video_thumbnails import PREVIEW_KINDS, THUMBNAIL_DIRNAME, preview_paths, previews_from_video
+from config import Config
 import uuid
 import shutil
 
 app = Flask(__name__)
 CORS(app)
+configure_logging()
+logger = logging.getLogger(__name__)
 
-# Global variables
-active_sessions = {}
+if Config.METRICS_ENABLED:
+    GaugeFunc('automation_scheduler_queue_depth', 'Runs waiting for a scheduler worker',
+              lambda: get_scheduler().stats()['queued'])
+    GaugeFunc('automation_scheduler_running', 'Runs currently executing',
+              lambda: get_scheduler().stats()['running'])
+
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def record_request_latency(response):
+        started = g.pop('request_started', None)
+        if started is not None:
+            # Route templates (/api/runs/<run_id>) keep the label set bounded
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            HTTP_DURATION.labels(request.method, route, str(response.status_code)).observe(
+                time.perf_counter() - started)
+        return response
+
+# Sessions running in this process (live handlers); every process reads all runs from the run store
 script_sessions = {}
+batch_sessions = {}
 
 # Use the main CSVActionHandler class directly
 WebCSVHandler = CSVActionHandler
 
+def get_handler_pool(browser, profile='default'):
+    """Get the shared driver pool for a browser and launch profile, or None if pooling is disabled"""
+    if not Config.DRIVER_POOL_ENABLED:
+        return None
+    return get_driver_pool(browser, lambda: WebCSVHandler(browser, profile=profile).launch_driver(), profile=profile)
+
 # Video storage directory
 VIDEO_DIR = 'recorded_videos'
 if not os.path.exists(VIDEO_DIR):
@@ -39,64 +87,315 @@ def get_available_scripts():
     
     for csv_file in csv_files:
         try:
-            with open(csv_file, 'r', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                actions = list(reader)
+            plan = WebCSVHandler.load_plan(csv_file)
                 
             scripts.append({
                 'name': csv_file,
                 'path': csv_file,
-                'actions': len(actions),
+                'actions': len(plan),
                 'status': 'ready',
                 'last_modified': datetime.fromtimestamp(os.path.getmtime(csv_file)).isoformat()
             })
+        except PlanCompileError as e:
+            scripts.append({
+                'name': csv_file,
+                'path': csv_file,
+                'actions': 0,
+                'status': 'invalid',
+                'error': str(e),
+                'last_modified': datetime.fromtimestamp(os.path.getmtime(csv_file)).isoformat()
+            })
         except Exception as e:
             print(f"Error reading {csv_file}: {e}")
     
     return scripts
 
-def get_video_info(filepath):
-    """Get video file information"""
-    try:
-        stat = os.stat(filepath)
-        size = stat.st_size
-        modified_time = datetime.fromtimestamp(stat.st_mtime)
-        
-        # Format file size - prioritize MB for videos
-        if size < 1024:
-            size_str = f"{size} B"
-        elif size < 1024 * 1024:
-            size_str = f"{size / 1024:.1f} KB"
+def get_video_info(video):
+    """Format a video catalog row for the dashboard (raw values are kept alongside)"""
+    size = video['size'] or 0
+    
+    # Format file size - prioritize MB for videos
+    if size < 1024:
+        size_str = f"{size} B"
+    elif size < 1024 * 1024:
+        size_str = f"{size / 1024:.1f} KB"
+    else:
+        size_str = f"{size / (1024 * 1024):.2f} MB"
+    
+    if video['duration'] is not None:
+        minutes, seconds = divmod(int(round(video['duration'])), 60)
+        duration_str = f"{minutes}:{seconds:02d}"
+    else:
+        duration_str = 'Unknown'
+    
+    return {
+        'name': video['name'],
+        'size': size_str,
+        'date': datetime.fromtimestamp(video['created']).strftime('%Y-%m-%d %H:%M'),
+        'duration': duration_str,
+        'size_bytes': size,
+        'duration_seconds': video['duration'],
+        'created': datetime.fromtimestamp(video['created']).isoformat(),
+        'width': video['width'],
+        'height': video['height'],
+        'codec': video['codec'],
+        'script': video['script'],
+        'session_id': video['session_id'],
+        'browser': video['browser'],
+        'status': video['status'],
+        'outcome': video['outcome'],
+        'compacted': bool(video['compacted'])
+    }
+
+def parse_date_arg(value):
+    """Parse an ISO date/datetime query argument into a timestamp"""
+    return datetime.fromisoformat(value).timestamp() if value else None
+
+MEDIA_MIMETYPES = {
+    '.mp4': 'video/mp4',
+    '.webm': 'video/webm',
+    '.avi': 'video/x-msvideo',
+    '.mov': 'video/quicktime',
+    '.jpg': 'image/jpeg',
+    '.png': 'image/png',
+    '.webp': 'image/webp',
+    '.json': 'application/json',
+}
+
+def send_media_file(directory, filename, as_attachment=False, max_age=None):
+    """Serve a recorded file with Range/ETag/Last-Modified support, or offload it to the front proxy"""
+    filepath = safe_join(directory, filename)
+    if filepath is None or not os.path.isfile(filepath):
+        return jsonify({'success': False, 'error': 'Video not found'}), 404
+    
+    mimetype = MEDIA_MIMETYPES.get(os.path.splitext(filename)[1].lower(), 'application/octet-stream')
+    download_name = os.path.basename(filename)
+    
+    if Config.VIDEO_OFFLOAD in ('x-accel-redirect', 'x-sendfile'):
+        # nginx (X-Accel-Redirect) or Apache/lighttpd (X-Sendfile) streams the bytes, ranges included
+        response = app.response_class(mimetype=mimetype)
+        if Config.VIDEO_OFFLOAD == 'x-accel-redirect':
+            relative_path = os.path.relpath(filepath, VIDEO_DIR).replace(os.sep, '/')
+            response.headers['X-Accel-Redirect'] = f"{Config.VIDEO_OFFLOAD_PREFIX.rstrip('/')}/{quote(relative_path)}"
         else:
-            size_str = f"{size / (1024 * 1024):.2f} MB"
-        
-        return {
-            'name': os.path.basename(filepath),
-            'size': size_str,
-            'date': modified_time.strftime('%Y-%m-%d %H:%M'),
-            'duration': 'Unknown'  # Could be enhanced with video metadata
-        }
+            response.headers['X-Sendfile'] = os.path.abspath(filepath)
+        if as_attachment:
+            response.headers['Content-Disposition'] = f'attachment; filename="{download_name}"'
+        return response
+    
+    # Werkzeug answers If-None-Match / If-Modified-Since with 304 and Range with 206;
+    # full responses go through wsgi.file_wrapper, which gunicorn serves with sendfile()
+    return send_file(
+        filepath,
+        mimetype=mimetype,
+        as_attachment=as_attachment,
+        download_name=download_name,
+        conditional=True,
+        etag=True,
+        max_age=Config.VIDEO_CACHE_MAX_AGE if max_age is None else max_age
+    )
+
+def get_available_videos(page=1, per_page=50, **filters):
+    """Get one page of videos from the catalog; returns (videos, total)"""
+    rows, total = get_video_catalog().query(page=page, per_page=per_page, **filters)
+    return [get_video_info(row) for row in rows], total
+
+def sync_video_catalog():
+    """Pick up videos added or removed outside the server (runs in the background)"""
+    try:
+        result = get_video_catalog().sync(VIDEO_DIR)
+        if result['added'] or result['removed']:
+            logger.info(f"📚 Video catalog synced: {result['added']} added, {result['removed']} removed")
     except Exception as e:
-        print(f"Error getting video info for {filepath}: {e}")
+        logger.warning(f"⚠️ Video catalog sync failed: {e}")
+
+FINAL_STATUSES = ('completed', 'error', 'timeout', 'stopped')
+
+def set_session_status(session_id, status, **fields):
+    """Update a script session, persist it and push the change to event stream subscribers"""
+    session = script_sessions[session_id]
+    session['status'] = status
+    session.update(fields)
+    handler = session['handler']
+    stored = {'status': status, 'progress': handler.progress, 'error': session.get('error')}
+    if status == 'running':
+        stored['started'] = time.time()
+    elif status in FINAL_STATUSES:
+        stored.update(finished=time.time(), timeout=json.dumps(handler.timeout) if handler.timeout else None)
+    get_run_store().update_run(session_id, **stored)
+    get_event_bus().publish(session_id, 'status', status=status, script=session['script'],
+                            progress=handler.progress, error=session.get('error'))
+
+def session_snapshot(session_id, since=None):
+    """Current state of a script session
+
+    Without `since` the last 10 log entries are included; with it, the entries
+    from that offset on (up to LOG_FETCH_LIMIT) and `log_offset` is the cursor
+    for the next call.
+    """
+    session = script_sessions[session_id]
+    handler = session['handler']
+    queue_position = get_scheduler().queue_position(session_id)
+    if queue_position:
+        status = 'queued'
+    elif session['status'] in FINAL_STATUSES:
+        status = session['status']
+    else:
+        status = handler.status
+    if since is None:
+        logs = handler.log_store.tail(10)
+        log_offset = logs[-1]['offset'] + 1 if logs else len(handler.log_store)
+    else:
+        logs, log_offset = handler.log_store.read(since)
+    return {
+        'session_id': session_id,
+        'script': session['script'],
+        'status': status,
+        'queue_position': queue_position,
+        'progress': handler.progress,
+        'current_action': handler.current_action,
+        'timeout': handler.timeout,
+        'video': handler.video_status(),
+        'logs': logs,
+        'log_offset': log_offset,
+        'log_total': len(handler.log_store)
+    }
+
+def stored_timeout(run):
+    """The run's timeout as the same dict a live session reports"""
+    if not run['timeout']:
         return None
+    try:
+        return json.loads(run['timeout'])
+    except ValueError:
+        return {'reason': run['timeout'], 'time': None}  # Rows written before the column held JSON
 
-def get_available_videos():
-    """Get list of available video files"""
-    videos = []
-    video_extensions = ['.webm', '.mp4', '.avi', '.mov']
-    
-    for ext in video_extensions:
-        pattern = os.path.join(VIDEO_DIR, f"*{ext}")
-        video_files = glob.glob(pattern)
-        
-        for video_file in video_files:
-            video_info = get_video_info(video_file)
-            if video_info:
-                videos.append(video_info)
-    
-    # Sort by modification time (newest first)
-    videos.sort(key=lambda x: x['date'], reverse=True)
-    return videos
+def stored_snapshot(run, since=None):
+    """session_snapshot() for a run owned by another process, read from the run store"""
+    store = get_run_store()
+    if since is None:
+        logs = store.tail_logs(run['run_id'])
+        log_offset = logs[-1]['offset'] + 1 if logs else 0
+    else:
+        logs, log_offset = store.read_logs(run['run_id'], since)
+    return {
+        'session_id': run['run_id'],
+        'script': run['script'],
+        'status': run['status'],
+        'queue_position': None,
+        'progress': run['progress'],
+        'current_action': run['current_action'],
+        'timeout': stored_timeout(run),
+        'video': {'job_id': run['video_job'], 'output': run['video']} if run['video_job'] else None,
+        'logs': logs,
+        'log_offset': log_offset,
+        'log_total': store.count_logs(run['run_id'])
+    }
+
+def get_run_info(run):
+    """API form of a run store row"""
+    def iso(timestamp):
+        return datetime.fromtimestamp(timestamp).isoformat() if timestamp else None
+    duration = (run['finished'] or time.time()) - run['started'] if run['started'] else None
+    return {
+        'run_id': run['run_id'],
+        'script': run['script'],
+        'browser': run['browser'],
+        'profile': run['profile'],
+        'batch_id': run['batch_id'],
+        'status': run['status'],
+        'progress': run['progress'],
+        'current_action': run['current_action'],
+        'total_steps': run['total_steps'],
+        'completed_steps': run['completed_steps'],
+        'created': iso(run['created']),
+        'started': iso(run['started']),
+        'finished': iso(run['finished']),
+        'duration': round(duration, 2) if duration is not None else None,
+        'error': run['error'],
+        'timeout': stored_timeout(run),
+        'video': run['video'],
+        'artifacts': run['artifacts'],
+        'worker': run['worker']
+    }
+
+def format_sse(event_type, data, event_id=None):
+    """One Server-Sent Events message"""
+    lines = [f"id: {event_id}"] if event_id is not None else []
+    lines.append(f"event: {event_type}")
+    lines.append(f"data: {json.dumps(data, default=str)}")
+    return '\n'.join(lines) + '\n\n'
+
+def start_script_session(script_name, browser='chrome', auto_record=True, priority=0, group=None,
+                         screenshot_policy=None, profile=None):
+    """Create a script session and queue it on the execution scheduler"""
+    # Create session
+    session_id = str(uuid.uuid4())
+    profile = get_profile(profile).name
+    if Config.EXECUTOR_MODE == 'process':
+        # Browser, screenshots and encoding run in an executor process; this is a live view of it
+        handler = RemoteRun(get_executor_pool(get_scheduler().workers), browser, session_id, profile=profile)
+    else:
+        handler = WebCSVHandler(browser, session_id, driver_pool=get_handler_pool(browser, profile), profile=profile)
+
+    # Set auto-recording and screenshot preferences
+    handler.auto_record_enabled = auto_record
+    handler.screenshot_policy = screenshot_policy
+
+    # Store session
+    script_sessions[session_id] = {
+        'handler': handler,
+        'script': script_name,
+        'browser': browser,
+        'profile': profile,
+        'queued_time': datetime.now(),
+        'status': 'queued',
+        'batch_id': group
+    }
+    get_run_store().create_run(session_id, script_name, browser=browser, profile=profile, batch_id=group)
+    set_session_status(session_id, 'queued')
+
+    # Run script on a scheduler worker
+    def run_script():
+        if script_sessions[session_id]['status'] == 'stopped':
+            return
+        set_session_status(session_id, 'running', start_time=datetime.now())
+        try:
+            print(f"DEBUG: Starting script execution for {script_name}")
+
+            # Arm the watchdog for the whole script
+            def script_timeout_handler():
+                print(f"DEBUG: Script {script_name} timed out after {Config.SCRIPT_TIMEOUT} seconds")
+                set_session_status(session_id, 'timeout',
+                                   error=f'Script execution timed out after {Config.SCRIPT_TIMEOUT} seconds')
+                # Force close browser
+                handler.abort_driver(f"Script timed out after {Config.SCRIPT_TIMEOUT} seconds")
+
+            guard = get_watchdog().watch(Config.SCRIPT_TIMEOUT, script_timeout_handler, name=f"{session_id}-script")
+
+            with guard:
+                result = handler.run_actions_from_csv(script_name)
+
+            if guard.expired:
+                print(f"DEBUG: Script {script_name} timed out")
+                set_session_status(session_id, 'timeout', error='Script execution timed out',
+                                   end_time=datetime.now(), timeout=handler.timeout)
+            else:
+                set_session_status(session_id, handler.status, end_time=datetime.now(), result=result)
+                print(f"DEBUG: Script {script_name} completed with status: {handler.status}")
+
+        except Exception as e:
+            print(f"DEBUG: Script {script_name} failed with error: {str(e)}")
+            set_session_status(session_id, 'error', error=str(e), end_time=datetime.now())
+            # Make sure to close browser if it was opened
+            if hasattr(handler, 'driver') and handler.driver:
+                try:
+                    handler.driver.quit()
+                except:
+                    pass
+
+    get_scheduler().submit(session_id, run_script, priority=priority, group=group)
+    return session_id
 
 @app.route('/')
 def index():
@@ -194,78 +493,29 @@ def api_run_script():
         if not script_name or not os.path.exists(script_name):
             return jsonify({'success': False, 'error': f'Script not found: {script_name}'})
         
-        # Create session
-        session_id = str(uuid.uuid4())
-        handler = WebCSVHandler(browser, session_id)
-        
-        # Set auto-recording preference
-        handler.auto_record_enabled = auto_record
-        
-        # Store session
-        script_sessions[session_id] = {
-            'handler': handler,
-            'script': script_name,
-            'browser': browser,
-            'start_time': datetime.now(),
-            'status': 'running'
-        }
+        try:
+            WebCSVHandler.load_plan(script_name)
+        except PlanCompileError as e:
+            return jsonify({'success': False, 'error': f'Invalid script: {e}'})
         
-        # Run script in background thread
-        def run_script():
-            try:
-                print(f"DEBUG: Starting script execution for {script_name}")
-                
-                # Add overall timeout for script execution (5 minutes)
-                import signal
-                
-                def script_timeout_handler(signum, frame):
-                    print(f"DEBUG: Script {script_name} timed out after 5 minutes")
-                    script_sessions[session_id]['status'] = 'timeout'
-                    script_sessions[session_id]['error'] = 'Script execution timed out after 5 minutes'
-                    # Force close browser
-                    if hasattr(handler, 'driver') and handler.driver:
-                        try:
-                            handler.driver.quit()
-                        except:
-                            pass
-                    raise TimeoutError("Script execution timed out")
-                
-                # Set timeout for entire script execution
-                signal.signal(signal.SIGALRM, script_timeout_handler)
-                signal.alarm(300)  # 5 minutes timeout
-                
-                try:
-                    result = handler.run_actions_from_csv(script_name)
-                    signal.alarm(0)  # Cancel timeout
-                    
-                    script_sessions[session_id]['status'] = handler.status
-                    script_sessions[session_id]['end_time'] = datetime.now()
-                    script_sessions[session_id]['result'] = result
-                    print(f"DEBUG: Script {script_name} completed with status: {handler.status}")
-                    
-                except TimeoutError:
-                    print(f"DEBUG: Script {script_name} timed out")
-                    script_sessions[session_id]['status'] = 'timeout'
-                    script_sessions[session_id]['error'] = 'Script execution timed out'
-                    script_sessions[session_id]['end_time'] = datetime.now()
-                    
-            except Exception as e:
-                print(f"DEBUG: Script {script_name} failed with error: {str(e)}")
-                script_sessions[session_id]['status'] = 'error'
-                script_sessions[session_id]['error'] = str(e)
-                script_sessions[session_id]['end_time'] = datetime.now()
-                # Make sure to close browser if it was opened
-                if hasattr(handler, 'driver') and handler.driver:
-                    try:
-                        handler.driver.quit()
-                    except:
-                        pass
+        screenshot_policy = data.get('screenshotPolicy')
+        profile = data.get('profile')
+        try:
+            if screenshot_policy:
+                ScreenshotPolicy.parse(screenshot_policy)
+            get_profile(profile)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)})
         
-        thread = threading.Thread(target=run_script)
-        thread.daemon = True
-        thread.start()
+        priority = int(data.get('priority', 0))
+        session_id = start_script_session(script_name, browser, auto_record, priority=priority,
+                                          screenshot_policy=screenshot_policy, profile=profile)
         
-        return jsonify({'success': True, 'sessionId': session_id})
+        return jsonify({
+            'success': True,
+            'sessionId': session_id,
+            'queue_position': get_scheduler().queue_position(session_id)
+        })
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
@@ -278,34 +528,280 @@ def api_stop_script():
         
         if session_id in script_sessions:
             session = script_sessions[session_id]
-            if hasattr(session['handler'], 'driver') and session['handler'].driver:
-                session['handler'].driver.quit()
-            session['status'] = 'stopped'
-            session['end_time'] = datetime.now()
+            get_scheduler().cancel(session_id)
+            session['handler'].stop()
+            set_session_status(session_id, 'stopped', end_time=datetime.now())
             return jsonify({'success': True, 'message': 'Script stopped'})
-        else:
-            return jsonify({'success': False, 'error': 'Session not found'})
+        run = get_run_store().get_run(session_id)
+        if run and run['status'] not in FINAL_STATUSES:
+            return jsonify({'success': False, 'error': f"Session is running in server process {run['worker']}"})
+        return jsonify({'success': False, 'error': 'Session not found'})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
 @app.route('/api/script-progress/<session_id>')
 def api_script_progress(session_id):
-    """Get script execution progress"""
+    """Get script execution progress (?since=<log_offset> returns exactly the log lines from that offset on)"""
     try:
+        since = request.args.get('since', type=int)
         if session_id in script_sessions:
-            session = script_sessions[session_id]
-            handler = session['handler']
-            
+            return jsonify({'success': True, **session_snapshot(session_id, since)})
+        run = get_run_store().get_run(session_id)
+        if run:
+            return jsonify({'success': True, **stored_snapshot(run, since)})
+        return jsonify({'success': False, 'error': 'Session not found'})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+@app.route('/api/events')
+def api_events():
+    """Server-Sent Events stream of status, step and log events
+
+    One connection follows every active session (or ?sessions=a,b). Clients
+    resume from the Last-Event-ID header, which EventSource sends on
+    reconnect, or ?after=<id>. A 'snapshot' event carries the current state
+    on connect and whenever the client fell too far behind to replay.
+    """
+    sessions = {session_id for session_id in request.args.get('sessions', '').split(',') if session_id} or None
+    try:
+        after = int(request.headers.get('Last-Event-ID') or request.args.get('after') or 0)
+    except ValueError:
+        after = 0
+    bus = get_event_bus()
+
+    def snapshots():
+        session_ids = sessions or [session_id for session_id, session in list(script_sessions.items())
+                                   if session['status'] not in FINAL_STATUSES]
+        return [session_snapshot(session_id) for session_id in session_ids if session_id in script_sessions]
+
+    def stream():
+        cursor = after
+        yield f"retry: {Config.EVENT_RETRY_MS}\n\n"
+        if not cursor:
+            cursor = bus.last_id
+            yield format_sse('snapshot', {'sessions': snapshots(), 'reset': False}, cursor)
+        deadline = time.monotonic() + Config.EVENT_STREAM_MAX_SECONDS
+        while time.monotonic() < deadline:
+            events, last_id, missed = bus.read(cursor, sessions, timeout=Config.EVENT_HEARTBEAT_SECONDS)
+            if missed:
+                yield format_sse('snapshot', {'sessions': snapshots(), 'reset': True}, last_id)
+            for event in events:
+                yield format_sse(event['type'], {'session_id': event['session_id'], 'time': event['time'],
+                                                 **event['data']}, event['id'])
+            if not events and not missed:
+                # Heartbeat: an id-only message keeps proxies from timing out and advances
+                # the client's resume point past events filtered out for it
+                yield f"id: {last_id}\n\n"
+            cursor = last_id
+        # Returning ends the response; EventSource reconnects and resumes from the last id
+
+    return Response(stream_with_context(stream()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/run-batch', methods=['POST'])
+def api_run_batch():
+    """Run a list of CSV scripts with a concurrency cap"""
+    try:
+        data = request.get_json()
+        scripts = data.get('scripts') or []
+        browser = data.get('browser', 'chrome')
+        auto_record = data.get('autoRecord', True)
+        priority = int(data.get('priority', 0))
+        concurrency = int(data.get('concurrency', Config.BATCH_MAX_CONCURRENCY))
+        screenshot_policy = data.get('screenshotPolicy')
+        profile = data.get('profile')
+        
+        if not scripts:
+            return jsonify({'success': False, 'error': 'No scripts provided'})
+        
+        missing = [script for script in scripts if not os.path.exists(script)]
+        if missing:
+            return jsonify({'success': False, 'error': f'Scripts not found: {", ".join(missing)}'})
+        
+        try:
+            for script in scripts:
+                WebCSVHandler.load_plan(script)
+            if screenshot_policy:
+                ScreenshotPolicy.parse(screenshot_policy)
+            get_profile(profile)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': f'Invalid script: {e}'})
+        
+        batch_id = str(uuid.uuid4())
+        get_scheduler().set_group_limit(batch_id, concurrency)
+        session_ids = [
+            start_script_session(script, browser, auto_record, priority=priority, group=batch_id,
+                                 screenshot_policy=screenshot_policy, profile=profile)
+            for script in scripts
+        ]
+        
+        batch_sessions[batch_id] = {
+            'sessions': session_ids,
+            'concurrency': concurrency,
+            'start_time': datetime.now()
+        }
+        
+        return jsonify({'success': True, 'batchId': batch_id, 'sessionIds': session_ids})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+@app.route('/api/batch-progress/<batch_id>')
+def api_batch_progress(batch_id):
+    """Get progress of every script in a batch"""
+    try:
+        if batch_id not in batch_sessions:
+            # Started by another server process - report from the run store
+            runs, total = get_run_store().query_runs(batch_id=batch_id, per_page=Config.RUN_STORE_MAX_PAGE, order='asc')
+            if not runs:
+                return jsonify({'success': False, 'error': 'Batch not found'})
+            sessions = [{
+                'session_id': run['run_id'],
+                'script': run['script'],
+                'status': run['status'],
+                'queue_position': None,
+                'progress': run['progress']
+            } for run in runs]
             return jsonify({
                 'success': True,
-                'status': handler.status,
-                'progress': handler.progress,
-                'current_action': handler.current_action,
-                'logs': handler.logs[-10:],  # Last 10 log entries
-                'session_id': session_id
+                'batch_id': batch_id,
+                'concurrency': None,
+                'total': total,
+                'finished': len([s for s in sessions if s['status'] not in ('queued', 'running')]),
+                'sessions': sessions
             })
-        else:
-            return jsonify({'success': False, 'error': 'Session not found'})
+        
+        batch = batch_sessions[batch_id]
+        scheduler = get_scheduler()
+        sessions = []
+        for session_id in batch['sessions']:
+            session = script_sessions.get(session_id)
+            if not session:
+                continue
+            queue_position = scheduler.queue_position(session_id)
+            sessions.append({
+                'session_id': session_id,
+                'script': session['script'],
+                'status': 'queued' if queue_position else session['status'],
+                'queue_position': queue_position,
+                'progress': session['handler'].progress
+            })
+        
+        finished = [s for s in sessions if s['status'] not in ('queued', 'running')]
+        return jsonify({
+            'success': True,
+            'batch_id': batch_id,
+            'concurrency': batch['concurrency'],
+            'total': len(batch['sessions']),
+            'finished': len(finished),
+            'sessions': sessions
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+@app.route('/api/runs')
+def api_runs():
+    """Run history, filterable by ?script=, ?status=, ?batch=, ?since= and ?until= (ISO dates)"""
+    try:
+        runs, total = get_run_store().query_runs(
+            page=request.args.get('page', 1, type=int),
+            per_page=request.args.get('per_page', 50, type=int),
+            sort=request.args.get('sort', 'created'),
+            order=request.args.get('order', 'desc'),
+            script=request.args.get('script'),
+            status=request.args.get('status'),
+            batch_id=request.args.get('batch'),
+            since=parse_date_arg(request.args.get('since')),
+            until=parse_date_arg(request.args.get('until'))
+        )
+        return jsonify({'success': True, 'total': total, 'runs': [get_run_info(run) for run in runs]})
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+@app.route('/api/runs/<run_id>')
+def api_run(run_id):
+    """One run with its per-step results"""
+    try:
+        store = get_run_store()
+        run = store.get_run(run_id)
+        if not run:
+            return jsonify({'success': False, 'error': 'Run not found'}), 404
+        return jsonify({'success': True, 'run': get_run_info(run), 'steps': store.get_steps(run_id)})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+@app.route('/api/runs/<run_id>/timings')
+def api_run_timings(run_id):
+    """Where a run's time went: queueing, run-level phases and per-step phases by action type"""
+    try:
+        store = get_run_store()
+        run = store.get_run(run_id)
+        if not run:
+            return jsonify({'success': False, 'error': 'Run not found'}), 404
+        steps = store.get_steps(run_id)
+        queued_ms = round((run['started'] - run['created']) * 1000, 1) if run['started'] else None
+        return jsonify({
+            'success': True,
+            'run_id': run_id,
+            'status': run['status'],
+            'duration': get_run_info(run)['duration'],
+            'queued_ms': queued_ms,
+            'run_phases': run['timings'] or {},
+            **summarize_steps(steps),
+            'steps': [{
+                'step': step['step'],
+                'action': step['action'],
+                'label': step['label'],
+                'status': step['status'],
+                'duration_ms': step['duration_ms'],
+                'phases': step['phases']
+            } for step in steps]
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Prometheus scrape endpoint (this process plus what its executor processes forwarded)"""
+    if not Config.METRICS_ENABLED:
+        return jsonify({'success': False, 'error': 'Metrics are disabled'}), 404
+    return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
+
+@app.route('/api/scheduler')
+def api_scheduler():
+    """Get execution scheduler statistics"""
+    try:
+        stats = get_scheduler().stats()
+        if Config.EXECUTOR_MODE == 'process':
+            stats['executors'] = get_executor_pool(stats['workers']).stats()
+        return jsonify({'success': True, 'executor_mode': Config.EXECUTOR_MODE, **stats})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+@app.route('/api/browser-profiles')
+def api_browser_profiles():
+    """List browser launch profiles selectable per run"""
+    try:
+        return jsonify({
+            'success': True,
+            'default': get_profile().name,
+            'profiles': [profile.to_dict() for profile in PROFILES.values()]
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+@app.route('/api/driver-pool')
+def api_driver_pool():
+    """Get driver pool size and lease wait statistics"""
+    try:
+        stats = get_pool_stats()
+        executors = current_executor_pool()
+        if executors:
+            # In process mode the pools live in the executors
+            stats['pools'] += executors.pool_stats()
+        stats['enabled'] = Config.DRIVER_POOL_ENABLED
+        return jsonify({'success': True, **stats})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
@@ -324,17 +820,11 @@ def api_upload_script():
             filename = file.filename
             file.save(filename)
             
-            # Validate CSV format
+            # Validate CSV format by compiling it
             try:
-                with open(filename, 'r', encoding='utf-8') as f:
-                    reader = csv.DictReader(f)
-                    actions = list(reader)
+                plan = WebCSVHandler.load_plan(filename)
                 
-                if not actions:
-                    os.remove(filename)
-                    return jsonify({'success': False, 'error': 'Empty CSV file'})
-                
-                return jsonify({'success': True, 'message': f'Script uploaded: {filename}'})
+                return jsonify({'success': True, 'message': f'Script uploaded: {filename} ({len(plan)} actions)'})
             except Exception as e:
                 os.remove(filename)
                 return jsonify({'success': False, 'error': f'Invalid CSV format: {str(e)}'})
@@ -344,78 +834,26 @@ def api_upload_script():
         return jsonify({'success': False, 'error': str(e)})
 
 def check_browser_drivers(browser):
-    """Check if browser drivers are available"""
+    """Check if browser drivers are available, answering from the driver cache"""
     try:
-        from selenium import webdriver
-        from selenium.webdriver.chrome.service import Service as ChromeService
-        from selenium.webdriver.firefox.service import Service as FirefoxService
-        from selenium.webdriver.edge.service import Service as EdgeService
-        
-        if browser == 'chrome':
-            try:
-                driver = webdriver.Chrome()
-                driver.quit()
-                return {'available': True, 'message': 'Chrome driver ready'}
-            except:
-                return {'available': False, 'message': 'Chrome driver not found'}
-        
-        elif browser == 'firefox':
-            try:
-                driver = webdriver.Firefox()
-                driver.quit()
-                return {'available': True, 'message': 'Firefox driver ready'}
-            except:
-                return {'available': False, 'message': 'Firefox driver not found'}
-        
-        elif browser == 'edge':
-            try:
-                driver = webdriver.Edge()
-                driver.quit()
-                return {'available': True, 'message': 'Edge driver ready'}
-            except:
-                return {'available': False, 'message': 'Edge driver not found'}
-        
+        return get_driver_cache().status(browser)
     except Exception as e:
         return {'available': False, 'message': f'Driver check failed: {str(e)}'}
 
 def download_driver(browser):
-    """Download browser driver"""
+    """Download browser driver and record it in the driver cache"""
     try:
-        if browser == 'chrome':
-            # Use webdriver-manager for automatic driver management
-            try:
-                from webdriver_manager.chrome import ChromeDriverManager
-                ChromeDriverManager().install()
-                return True
-            except ImportError:
-                subprocess.run(['pip', 'install', 'webdriver-manager'], check=True)
-                from webdriver_manager.chrome import ChromeDriverManager
-                ChromeDriverManager().install()
-                return True
-        
-        elif browser == 'firefox':
-            try:
-                from webdriver_manager.firefox import GeckoDriverManager
-                GeckoDriverManager().install()
-                return True
-            except ImportError:
-                subprocess.run(['pip', 'install', 'webdriver-manager'], check=True)
-                from webdriver_manager.firefox import GeckoDriverManager
-                GeckoDriverManager().install()
-                return True
+        if browser not in ('chrome', 'firefox', 'edge'):
+            return False
         
-        elif browser == 'edge':
-            try:
-                from webdriver_manager.microsoft import EdgeChromiumDriverManager
-                EdgeChromiumDriverManager().install()
-                return True
-            except ImportError:
-                subprocess.run(['pip', 'install', 'webdriver-manager'], check=True)
-                from webdriver_manager.microsoft import EdgeChromiumDriverManager
-                EdgeChromiumDriverManager().install()
-                return True
+        # Use webdriver-manager for automatic driver management
+        try:
+            __import__('webdriver_manager')
+        except ImportError:
+            subprocess.run(['pip', 'install', 'webdriver-manager'], check=True)
         
-        return False
+        resolve_driver_path(browser, force=True)
+        return True
     except Exception as e:
         print(f"Error downloading driver: {e}")
         return False
@@ -468,7 +906,7 @@ def api_cleanup():
         sessions_to_remove = []
         
         for session_id, session in script_sessions.items():
-            if session['status'] in ['completed', 'error', 'stopped']:
+            if session['status'] in FINAL_STATUSES:
                 # Remove sessions older than 1 hour
                 if (current_time - session.get('end_time', current_time)).seconds > 3600:
                     sessions_to_remove.append(session_id)
@@ -481,19 +919,106 @@ def api_cleanup():
                         session['handler'].driver.quit()
                     except:
                         pass
+                session['handler'].log_store.discard()
                 del script_sessions[session_id]
         
-        return jsonify({'success': True, 'cleaned': len(sessions_to_remove)})
+        for batch_id in list(batch_sessions):
+            if not any(session_id in script_sessions for session_id in batch_sessions[batch_id]['sessions']):
+                del batch_sessions[batch_id]
+        
+        get_video_postprocessor().cleanup(max_age=3600)
+        executors = current_executor_pool()
+        if executors:
+            executors.cleanup_video_jobs(max_age=3600)
+        purged = get_run_store().purge()
+        
+        return jsonify({'success': True, 'cleaned': len(sessions_to_remove), 'runs_purged': purged})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+@app.route('/api/retention', methods=['GET', 'POST'])
+def api_retention():
+    """GET: retention settings and the last pass; POST: run a pass now"""
+    try:
+        engine = get_retention_engine()
+        report = engine.run_once() if request.method == 'POST' else engine.last_report
+        return jsonify({
+            'success': True,
+            'enabled': Config.RETENTION_ENABLED,
+            'report': report,
+            'settings': {
+                'video_retention_days': Config.VIDEO_RETENTION_DAYS,
+                'video_failed_retention_days': Config.VIDEO_FAILED_RETENTION_DAYS,
+                'video_quota_mb': Config.VIDEO_QUOTA_MB,
+                'video_compact_after_days': Config.VIDEO_COMPACT_AFTER_DAYS,
+                'screenshot_archive_after_days': Config.SCREENSHOT_ARCHIVE_AFTER_DAYS,
+                'screenshot_retention_days': Config.SCREENSHOT_RETENTION_DAYS,
+                'screenshot_failed_retention_days': Config.SCREENSHOT_FAILED_RETENTION_DAYS,
+                'screenshot_quota_mb': Config.SCREENSHOT_QUOTA_MB
+            }
+        })
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
 # Video Management API Endpoints
+@app.route('/api/video-jobs')
+def api_video_jobs():
+    """List video post-processing jobs (?active=true for unfinished ones only)"""
+    try:
+        active_only = request.args.get('active', 'false').lower() == 'true'
+        jobs = get_video_postprocessor().list_jobs()
+        executors = current_executor_pool()
+        if executors:
+            jobs += executors.video_jobs()
+        if active_only:
+            jobs = [job for job in jobs if job['status'] not in ('completed', 'error')]
+        return jsonify({'success': True, 'jobs': jobs})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+@app.route('/api/video-jobs/<job_id>')
+def api_video_job(job_id):
+    """Get encoding progress of one video post-processing job"""
+    try:
+        job = get_video_postprocessor().status(job_id)
+        executors = current_executor_pool()
+        if job is None and executors:
+            job = executors.video_job(job_id)
+        if job is None:
+            return jsonify({'success': False, 'error': 'Job not found'}), 404
+        return jsonify({'success': True, **job})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
 @app.route('/api/videos')
 def api_videos():
-    """Get list of available videos"""
+    """List videos: ?page, per_page, sort (created|size|duration|name|script|status), order,
+    script, status, session, q (name contains), since/until (ISO dates)"""
     try:
-        videos = get_available_videos()
-        return jsonify({'success': True, 'videos': videos})
+        page = max(1, int(request.args.get('page', 1)))
+        per_page = int(request.args.get('per_page', 50))
+        videos, total = get_available_videos(
+            page=page,
+            per_page=per_page,
+            sort=request.args.get('sort', 'created'),
+            order=request.args.get('order', 'desc'),
+            script=request.args.get('script'),
+            status=request.args.get('status'),
+            session_id=request.args.get('session'),
+            outcome=request.args.get('outcome'),
+            search=request.args.get('q'),
+            since=parse_date_arg(request.args.get('since')),
+            until=parse_date_arg(request.args.get('until'))
+        )
+        per_page = max(1, min(per_page, Config.VIDEO_CATALOG_MAX_PAGE))
+        return jsonify({
+            'success': True,
+            'videos': videos,
+            'total': total,
+            'page': page,
+            'per_page': per_page,
+            'pages': (total + per_page - 1) // per_page
+        })
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
@@ -515,6 +1040,8 @@ def api_save_video():
         
         # Save the file
         video_file.save(filepath)
+        get_video_catalog().add_file(filepath, status='uploaded')
+        get_video_postprocessor().submit_previews(filepath)
         
         return jsonify({'success': True, 'filename': filename, 'message': 'Video saved successfully'})
     except Exception as e:
@@ -522,31 +1049,42 @@ def api_save_video():
 
 @app.route('/api/video/<filename>')
 def api_get_video(filename):
-    """Serve video file"""
+    """Stream video file (supports Range requests for seeking)"""
     try:
-        filepath = os.path.join(VIDEO_DIR, filename)
-        if os.path.exists(filepath):
-            return send_file(filepath, as_attachment=False)
-        else:
+        return send_media_file(VIDEO_DIR, filename)
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/video/<filename>/thumbnail')
+def api_video_thumbnail(filename):
+    """Serve a video's preview: ?kind=poster (default), sprite or sprite.json
+
+    Previews are built once when the video is finalized; older videos get
+    theirs generated on first request and cached on disk.
+    """
+    try:
+        kind = request.args.get('kind', 'poster')
+        if kind not in PREVIEW_KINDS:
+            return jsonify({'success': False, 'error': f'Unknown preview kind: {kind}'}), 400
+        
+        video_path = safe_join(VIDEO_DIR, filename)
+        if video_path is None or not os.path.isfile(video_path):
             return jsonify({'success': False, 'error': 'Video not found'}), 404
+        
+        preview_path = preview_paths(VIDEO_DIR, filename)[kind]
+        if not os.path.exists(preview_path) or os.path.getmtime(preview_path) < os.path.getmtime(video_path):
+            previews_from_video(video_path)
+        
+        return send_media_file(os.path.join(VIDEO_DIR, THUMBNAIL_DIRNAME), os.path.basename(preview_path),
+                               max_age=Config.THUMBNAIL_CACHE_MAX_AGE)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/api/download-video/<filename>')
 def api_download_video(filename):
-    """Download video file"""
+    """Download video file (resumable via Range requests)"""
     try:
-        filepath = os.path.join(VIDEO_DIR, filename)
-        if os.path.exists(filepath):
-            # Send file with appropriate content type
-            if filename.endswith('.mp4'):
-                return send_file(filepath, as_attachment=True, download_name=filename, mimetype='video/mp4')
-            elif filename.endswith('.webm'):
-                return send_file(filepath, as_attachment=True, download_name=filename, mimetype='video/webm')
-            else:
-                return send_file(filepath, as_attachment=True, download_name=filename)
-        else:
-            return jsonify({'success': False, 'error': 'File not found'}), 404
+        return send_media_file(VIDEO_DIR, filename, as_attachment=True)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -554,9 +1092,9 @@ def api_download_video(filename):
 def api_delete_video(filename):
     """Delete video file"""
     try:
-        filepath = os.path.join(VIDEO_DIR, filename)
-        if os.path.exists(filepath):
-            os.remove(filepath)
+        filepath = safe_join(VIDEO_DIR, filename)
+        if filepath and os.path.isfile(filepath):
+            delete_video(VIDEO_DIR, filename)
             return jsonify({'success': True, 'message': 'Video deleted successfully'})
         else:
             return jsonify({'success': False, 'error': 'Video not found'}), 404
@@ -574,13 +1112,43 @@ def api_clear_old_videos():
             if os.path.isfile(video_file):
                 file_time = datetime.fromtimestamp(os.path.getmtime(video_file))
                 if file_time < cutoff_date:
-                    os.remove(video_file)
+                    delete_video(VIDEO_DIR, os.path.basename(video_file))
                     deleted_count += 1
         
         return jsonify({'success': True, 'deleted': deleted_count, 'message': f'Cleared {deleted_count} old videos'})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+_background_started = False
+_background_lock = threading.Lock()
+
+def start_background_services():
+    """Start the server's background work once per process
+
+    Called from the entry points (here, app.py, gunicorn.conf.py, start_web_interface.py)
+    rather than at import, so importing this module has no side effects.
+    """
+    global _background_started
+    with _background_lock:
+        if _background_started:
+            return
+        _background_started = True
+
+    get_run_store().recover_orphans()
+    threading.Thread(target=sync_video_catalog, name="video-catalog-sync", daemon=True).start()
+    if Config.RETENTION_ENABLED:
+        get_retention_engine().start()
+
+    def cleanup_thread():
+        while True:
+            time.sleep(300)  # Cleanup every 5 minutes
+            try:
+                app.test_client().post('/api/cleanup')
+            except:
+                pass
+
+    threading.Thread(target=cleanup_thread, name="session-cleanup", daemon=True).start()
+
 if __name__ == '__main__':
     print("🚀 Starting AI Agent Web Server...")
     
@@ -590,18 +1158,7 @@ if __name__ == '__main__':
     print(f"📱 Dashboard will be available at: http://localhost:{port}")
     print("🔧 Make sure to install dependencies first!")
     
-    # Start cleanup thread
-    def cleanup_thread():
-        while True:
-            time.sleep(300)  # Cleanup every 5 minutes
-            try:
-                app.test_client().post('/api/cleanup')
-            except:
-                pass
-    
-    cleanup = threading.Thread(target=cleanup_thread)
-    cleanup.daemon = True
-    cleanup.start()
+    start_background_services()
     
     # Use debug=False for production deployment
     debug_mode = os.environ.get('FLASK_DEBUG', 'False').lower() == 'true'